@@ -19,9 +19,65 @@ if not TELEGRAM_TOKEN:
 if not GROQ_API_KEY:
     raise ValueError("El Key de Groq no fue cargado.")
 
+# ==================== MODO DE EJECUCIÓN ====================
+# "sync": TeleBot + clientes Groq bloqueantes (modo original)
+# "async": AsyncTeleBot + AsyncGroq sobre asyncio
+RUNTIME_MODE = os.getenv('RUNTIME_MODE', 'sync').strip().lower()
+
+if RUNTIME_MODE not in ("sync", "async"):
+    raise ValueError(f"RUNTIME_MODE inválido: {RUNTIME_MODE} (usar 'sync' o 'async').")
+
+# ==================== RECEPCIÓN DE UPDATES ====================
+# "polling": long polling contra Telegram (modo original)
+# "webhook": servidor HTTP local que recibe los POST de Telegram
+UPDATE_MODE = os.getenv('UPDATE_MODE', 'polling').strip().lower()
+
+# Servidor HTTP del webhook
+WEBHOOK_LISTEN_HOST = os.getenv('WEBHOOK_LISTEN_HOST', '0.0.0.0')
+WEBHOOK_LISTEN_PORT = int(os.getenv('WEBHOOK_LISTEN_PORT', '8443'))
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_MAX_BODY_BYTES = 1_000_000
+
+# URL pública registrada en Telegram con setWebhook (opcional: si no se
+# define se asume que el webhook ya fue registrado, p. ej. detrás de un proxy)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+# Valor esperado en el header X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+
+# URL alternativa de la Bot API (p. ej. tools/fake_telegram.py para pruebas)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+
+if UPDATE_MODE not in ("polling", "webhook"):
+    raise ValueError(f"UPDATE_MODE inválido: {UPDATE_MODE} (usar 'polling' o 'webhook').")
+if UPDATE_MODE == "webhook" and not WEBHOOK_SECRET_TOKEN:
+    raise ValueError("El modo webhook requiere definir WEBHOOK_SECRET_TOKEN.")
+
+# ==================== MÉTRICAS ====================
+# Cada cuántos segundos se imprimen todas las métricas registradas en una
+# línea de log (0 = nunca). Funciona en cualquier modo; en modo webhook
+# además se pueden consultar con GET /stats
+STATS_LOG_INTERVAL_SECONDS = float(os.getenv('STATS_LOG_INTERVAL_SECONDS', '300'))
+
+# ==================== DESPACHO DE HANDLERS ====================
+# Pool de workers particionado por chat (modo sync): mensajes del mismo
+# chat en orden estricto, chats distintos en paralelo
+DISPATCHER_WORKERS = 8
+# Capacidad de la cola de cada worker (al llenarse se aplica backpressure)
+DISPATCHER_QUEUE_SIZE = 100
+
 # ==================== MODELO DE SENTIMIENTO ====================
 SENTIMENT_MODEL_NAME = "pysentimiento/robertuito-sentiment-analysis"
 
+# Backend de inferencia: "torch" (pipeline de transformers) u "onnx"
+# (ONNX Runtime, exportado una vez y cacheado en disco)
+SENTIMENT_BACKEND = os.getenv('SENTIMENT_BACKEND', 'torch').strip().lower()
+SENTIMENT_ONNX_DIR = "models/onnx"
+# Cuantización dinámica int8 del modelo ONNX
+SENTIMENT_ONNX_QUANTIZE = True
+
+if SENTIMENT_BACKEND not in ("torch", "onnx"):
+    raise ValueError(f"SENTIMENT_BACKEND inválido: {SENTIMENT_BACKEND} (usar 'torch' u 'onnx').")
+
 # Emojis para cada categoría de sentimiento
 SENTIMENT_EMOJIS = {
     '5 stars': "😊",
@@ -31,6 +87,28 @@ SENTIMENT_EMOJIS = {
     '1 star': "😠"
 }
 
+# Hilos del executor donde corre la inferencia en modo async
+SENTIMENT_EXECUTOR_WORKERS = 2
+
+# Pipeline: el sentimiento se calcula en paralelo con la llamada al LLM
+SENTIMENT_PIPELINE_ENABLED = True
+# Incluir el sentimiento en el mismo mensaje de la respuesta (un solo envío)
+SENTIMENT_INLINE_REPLY = True
+
+# Micro-batching: se agrupan textos concurrentes en una sola pasada
+SENTIMENT_BATCHING_ENABLED = True
+SENTIMENT_BATCH_MAX_SIZE = 16
+# Ventana máxima (ms) que se espera para completar un batch
+SENTIMENT_BATCH_MAX_WAIT_MS = 10
+
+# Cache de resultados por hash del texto normalizado
+SENTIMENT_CACHE_ENABLED = True
+SENTIMENT_CACHE_MAX_ENTRIES = 5000
+# Archivo para persistir el cache entre reinicios (None = solo memoria)
+SENTIMENT_CACHE_FILE = "sentiment_cache.json"
+# Cada cuántas entradas nuevas se escribe el archivo
+SENTIMENT_CACHE_SAVE_EVERY = 50
+
 # ==================== ENLACES SAMSUNG ====================
 SAMSUNG_SHOP_URL = "https://shop.samsung.com/ar/"
 SAMSUNG_SUPPORT_URL = "https://www.samsung.com/ca/support/contact/"
@@ -38,15 +116,225 @@ SAMSUNG_SUPPORT_URL = "https://www.samsung.com/ca/support/contact/"
 # ==================== CONFIGURACIÓN GROQ ====================
 # Modelos
 GROQ_CHAT_MODEL = "llama-3.3-70b-versatile"
+# Modelo de chat chico y rápido (saludos, preguntas puntuales, respaldo)
+GROQ_CHAT_FAST_MODEL = "llama-3.1-8b-instant"
 GROQ_VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
 GROQ_WHISPER_MODEL = "whisper-large-v3"
 
+# URL base de la API (None = la oficial). Permite apuntar a un servidor
+# local de pruebas, ej: http://127.0.0.1:8082 (tools/fake_groq_server.py)
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL') or None
+
+# Pool de conexiones compartido por todos los módulos (keep-alive)
+GROQ_MAX_CONNECTIONS = 20
+GROQ_MAX_KEEPALIVE_CONNECTIONS = 10
+GROQ_KEEPALIVE_EXPIRY_SECONDS = 120
+# HTTP/2 (se usa solo si el paquete h2 está instalado)
+GROQ_HTTP2 = True
+# Reintentos propios del SDK: en 0 porque los hace modules/rate_limiter.py
+GROQ_MAX_RETRIES = 0
+# Timeouts (s): conexión común y lectura por tipo de llamada
+GROQ_CONNECT_TIMEOUT = 5
+GROQ_READ_TIMEOUTS = {
+    "chat": 30,
+    "vision": 60,
+    "transcription": 120
+}
+# Abrir la conexión (TCP + TLS) al arrancar, antes del primer mensaje
+GROQ_WARMUP_ENABLED = True
+
 # Parámetros de generación
 CHAT_TEMPERATURE = 0.3
 CHAT_MAX_TOKENS = 500
 VISION_TEMPERATURE = 0.7
 VISION_MAX_TOKENS = 750
 
+# ==================== LÍMITES DE LA API ====================
+# Cuotas de Groq por modelo: requests por minuto (rpm) y tokens por minuto
+# (tpm) o segundos de audio por hora (ash). Las llamadas esperan su turno
+# en lugar de recibir un 429 (ver modules/rate_limiter.py)
+RATE_LIMITS = {
+    GROQ_CHAT_MODEL: {"rpm": 30, "tpm": 12000},
+    GROQ_CHAT_FAST_MODEL: {"rpm": 30, "tpm": 6000},
+    GROQ_VISION_MODEL: {"rpm": 30, "tpm": 30000},
+    GROQ_WHISPER_MODEL: {"rpm": 20, "ash": 7200}
+}
+# Cuota de los modelos que no figuran arriba
+RATE_LIMIT_DEFAULT = {"rpm": 30, "tpm": 6000}
+# Tokens estimados por imagen enviada al modelo de visión
+RATE_LIMIT_IMAGE_TOKENS = 1000
+# Whisper cobra al menos 10 segundos por request
+RATE_LIMIT_MIN_AUDIO_SECONDS = 10
+# Espera máxima en la cola antes de dar la llamada por fallida
+RATE_LIMIT_MAX_WAIT_SECONDS = 60
+# Reintentos ante 429, 5xx y errores de conexión (backoff exponencial con
+# jitter, o el retry-after que indique la API)
+RATE_LIMIT_MAX_RETRIES = 4
+RATE_LIMIT_BACKOFF_BASE_SECONDS = 0.5
+RATE_LIMIT_BACKOFF_MAX_SECONDS = 20
+# Fallas seguidas que abren el circuito y segundos que queda abierto
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = 30
+
+# ==================== CONTABILIDAD DE TOKENS ====================
+# Tokens máximos (estimados) del mensaje de texto y de la transcripción de
+# un audio: lo que sobra se recorta antes de armar el prompt
+USER_MESSAGE_MAX_TOKENS = 500
+TRANSCRIPTION_MAX_TOKENS = 800
+# Aviso al cargar el dataset si el system prompt de cada request puede
+# superar este tamaño
+SYSTEM_PROMPT_MAX_TOKENS = 3000
+# Chats con consumo acumulado en memoria (se desaloja el menos activo) y
+# cuántos de los que más consumen se muestran en las métricas
+TOKEN_USAGE_MAX_CHATS = 5000
+TOKEN_USAGE_TOP_CHATS = 10
+
+# ==================== RUTEO DE MODELOS ====================
+# Si está activo, cada mensaje va al modelo más chico que alcance según su
+# intención y largo; si no, todos van a GROQ_CHAT_MODEL
+MODEL_ROUTER_ENABLED = True
+# Modelos de chat del más chico al más grande
+CHAT_MODEL_TIERS = [GROQ_CHAT_FAST_MODEL, GROQ_CHAT_MODEL]
+# Preguntas puntuales de hasta estos tokens van al modelo más chico
+ROUTER_SHORT_MESSAGE_TOKENS = 16
+# Latencia máxima deseada por respuesta (s): si el p95 de un modelo la
+# supera se usa uno más chico, y si el elegido no responde a tiempo se
+# lanza la misma consulta al modelo más chico (gana el primero)
+ROUTER_LATENCY_BUDGET_SECONDS = 6.0
+# Muestras de latencia por modelo y mínimo para confiar en sus percentiles
+ROUTER_LATENCY_WINDOW = 200
+ROUTER_MIN_SAMPLES = 10
+
+# ==================== TRANSCRIPCIÓN DE VOZ ====================
+# Audios largos: se decodifican, se cortan en silencios y los fragmentos
+# se transcriben en paralelo
+VOICE_LONG_AUDIO_ENABLED = True
+# Duración (s) a partir de la cual un audio se transcribe por fragmentos
+VOICE_LONG_AUDIO_MIN_SECONDS = 60
+# Largo objetivo y máximo (s) de cada fragmento
+VOICE_CHUNK_TARGET_SECONDS = 30
+VOICE_CHUNK_MAX_SECONDS = 45
+# Solapamiento (s) entre fragmentos cuando no se encuentra un silencio
+VOICE_CHUNK_OVERLAP_SECONDS = 1.0
+# Transcripciones de fragmentos en vuelo a la vez (global: el tope es
+# compartido por todos los audios que se están transcribiendo)
+VOICE_CHUNK_CONCURRENCY = 4
+# Detección de silencio: tamaño de ventana (ms) y energía relativa al pico (dB)
+VOICE_SILENCE_FRAME_MS = 30
+VOICE_SILENCE_THRESHOLD_DB = -35
+
+# Preprocesado antes de subir: mono, remuestreo y recorte de silencios
+VOICE_PREPROCESS_ENABLED = True
+VOICE_TARGET_SAMPLE_RATE = 16000
+# Margen (ms) que se conserva alrededor de cada tramo con voz
+VOICE_TRIM_PADDING_MS = 200
+# Las pausas internas más largas se acortan a esta duración (s)
+VOICE_MAX_PAUSE_SECONDS = 1.0
+# Segundos mínimos a ahorrar para subir el audio procesado en lugar del original
+VOICE_TRIM_MIN_SAVED_SECONDS = 1.0
+# Bitrate (bits/s) del OGG/Opus con que se vuelve a codificar el audio procesado
+VOICE_UPLOAD_BITRATE = 24000
+
+# Backends de transcripción: "groq" (API) o "local" (faster-whisper en CPU)
+VOICE_BACKEND_PRIMARY = os.getenv('VOICE_BACKEND_PRIMARY', 'groq').strip().lower()
+# Backend a usar si falla el primario (vacío = ninguno)
+VOICE_BACKEND_FALLBACK = os.getenv('VOICE_BACKEND_FALLBACK', '').strip().lower() or None
+# Los clips de hasta estos segundos van directo al backend local (0 = nunca)
+VOICE_LOCAL_MAX_SECONDS = float(os.getenv('VOICE_LOCAL_MAX_SECONDS', '0'))
+# Modelo CTranslate2 local (ej: convertido de whisper-small) y su ejecución
+VOICE_LOCAL_MODEL_DIR = os.getenv('VOICE_LOCAL_MODEL_DIR', 'models/faster-whisper-small')
+VOICE_LOCAL_COMPUTE_TYPE = "int8"
+VOICE_LOCAL_CPU_THREADS = 4
+VOICE_LOCAL_BEAM_SIZE = 1
+
+for _backend in (VOICE_BACKEND_PRIMARY, VOICE_BACKEND_FALLBACK):
+    if _backend not in (None, "groq", "local"):
+        raise ValueError(f"Backend de transcripción inválido: {_backend} (usar 'groq' o 'local').")
+
+# ==================== IMÁGENES ====================
+# Preprocesado antes de enviar al modelo de visión
+IMAGE_PREPROCESS_ENABLED = True
+# Se descarga el tamaño de foto más chico cuyo lado mayor llegue a esto (px)
+IMAGE_MIN_DIMENSION = 800
+# Lado mayor máximo (px) y calidad JPEG de la imagen enviada al modelo
+IMAGE_MAX_DIMENSION = 1024
+IMAGE_JPEG_QUALITY = 85
+
+# Cache de descripciones: por file_unique_id de Telegram y por hash perceptual
+IMAGE_CACHE_ENABLED = True
+IMAGE_CACHE_MAX_ENTRIES = 1000
+# Bits distintos (de 64) del dHash para considerar dos imágenes iguales; un
+# acierto aproximado tiene que cumplirlo en el hash horizontal y el vertical
+IMAGE_CACHE_HASH_THRESHOLD = 4
+# Contraste mínimo (desvío estándar de grises de la miniatura, 0-255) para
+# buscar por hash: en capturas con fondo blanco o imágenes casi lisas el
+# dHash es ruido y dos imágenes distintas quedan a pocos bits
+IMAGE_CACHE_MIN_CONTRAST = 12
+# Base SQLite para persistir el cache entre reinicios (None = solo memoria)
+IMAGE_CACHE_DB_FILE = "image_cache.sqlite3"
+
+# Álbumes: las fotos con el mismo media_group_id se juntan durante esta
+# ventana (s) y se analizan en una sola llamada con una sola respuesta
+IMAGE_MEDIA_GROUP_WINDOW_SECONDS = 1.0
+# Imágenes máximas por llamada al modelo de visión
+IMAGE_MEDIA_GROUP_MAX_IMAGES = 5
+
+# ==================== RECUPERACIÓN DE CONTEXTO ====================
+# Si está activo, el prompt solo lleva las entradas del dataset relevantes
+# para cada mensaje (índice BM25) en lugar del dataset completo
+RETRIEVAL_ENABLED = True
+RETRIEVAL_TOP_K = 8
+# Tokens máximos (estimados) de las entradas recuperadas del dataset
+# (company_info va aparte, en el prefijo fijo del prompt)
+RETRIEVAL_TOKEN_BUDGET = 1200
+
+# ==================== CACHE DE RESPUESTAS ====================
+# Respuestas del LLM por mensaje normalizado + versión del dataset
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_TTL_SECONDS = 3600
+
+# Cache semántico: reutiliza respuestas de preguntas parafraseadas
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+SEMANTIC_CACHE_MAX_ENTRIES = 2000
+# Similitud coseno mínima para reutilizar una respuesta
+SEMANTIC_CACHE_THRESHOLD = 0.90
+
+# ==================== MEMORIA DE CONVERSACIÓN ====================
+# Si está activo, cada request lleva los últimos mensajes del chat y un
+# resumen de los anteriores (así el modelo sabe si ya saludó, a qué
+# producto se refiere "ese", etc.)
+CONVERSATION_MEMORY_ENABLED = True
+# Tokens máximos de los mensajes recientes reenviados en cada request
+CONVERSATION_HISTORY_TOKEN_BUDGET = 600
+CONVERSATION_MAX_TURNS = 12
+# Cada mensaje guardado se recorta a estos tokens
+CONVERSATION_TURN_MAX_TOKENS = 200
+# Los mensajes que salen del buffer se suman a un resumen de este tamaño,
+# generado con el modelo chico
+CONVERSATION_SUMMARY_MAX_TOKENS = 150
+CONVERSATION_SUMMARY_MODEL = GROQ_CHAT_FAST_MODEL
+# Chats en memoria (se desaloja el menos usado) y segundos de inactividad
+# tras los que la conversación se olvida
+CONVERSATION_MAX_CHATS = 5000
+CONVERSATION_IDLE_TTL_SECONDS = 6 * 3600
+# Persistencia en SQLite para sobrevivir reinicios (None = solo memoria)
+CONVERSATION_DB_FILE = None
+
+# ==================== RESPUESTAS EN STREAMING ====================
+# Si está activo, la respuesta de texto se envía apenas llega la primera
+# oración y se va completando editando el mensaje
+STREAMING_ENABLED = True
+# Caracteres mínimos antes de enviar el primer mensaje (si no hay oración
+# completa antes, se espera a tenerla)
+STREAMING_FIRST_MESSAGE_MIN_CHARS = 20
+# Segundos mínimos entre ediciones del mismo mensaje. Telegram limita a ~1
+# mensaje por segundo por chat y ~20 por minuto en grupos
+STREAMING_EDIT_INTERVAL_SECONDS = 1.0
+STREAMING_GROUP_EDIT_INTERVAL_SECONDS = 3.0
+# None = texto plano (como las respuestas sin streaming), o "Markdown"
+STREAMING_PARSE_MODE = None
+
 # ==================== ARCHIVOS ====================
-DATASET_PATH = "dataset.json"
-TEMP_VOICE_FILE = "temp_voice.ogg"
\ No newline at end of file
+DATASET_PATH = "dataset.json"
\ No newline at end of file
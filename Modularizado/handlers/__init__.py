@@ -1,9 +1,12 @@
-from .text_handler import register_text_handler
-from .voice_handler import register_voice_handler
-from .image_handler import register_image_handler
+from .text_handler import register_text_handler, register_text_handler_async
+from .voice_handler import register_voice_handler, register_voice_handler_async
+from .image_handler import register_image_handler, register_image_handler_async
 
 __all__ = [
     'register_text_handler',
     'register_voice_handler',
-    'register_image_handler'
+    'register_image_handler',
+    'register_text_handler_async',
+    'register_voice_handler_async',
+    'register_image_handler_async'
 ]
\ No newline at end of file
@@ -1,41 +1,146 @@
+import asyncio
 import telebot as tlb
+from telebot.async_telebot import AsyncTeleBot
+from typing import List, Optional
 from modules.image_handler import ImageAnalyzer
+from modules.image_processing import select_photo_size
+from modules.media_group import AsyncMediaGroupBuffer, MediaGroupBuffer
+from modules.dispatcher import AsyncChatDispatcher, ChatDispatcher, ordered_by_chat
+from config import IMAGE_PREPROCESS_ENABLED, IMAGE_MEDIA_GROUP_MAX_IMAGES
 
 
-def register_image_handler(bot: tlb.TeleBot, image_analyzer: ImageAnalyzer):
+def _pick_photo(photo_sizes: list):
+    """
+    Elige qué tamaño de la foto descargar.
+    
+    Args:
+        photo_sizes (list): message.photo (tamaños de menor a mayor)
+        
+    Returns:
+        PhotoSize: El más chico que cumple IMAGE_MIN_DIMENSION, o el
+        original si el preprocesado está desactivado
+    """
+    if not IMAGE_PREPROCESS_ENABLED:
+        return photo_sizes[-1]
+    return select_photo_size(photo_sizes)
+
+
+def _album_notice(count: int) -> str:
+    """
+    Aviso para el cliente cuando el álbum trae más fotos de las que se analizan.
+    
+    Args:
+        count (int): Fotos recibidas en el álbum
+        
+    Returns:
+        str: Texto a agregar al final de la respuesta (vacío si entraron todas)
+    """
+    if count <= IMAGE_MEDIA_GROUP_MAX_IMAGES:
+        return ""
+    return (
+        f"\n\n_ℹ️ Enviaste {count} imágenes: analicé solo las primeras "
+        f"{IMAGE_MEDIA_GROUP_MAX_IMAGES}._"
+    )
+
+
+def register_image_handler(bot: tlb.TeleBot, image_analyzer: ImageAnalyzer,
+                           dispatcher: Optional[ChatDispatcher] = None):
     """
     Registra el handler de imágenes en el bot.
     
     Args:
         bot: Instancia del bot de Telegram
         image_analyzer: Analizador de imágenes
+        dispatcher: Pool ordenado por chat donde ejecutar el handler (opcional)
     """
     
+    def process_album(messages: List[tlb.types.Message]):
+        """
+        Analiza las fotos de un álbum (hasta IMAGE_MEDIA_GROUP_MAX_IMAGES)
+        en una sola llamada y responde una sola vez, al primer mensaje,
+        avisando si quedaron fotos sin analizar.
+        
+        Args:
+            messages: Mensajes del álbum, en orden
+        """
+        first = messages[0]
+        try:
+            images = []
+            for album_message in messages[:IMAGE_MEDIA_GROUP_MAX_IMAGES]:
+                file_info = bot.get_file(_pick_photo(album_message.photo).file_id)
+                images.append(bot.download_file(file_info.file_path))
+            
+            description = image_analyzer.analyze_many(images, first.chat.id)
+            
+            if description:
+                bot.reply_to(first, description + _album_notice(len(messages)),
+                             parse_mode='Markdown')
+            else:
+                bot.reply_to(
+                    first, 
+                    "❌ No pude analizar las imágenes. Por favor, intenta de nuevo."
+                )
+        
+        except Exception as e:
+            print(f"❌ Error al procesar el álbum: {e}")
+            bot.reply_to(
+                first, 
+                "⚠️ Ocurrió un error al procesar tus imágenes. Intenta de nuevo."
+            )
+    
+    def flush_album(messages: List[tlb.types.Message]):
+        """Al cerrarse la ventana, procesa el álbum en el worker de su chat."""
+        if dispatcher is None:
+            process_album(messages)
+        else:
+            dispatcher.submit(messages[0].chat.id, process_album, messages)
+    
+    album_buffer = MediaGroupBuffer(flush_album)
+    
     @bot.message_handler(content_types=['photo'])
+    @ordered_by_chat(dispatcher)
     def handle_photo(message: tlb.types.Message):
         """
         Procesa imágenes enviadas por el usuario.
         
+        Las fotos de un álbum (mismo media_group_id) se juntan durante
+        IMAGE_MEDIA_GROUP_WINDOW_SECONDS y se analizan todas juntas.
+        
         Flujo:
-        1. Notifica que está procesando la imagen
-        2. Descarga la imagen en mayor resolución
-        3. Analiza el contenido con IA de visión
-        4. Envía descripción + enlace al catálogo
+        1. Si la foto ya fue analizada, responde desde el cache
+        2. Notifica que está procesando la imagen
+        3. Descarga el tamaño más chico que alcanza la resolución mínima
+        4. Analiza el contenido con IA de visión
+        5. Envía descripción + enlace al catálogo
         
         Args:
             message: Mensaje con foto de Telegram
         """
+        # Álbum: se avisa una sola vez y se espera al resto de las fotos
+        if message.media_group_id:
+            if album_buffer.add(message):
+                bot.reply_to(message, "📸 Leyendo tus imágenes...")
+            return
+        
         try:
+            # Foto ya analizada (ej: reenviada): se responde sin descargarla
+            photo = _pick_photo(message.photo)
+            cached = image_analyzer.cached_description(photo.file_unique_id)
+            if cached:
+                bot.reply_to(message, cached, parse_mode='Markdown')
+                return
+            
             # Notificar procesamiento
             bot.reply_to(message, "📸 Leyendo tu imagen...")
             
-            # Descargar imagen (usar la de mayor resolución)
-            photo = message.photo[-1]
+            # Descargar imagen (el tamaño más chico que sirve al modelo)
             file_info = bot.get_file(photo.file_id)
             downloaded_file = bot.download_file(file_info.file_path)
             
             # Analizar imagen
-            description = image_analyzer.analyze(downloaded_file)
+            description = image_analyzer.analyze(
+                downloaded_file, photo.file_unique_id, message.chat.id
+            )
             
             if description:
                 bot.reply_to(message, description, parse_mode='Markdown')
@@ -52,4 +157,107 @@ def register_image_handler(bot: tlb.TeleBot, image_analyzer: ImageAnalyzer):
                 "⚠️ Ocurrió un error al procesar tu imagen. Intenta de nuevo."
             )
     
-    print("✅ Handler de imágenes registrado")
\ No newline at end of file
+    print("✅ Handler de imágenes registrado")
+
+
+def register_image_handler_async(bot: AsyncTeleBot, image_analyzer: ImageAnalyzer,
+                                 dispatcher: Optional[AsyncChatDispatcher] = None):
+    """
+    Registra el handler de imágenes en el bot asíncrono.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+        image_analyzer: Analizador de imágenes
+        dispatcher: Orden por chat donde ejecutar el handler (opcional)
+    """
+    
+    async def process_album(messages: List[tlb.types.Message]):
+        """
+        Analiza las fotos de un álbum en una sola llamada (modo async).
+        
+        Args:
+            messages: Mensajes del álbum, en orden
+        """
+        first = messages[0]
+        try:
+            file_infos = await asyncio.gather(*(
+                bot.get_file(_pick_photo(album_message.photo).file_id)
+                for album_message in messages[:IMAGE_MEDIA_GROUP_MAX_IMAGES]
+            ))
+            images = await asyncio.gather(*(
+                bot.download_file(file_info.file_path) for file_info in file_infos
+            ))
+            
+            description = await image_analyzer.analyze_many_async(list(images), first.chat.id)
+            
+            if description:
+                await bot.reply_to(first, description + _album_notice(len(messages)),
+                                   parse_mode='Markdown')
+            else:
+                await bot.reply_to(
+                    first, 
+                    "❌ No pude analizar las imágenes. Por favor, intenta de nuevo."
+                )
+        
+        except Exception as e:
+            print(f"❌ Error al procesar el álbum: {e}")
+            await bot.reply_to(
+                first, 
+                "⚠️ Ocurrió un error al procesar tus imágenes. Intenta de nuevo."
+            )
+    
+    async def flush_album(messages: List[tlb.types.Message]):
+        """Al cerrarse la ventana, procesa el álbum en el turno de su chat."""
+        if dispatcher is None:
+            await process_album(messages)
+        else:
+            await dispatcher.run(messages[0].chat.id, process_album, messages)
+    
+    album_buffer = AsyncMediaGroupBuffer(flush_album)
+    
+    @bot.message_handler(content_types=['photo'])
+    @ordered_by_chat(dispatcher)
+    async def handle_photo(message: tlb.types.Message):
+        """
+        Procesa imágenes enviadas por el usuario (modo async).
+        
+        Args:
+            message: Mensaje con foto de Telegram
+        """
+        if message.media_group_id:
+            if album_buffer.add(message):
+                await bot.reply_to(message, "📸 Leyendo tus imágenes...")
+            return
+        
+        try:
+            photo = _pick_photo(message.photo)
+            cached = image_analyzer.cached_description(photo.file_unique_id)
+            if cached:
+                await bot.reply_to(message, cached, parse_mode='Markdown')
+                return
+            
+            await bot.reply_to(message, "📸 Leyendo tu imagen...")
+            
+            file_info = await bot.get_file(photo.file_id)
+            downloaded_file = await bot.download_file(file_info.file_path)
+            
+            description = await image_analyzer.analyze_async(
+                downloaded_file, photo.file_unique_id, message.chat.id
+            )
+            
+            if description:
+                await bot.reply_to(message, description, parse_mode='Markdown')
+            else:
+                await bot.reply_to(
+                    message, 
+                    "❌ No pude analizar la imagen. Por favor, intenta con otra imagen."
+                )
+        
+        except Exception as e:
+            print(f"❌ Error al procesar la imagen: {e}")
+            await bot.reply_to(
+                message, 
+                "⚠️ Ocurrió un error al procesar tu imagen. Intenta de nuevo."
+            )
+    
+    print("✅ Handler de imágenes (async) registrado")
@@ -1,10 +1,22 @@
+import asyncio
 import telebot as tlb
-from modules.groq_handler import GroqHandler
+from telebot.async_telebot import AsyncTeleBot
+from typing import Optional
+from modules.groq_handler import GroqHandler, StreamInterrupted
 from modules.sentiment import SentimentAnalyzer
+from modules.dispatcher import AsyncChatDispatcher, ChatDispatcher, ordered_by_chat
+from modules.metrics import register_stats
+from modules.streaming import AsyncStreamingReply, StreamingReply, streaming_stats
+from config import SENTIMENT_PIPELINE_ENABLED, SENTIMENT_INLINE_REPLY, STREAMING_ENABLED
+
+# Se agrega a la respuesta parcial si el stream se cortó y tampoco se pudo
+# obtener la respuesta completa
+INTERRUPTED_NOTICE = "\n\n⚠️ La respuesta se interrumpió. Por favor, intenta de nuevo."
 
 
 def register_text_handler(bot: tlb.TeleBot, groq_handler: GroqHandler, 
-                          sentiment_analyzer: SentimentAnalyzer, dataset: dict):
+                          sentiment_analyzer: SentimentAnalyzer, dataset: dict,
+                          dispatcher: Optional[ChatDispatcher] = None):
     """
     Registra el handler de mensajes de texto en el bot.
     
@@ -13,19 +25,32 @@ def register_text_handler(bot: tlb.TeleBot, groq_handler: GroqHandler,
         groq_handler: Handler para comunicación con Groq
         sentiment_analyzer: Analizador de sentimientos
         dataset: Dataset de la empresa
+        dispatcher: Pool ordenado por chat donde ejecutar el handler (opcional)
     """
+    if STREAMING_ENABLED:
+        register_stats("streaming", streaming_stats)
+    
+    def send_reply(message: tlb.types.Message, reply: Optional[StreamingReply], text: str):
+        """Envía la respuesta completa (edición final si hubo streaming)."""
+        if reply is not None:
+            reply.finish(text)
+        else:
+            bot.reply_to(message, text)
     
     @bot.message_handler(content_types=['text'])
+    @ordered_by_chat(dispatcher)
     def handle_text_message(message: tlb.types.Message):
         """
         Procesa mensajes de texto del usuario.
         
         Flujo:
         1. Valida que el dataset esté cargado
-        2. Obtiene respuesta del chatbot vía Groq
-        3. Envía la respuesta al usuario
-        4. Analiza el sentimiento del mensaje
-        5. Envía el análisis de sentimiento
+        2. Lanza el análisis de sentimiento en paralelo (modo pipeline)
+        3. Obtiene respuesta del chatbot vía Groq (en modo streaming se
+           envía apenas llega la primera oración y se va editando)
+        4. Envía la respuesta completa al usuario (con el sentimiento
+           incluido si SENTIMENT_INLINE_REPLY está activo)
+        5. Si no, envía el análisis de sentimiento en un segundo mensaje
         
         Args:
             message: Mensaje de Telegram recibido
@@ -38,18 +63,48 @@ def register_text_handler(bot: tlb.TeleBot, groq_handler: GroqHandler,
         # Indicar que está escribiendo
         bot.send_chat_action(message.chat.id, "typing")
         
-        # Obtener respuesta del chatbot
-        groq_response = groq_handler.get_response(message.text)
+        # Sentimiento en paralelo con la llamada al LLM
+        sentiment_future = None
+        if SENTIMENT_PIPELINE_ENABLED and sentiment_analyzer.is_ready:
+            sentiment_future = sentiment_analyzer.analyze_future(message.text)
         
-        if groq_response:
-            bot.reply_to(message, groq_response)
+        # Obtener respuesta del chatbot
+        reply = None
+        if STREAMING_ENABLED:
+            reply = StreamingReply(bot, message)
+            try:
+                for delta in groq_handler.stream_response(message.text, chat_id=message.chat.id):
+                    reply.feed(delta)
+                groq_response = reply.text.strip()
+            except StreamInterrupted as interrupted:
+                # Se pide la respuesta completa y reemplaza a la parcial; si
+                # tampoco se puede, se avisa del corte en el mismo mensaje
+                groq_response = (
+                    groq_handler.get_response(message.text, chat_id=message.chat.id)
+                    or f"{interrupted.partial.strip()}{INTERRUPTED_NOTICE}"
+                )
         else:
+            groq_response = groq_handler.get_response(message.text, chat_id=message.chat.id)
+        
+        if not groq_response:
             bot.reply_to(message, "Lo siento no pude procesar su solicitud de chat.")
             return
         
-        # Análisis de sentimiento
-        bot.send_chat_action(message.chat.id, "typing")
-        sentiment_result = sentiment_analyzer.analyze(message.text)
+        if sentiment_future is not None and SENTIMENT_INLINE_REPLY:
+            send_reply(message, reply, f"{groq_response}\n\n{sentiment_future.result()}")
+            return
+        
+        send_reply(message, reply, groq_response)
+        
+        # Análisis de sentimiento (se omite mientras el modelo termina de cargar)
+        if not sentiment_analyzer.is_ready:
+            return
+        
+        if sentiment_future is not None:
+            sentiment_result = sentiment_future.result()
+        else:
+            bot.send_chat_action(message.chat.id, "typing")
+            sentiment_result = sentiment_analyzer.analyze(message.text)
         bot.send_message(
             chat_id=message.chat.id,
             text=sentiment_result,
@@ -57,3 +112,94 @@ def register_text_handler(bot: tlb.TeleBot, groq_handler: GroqHandler,
         )
     
     print("✅ Handler de texto registrado")
+
+
+def register_text_handler_async(bot: AsyncTeleBot, groq_handler: GroqHandler,
+                                sentiment_analyzer: SentimentAnalyzer, dataset: dict,
+                                dispatcher: Optional[AsyncChatDispatcher] = None):
+    """
+    Registra el handler de mensajes de texto en el bot asíncrono.
+    
+    Mismo flujo que register_text_handler, pero sin bloquear el event loop:
+    las llamadas a Groq usan AsyncGroq y el sentimiento corre en un executor.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+        groq_handler: Handler para comunicación con Groq
+        sentiment_analyzer: Analizador de sentimientos
+        dataset: Dataset de la empresa
+        dispatcher: Orden por chat donde ejecutar el handler (opcional)
+    """
+    if STREAMING_ENABLED:
+        register_stats("streaming", streaming_stats)
+    
+    async def send_reply(message: tlb.types.Message, reply: Optional[AsyncStreamingReply],
+                         text: str):
+        """Envía la respuesta completa (edición final si hubo streaming)."""
+        if reply is not None:
+            await reply.finish(text)
+        else:
+            await bot.reply_to(message, text)
+    
+    @bot.message_handler(content_types=['text'])
+    @ordered_by_chat(dispatcher)
+    async def handle_text_message(message: tlb.types.Message):
+        """
+        Procesa mensajes de texto del usuario (modo async).
+        
+        Args:
+            message: Mensaje de Telegram recibido
+        """
+        if not dataset:
+            await bot.reply_to(message, "⚠️ No se cargo el dataset, intentar luego.")
+            return
+        
+        await bot.send_chat_action(message.chat.id, "typing")
+        
+        sentiment_task = None
+        if SENTIMENT_PIPELINE_ENABLED and sentiment_analyzer.is_ready:
+            sentiment_task = asyncio.create_task(sentiment_analyzer.analyze_async(message.text))
+        
+        reply = None
+        if STREAMING_ENABLED:
+            reply = AsyncStreamingReply(bot, message)
+            try:
+                async for delta in groq_handler.stream_response_async(message.text,
+                                                                      chat_id=message.chat.id):
+                    await reply.feed(delta)
+                groq_response = reply.text.strip()
+            except StreamInterrupted as interrupted:
+                groq_response = (
+                    await groq_handler.get_response_async(message.text, chat_id=message.chat.id)
+                    or f"{interrupted.partial.strip()}{INTERRUPTED_NOTICE}"
+                )
+        else:
+            groq_response = await groq_handler.get_response_async(message.text, chat_id=message.chat.id)
+        
+        if not groq_response:
+            if sentiment_task is not None:
+                sentiment_task.cancel()
+            await bot.reply_to(message, "Lo siento no pude procesar su solicitud de chat.")
+            return
+        
+        if sentiment_task is not None and SENTIMENT_INLINE_REPLY:
+            await send_reply(message, reply, f"{groq_response}\n\n{await sentiment_task}")
+            return
+        
+        await send_reply(message, reply, groq_response)
+        
+        if not sentiment_analyzer.is_ready:
+            return
+        
+        if sentiment_task is not None:
+            sentiment_result = await sentiment_task
+        else:
+            await bot.send_chat_action(message.chat.id, "typing")
+            sentiment_result = await sentiment_analyzer.analyze_async(message.text)
+        await bot.send_message(
+            chat_id=message.chat.id,
+            text=sentiment_result,
+            parse_mode='HTML'
+        )
+    
+    print("✅ Handler de texto (async) registrado")
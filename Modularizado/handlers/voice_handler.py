@@ -1,12 +1,17 @@
+import asyncio
 import telebot as tlb
+from telebot.async_telebot import AsyncTeleBot
+from typing import Optional
 from modules.voice_handler import VoiceTranscriber
 from modules.groq_handler import GroqHandler
 from modules.sentiment import SentimentAnalyzer
+from modules.dispatcher import AsyncChatDispatcher, ChatDispatcher, ordered_by_chat
+from config import SENTIMENT_PIPELINE_ENABLED, SENTIMENT_INLINE_REPLY
 
 
 def register_voice_handler(bot: tlb.TeleBot, voice_transcriber: VoiceTranscriber,
                           groq_handler: GroqHandler, sentiment_analyzer: SentimentAnalyzer,
-                          dataset: dict):
+                          dataset: dict, dispatcher: Optional[ChatDispatcher] = None):
     """
     Registra el handler de mensajes de voz en el bot.
     
@@ -16,9 +21,11 @@ def register_voice_handler(bot: tlb.TeleBot, voice_transcriber: VoiceTranscriber
         groq_handler: Handler para comunicación con Groq
         sentiment_analyzer: Analizador de sentimientos
         dataset: Dataset de la empresa
+        dispatcher: Pool ordenado por chat donde ejecutar el handler (opcional)
     """
     
     @bot.message_handler(content_types=['voice'])
+    @ordered_by_chat(dispatcher)
     def handle_voice_message(message: tlb.types.Message):
         """
         Procesa mensajes de voz del usuario.
@@ -27,10 +34,11 @@ def register_voice_handler(bot: tlb.TeleBot, voice_transcriber: VoiceTranscriber
         1. Valida que el dataset esté cargado
         2. Descarga el archivo de audio
         3. Transcribe el audio a texto
-        4. Obtiene respuesta del chatbot
-        5. Envía transcripción + respuesta
-        6. Analiza sentimiento de la transcripción
-        7. Envía análisis de sentimiento
+        4. Lanza el análisis de sentimiento en paralelo (modo pipeline)
+        5. Obtiene respuesta del chatbot
+        6. Envía transcripción + respuesta (con el sentimiento incluido si
+           SENTIMENT_INLINE_REPLY está activo)
+        7. Si no, envía el análisis de sentimiento en un segundo mensaje
         
         Args:
             message: Mensaje de voz de Telegram recibido
@@ -53,29 +61,134 @@ def register_voice_handler(bot: tlb.TeleBot, voice_transcriber: VoiceTranscriber
             return
         
         # Transcribir audio
-        transcription = voice_transcriber.transcribe(downloaded_file)
+        transcription = voice_transcriber.transcribe(
+            downloaded_file, duration=message.voice.duration
+        )
         
         if not transcription:
             bot.reply_to(message, "Lo siento, no pude transcribir tú mensaje 😔")
             return
         
+        # Sentimiento en paralelo con la llamada al LLM
+        sentiment_future = None
+        if SENTIMENT_PIPELINE_ENABLED and sentiment_analyzer.is_ready:
+            sentiment_future = sentiment_analyzer.analyze_future(transcription)
+        
         # Obtener respuesta del chatbot
-        groq_response = groq_handler.get_response(transcription)
+        groq_response = groq_handler.get_response(
+            transcription, chat_id=message.chat.id, source="voice"
+        )
         
-        if groq_response:
-            response_text = f"*Transcripción:* {transcription}\n\n{groq_response}"
-            bot.reply_to(message, response_text, parse_mode='Markdown')
-        else:
+        if not groq_response:
             bot.reply_to(message, "La consulta no pudo ser procesada")
             return
         
-        # Análisis de sentimiento
-        bot.send_chat_action(message.chat.id, "typing")
-        sentiment_result = sentiment_analyzer.analyze(transcription)
+        response_text = f"*Transcripción:* {transcription}\n\n{groq_response}"
+        if sentiment_future is not None and SENTIMENT_INLINE_REPLY:
+            response_text = f"{response_text}\n\n{sentiment_future.result()}"
+            bot.reply_to(message, response_text, parse_mode='Markdown')
+            return
+        
+        bot.reply_to(message, response_text, parse_mode='Markdown')
+        
+        # Análisis de sentimiento (se omite mientras el modelo termina de cargar)
+        if not sentiment_analyzer.is_ready:
+            return
+        
+        if sentiment_future is not None:
+            sentiment_result = sentiment_future.result()
+        else:
+            bot.send_chat_action(message.chat.id, "typing")
+            sentiment_result = sentiment_analyzer.analyze(transcription)
         bot.send_message(
             chat_id=message.chat.id,
             text=sentiment_result,
             parse_mode='Markdown'
         )
     
-    print("✅ Handler de voz registrado")
\ No newline at end of file
+    print("✅ Handler de voz registrado")
+
+
+def register_voice_handler_async(bot: AsyncTeleBot, voice_transcriber: VoiceTranscriber,
+                                 groq_handler: GroqHandler, sentiment_analyzer: SentimentAnalyzer,
+                                 dataset: dict, dispatcher: Optional[AsyncChatDispatcher] = None):
+    """
+    Registra el handler de mensajes de voz en el bot asíncrono.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+        voice_transcriber: Transcriptor de audio a texto
+        groq_handler: Handler para comunicación con Groq
+        sentiment_analyzer: Analizador de sentimientos
+        dataset: Dataset de la empresa
+        dispatcher: Orden por chat donde ejecutar el handler (opcional)
+    """
+    
+    @bot.message_handler(content_types=['voice'])
+    @ordered_by_chat(dispatcher)
+    async def handle_voice_message(message: tlb.types.Message):
+        """
+        Procesa mensajes de voz del usuario (modo async).
+        
+        Args:
+            message: Mensaje de voz de Telegram recibido
+        """
+        if not dataset:
+            await bot.reply_to(message, "⚠️ No está cargado el dataset.")
+            return
+        
+        await bot.send_chat_action(message.chat.id, 'typing')
+        
+        try:
+            file_info = await bot.get_file(message.voice.file_id)
+            downloaded_file = await bot.download_file(file_info.file_path)
+        except Exception as e:
+            print(f"❌ Error al descargar archivo de voz: {e}")
+            await bot.reply_to(message, "Error al descargar el archivo de voz.")
+            return
+        
+        transcription = await voice_transcriber.transcribe_async(
+            downloaded_file, duration=message.voice.duration
+        )
+        
+        if not transcription:
+            await bot.reply_to(message, "Lo siento, no pude transcribir tú mensaje 😔")
+            return
+        
+        sentiment_task = None
+        if SENTIMENT_PIPELINE_ENABLED and sentiment_analyzer.is_ready:
+            sentiment_task = asyncio.create_task(sentiment_analyzer.analyze_async(transcription))
+        
+        groq_response = await groq_handler.get_response_async(
+            transcription, chat_id=message.chat.id, source="voice"
+        )
+        
+        if not groq_response:
+            if sentiment_task is not None:
+                sentiment_task.cancel()
+            await bot.reply_to(message, "La consulta no pudo ser procesada")
+            return
+        
+        response_text = f"*Transcripción:* {transcription}\n\n{groq_response}"
+        if sentiment_task is not None and SENTIMENT_INLINE_REPLY:
+            response_text = f"{response_text}\n\n{await sentiment_task}"
+            await bot.reply_to(message, response_text, parse_mode='Markdown')
+            return
+        
+        await bot.reply_to(message, response_text, parse_mode='Markdown')
+        
+        if not sentiment_analyzer.is_ready:
+            return
+        
+        if sentiment_task is not None:
+            sentiment_result = await sentiment_task
+        else:
+            await bot.send_chat_action(message.chat.id, "typing")
+            sentiment_result = await sentiment_analyzer.analyze_async(transcription)
+        await bot.send_message(
+            chat_id=message.chat.id,
+            text=sentiment_result,
+            parse_mode='Markdown'
+        )
+    
+    print("✅ Handler de voz (async) registrado")
@@ -1,14 +1,44 @@
-import json
 import time
+
+# Referencia para medir el arranque, incluido el tiempo de los imports
+_PROCESS_START = time.perf_counter()
+
+import json
+import asyncio
+import threading
+from typing import Optional
 import telebot as tlb
-from config import TELEGRAM_TOKEN, DATASET_PATH
+from telebot import apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from config import (
+    TELEGRAM_TOKEN,
+    TELEGRAM_API_URL,
+    DATASET_PATH,
+    RUNTIME_MODE,
+    UPDATE_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    GROQ_WARMUP_ENABLED,
+    STATS_LOG_INTERVAL_SECONDS
+)
 from modules.sentiment import SentimentAnalyzer
 from modules.groq_handler import GroqHandler
 from modules.voice_handler import VoiceTranscriber
 from modules.image_handler import ImageAnalyzer
-from handlers.text_handler import register_text_handler
-from handlers.voice_handler import register_voice_handler
-from handlers.image_handler import register_image_handler
+from modules.groq_client import warm_up, warm_up_async
+from modules.webhook_server import WebhookServer
+from modules.dispatcher import AsyncChatDispatcher, ChatDispatcher, ordered_by_chat
+from modules.metrics import log_stats, start_stats_logger
+from modules.startup import StartupTimer
+from handlers.text_handler import register_text_handler, register_text_handler_async
+from handlers.voice_handler import register_voice_handler, register_voice_handler_async
+from handlers.image_handler import register_image_handler, register_image_handler_async
+
+
+WELCOME_PROMPT = (
+    "Genera un mensaje de bienvenida para la tienda de Samsung, "
+    "que incluya una breve descripción de la empresa."
+)
 
 
 def load_dataset():
@@ -32,8 +62,206 @@ def load_dataset():
         return None
 
 
+def register_welcome_handler(bot: tlb.TeleBot, groq_handler: GroqHandler,
+                             dispatcher: Optional[ChatDispatcher] = None):
+    """
+    Registra el comando de bienvenida (/start, /help).
+    
+    Args:
+        bot: Instancia del bot de Telegram
+        groq_handler: Handler para comunicación con Groq
+        dispatcher: Pool ordenado por chat donde ejecutar el handler (opcional)
+    """
+    
+    @bot.message_handler(commands=["start", "help"])
+    @ordered_by_chat(dispatcher)
+    def send_welcome(message: tlb.types.Message):
+        """Genera y envía un mensaje de bienvenida."""
+        bot.send_chat_action(message.chat.id, "typing")
+        response = groq_handler.get_response(
+            WELCOME_PROMPT, chat_id=message.chat.id, source="welcome"
+        )
+        
+        if response:
+            bot.reply_to(message, response)
+        else:
+            bot.reply_to(message, "Lo siento no pude procesar su mensaje.")
+
+
+def register_welcome_handler_async(bot: AsyncTeleBot, groq_handler: GroqHandler,
+                                   dispatcher: Optional[AsyncChatDispatcher] = None):
+    """
+    Registra el comando de bienvenida en el bot asíncrono.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+        groq_handler: Handler para comunicación con Groq
+        dispatcher: Orden por chat donde ejecutar el handler (opcional)
+    """
+    
+    @bot.message_handler(commands=["start", "help"])
+    @ordered_by_chat(dispatcher)
+    async def send_welcome(message: tlb.types.Message):
+        """Genera y envía un mensaje de bienvenida."""
+        await bot.send_chat_action(message.chat.id, "typing")
+        response = await groq_handler.get_response_async(
+            WELCOME_PROMPT, chat_id=message.chat.id, source="welcome"
+        )
+        
+        if response:
+            await bot.reply_to(message, response)
+        else:
+            await bot.reply_to(message, "Lo siento no pude procesar su mensaje.")
+
+
+def run_polling(bot: tlb.TeleBot):
+    """
+    Loop principal de polling con reinicio ante errores (modo sync).
+    
+    Args:
+        bot: Instancia del bot de Telegram
+    """
+    while True:
+        try:
+            bot.polling(none_stop=True, interval=0, timeout=20)
+        except KeyboardInterrupt:
+            print("\n\n🛑 Bot detenido por el usuario")
+            log_stats()
+            print("Hasta pronto! 👋")
+            break
+        except Exception as e:
+            print(f"\n⚠️  Error en polling: {str(e)}")
+            print("🔄 Reiniciando el bot en 5 segundos...")
+            time.sleep(1)
+
+
+async def run_polling_async(bot: AsyncTeleBot):
+    """
+    Loop principal de polling sobre asyncio (modo async).
+    
+    Cada update se procesa como una tarea independiente, por lo que una
+    completion lenta no frena al resto de los chats.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+    """
+    try:
+        while True:
+            try:
+                await bot.polling(non_stop=True, interval=0, timeout=20)
+                break
+            except Exception as e:
+                print(f"\n⚠️  Error en polling: {str(e)}")
+                print("🔄 Reiniciando el bot en 5 segundos...")
+                await asyncio.sleep(1)
+    finally:
+        await bot.close_session()
+
+
+def run_webhook(bot: tlb.TeleBot):
+    """
+    Recibe updates por webhook en lugar de long polling (modo sync).
+    
+    Los updates se entregan a bot.process_new_updates, el mismo registro
+    de handlers que usa el polling.
+    
+    Args:
+        bot: Instancia del bot de Telegram
+    """
+    if WEBHOOK_URL:
+        bot.remove_webhook()
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN)
+        print(f"✅ Webhook registrado en Telegram: {WEBHOOK_URL}")
+    
+    server = WebhookServer(bot.process_new_updates)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n\n🛑 Bot detenido por el usuario")
+        log_stats()
+        print("Hasta pronto! 👋")
+    finally:
+        server.stop()
+
+
+async def run_webhook_async(bot: AsyncTeleBot):
+    """
+    Recibe updates por webhook en lugar de long polling (modo async).
+    
+    El servidor HTTP corre en su propio hilo y agenda cada update como
+    corrutina en el event loop del bot.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+    """
+    loop = asyncio.get_running_loop()
+    
+    def process_updates(updates: list):
+        asyncio.run_coroutine_threadsafe(bot.process_new_updates(updates), loop)
+    
+    if WEBHOOK_URL:
+        await bot.remove_webhook()
+        await bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN)
+        print(f"✅ Webhook registrado en Telegram: {WEBHOOK_URL}")
+    
+    server = WebhookServer(process_updates)
+    server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+        await bot.close_session()
+
+
+async def run_async(bot: AsyncTeleBot, runner):
+    """
+    Arranca el runner async, precalentando antes la conexión con Groq en
+    el mismo event loop que la va a usar.
+    
+    Args:
+        bot: Instancia del bot asíncrono de Telegram
+        runner: run_polling_async o run_webhook_async
+    """
+    warmup = asyncio.create_task(warm_up_async()) if GROQ_WARMUP_ENABLED else None
+    try:
+        await runner(bot)
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+
+
+def track_first_poll(bot, timer: StartupTimer):
+    """
+    Marca la fase "first_poll" cuando el bot hace su primer getUpdates
+    e imprime el resumen de tiempos de arranque.
+    
+    Args:
+        bot: Instancia del bot (TeleBot o AsyncTeleBot)
+        timer: Temporizador del arranque
+    """
+    get_updates = bot.get_updates
+    
+    def mark():
+        if not timer.has("first_poll"):
+            timer.mark("first_poll")
+            print(f"⏱️  Tiempos de arranque:\n{timer.report()}")
+    
+    if RUNTIME_MODE == "async":
+        async def tracked_get_updates(*args, **kwargs):
+            mark()
+            return await get_updates(*args, **kwargs)
+    else:
+        def tracked_get_updates(*args, **kwargs):
+            mark()
+            return get_updates(*args, **kwargs)
+    
+    bot.get_updates = tracked_get_updates
+
+
 def main():
     """Función principal del bot."""
+    timer = StartupTimer(_PROCESS_START)
+    timer.mark("imports")
     print("=" * 50)
     print("Iniciando Samsung Bot...")
     print("=" * 50)
@@ -45,57 +273,76 @@ def main():
         print("❌ No se pudo cargar el dataset. Abortando...")
         return
     print(f"✅ Dataset cargado: {dataset.get('company_info', {}).get('name', 'Samsung')}")
+    timer.mark("dataset")
     
     # Inicializar bot de Telegram
     print("\n[2/5] Conectando con Telegram...")
+    if TELEGRAM_API_URL:
+        apihelper.API_URL = TELEGRAM_API_URL
+        asyncio_helper.API_URL = TELEGRAM_API_URL
+        print(f"⚠️  Usando Bot API alternativa: {TELEGRAM_API_URL}")
     try:
-        bot = tlb.TeleBot(TELEGRAM_TOKEN)
-        print("✅ Bot de Telegram conectado")
+        if RUNTIME_MODE == "async":
+            bot = AsyncTeleBot(TELEGRAM_TOKEN)
+        else:
+            # Sin el pool interno de telebot: el despacho (orden por chat y
+            # concurrencia) lo controla ChatDispatcher
+            bot = tlb.TeleBot(TELEGRAM_TOKEN, threaded=False)
+        print(f"✅ Bot de Telegram conectado (modo {RUNTIME_MODE})")
     except Exception as e:
         print(f"❌ Error al conectar con Telegram: {e}")
         return
+    timer.mark("telegram")
     
     # Inicializar módulos
     print("\n[3/5] Inicializando módulos de IA...")
     try:
-        sentiment_analyzer = SentimentAnalyzer()
+        # El modelo de sentimiento carga en segundo plano: el bot ya responde
+        # consultas al LLM y el sentimiento se omite hasta que esté listo
+        model_started = time.perf_counter()
+        sentiment_analyzer = SentimentAnalyzer(
+            background=True,
+            on_ready=lambda: timer.mark("sentiment_model", since=model_started)
+        )
         groq_handler = GroqHandler(dataset)
         voice_transcriber = VoiceTranscriber()
         image_analyzer = ImageAnalyzer()
+        if GROQ_WARMUP_ENABLED and RUNTIME_MODE != "async":
+            threading.Thread(target=warm_up, name="groq-warmup", daemon=True).start()
         print("✅ Todos los módulos inicializados correctamente")
     except Exception as e:
         print(f"❌ Error al inicializar módulos: {e}")
         return
-    
-    # Registrar comando de bienvenida
-    @bot.message_handler(commands=["start", "help"])
-    def send_welcome(message: tlb.types.Message):
-        """Genera y envía un mensaje de bienvenida."""
-        bot.send_chat_action(message.chat.id, "typing")
-        welcome_prompt = (
-            "Genera un mensaje de bienvenida para la tienda de Samsung, "
-            "que incluya una breve descripción de la empresa."
-        )
-        response = groq_handler.get_response(welcome_prompt)
-        
-        if response:
-            bot.reply_to(message, response)
-        else:
-            bot.reply_to(message, "Lo siento no pude procesar su mensaje.")
+    timer.mark("modules")
     
     # Registrar handlers
     print("\n[4/5] Registrando handlers de mensajes...")
     try:
-        register_text_handler(bot, groq_handler, sentiment_analyzer, dataset)
-        register_voice_handler(bot, voice_transcriber, groq_handler, sentiment_analyzer, dataset)
-        register_image_handler(bot, image_analyzer)
+        if RUNTIME_MODE == "async":
+            # AsyncTeleBot corre cada update como una tarea aparte: el orden
+            # por chat lo garantiza AsyncChatDispatcher
+            dispatcher = AsyncChatDispatcher()
+            register_welcome_handler_async(bot, groq_handler, dispatcher)
+            register_text_handler_async(bot, groq_handler, sentiment_analyzer, dataset, dispatcher)
+            register_voice_handler_async(bot, voice_transcriber, groq_handler,
+                                         sentiment_analyzer, dataset, dispatcher)
+            register_image_handler_async(bot, image_analyzer, dispatcher)
+        else:
+            dispatcher = ChatDispatcher()
+            register_welcome_handler(bot, groq_handler, dispatcher)
+            register_text_handler(bot, groq_handler, sentiment_analyzer, dataset, dispatcher)
+            register_voice_handler(bot, voice_transcriber, groq_handler, sentiment_analyzer,
+                                   dataset, dispatcher)
+            register_image_handler(bot, image_analyzer, dispatcher)
         print("✅ Handlers registrados correctamente")
     except Exception as e:
         print(f"❌ Error al registrar handlers: {e}")
         return
+    timer.mark("handlers")
+    track_first_poll(bot, timer)
     
     # Iniciar bot
-    print("\n[5/5] Iniciando polling...")
+    print(f"\n[5/5] Iniciando {UPDATE_MODE}...")
     print("=" * 50)
     print(f"Bot de {dataset['company_info']['name']} ACTIVO")
     print("=" * 50)
@@ -105,18 +352,25 @@ def main():
     print("   • Análisis de imágenes de productos")
     print("\n⚠️  Presiona Ctrl+C para detener el bot\n")
     
+    if UPDATE_MODE == "webhook":
+        print(f"⏱️  Tiempos de arranque:\n{timer.report()}")
+    
+    # Métricas periódicas en el log (en polling no hay GET /stats)
+    start_stats_logger(STATS_LOG_INTERVAL_SECONDS)
+    
     # Loop principal con manejo de errores
-    while True:
+    if RUNTIME_MODE == "async":
+        runner = run_webhook_async if UPDATE_MODE == "webhook" else run_polling_async
         try:
-            bot.polling(none_stop=True, interval=0, timeout=20)
+            asyncio.run(run_async(bot, runner))
         except KeyboardInterrupt:
             print("\n\n🛑 Bot detenido por el usuario")
+            log_stats()
             print("Hasta pronto! 👋")
-            break
-        except Exception as e:
-            print(f"\n⚠️  Error en polling: {str(e)}")
-            print("🔄 Reiniciando el bot en 5 segundos...")
-            time.sleep(1)
+    elif UPDATE_MODE == "webhook":
+        run_webhook(bot)
+    else:
+        run_polling(bot)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+import io
+import re
+from typing import List, Tuple
+import numpy as np
+from config import (
+    VOICE_CHUNK_TARGET_SECONDS,
+    VOICE_CHUNK_MAX_SECONDS,
+    VOICE_CHUNK_OVERLAP_SECONDS,
+    VOICE_SILENCE_FRAME_MS,
+    VOICE_SILENCE_THRESHOLD_DB,
+    VOICE_TRIM_PADDING_MS,
+    VOICE_MAX_PAUSE_SECONDS,
+    VOICE_UPLOAD_BITRATE
+)
+from modules.retrieval import normalize
+
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+
+
+def decode(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decodifica un audio comprimido (OGG/Opus de Telegram, MP3, WAV...) a PCM.
+
+    torchaudio se importa recién acá para no sumar su carga al arranque.
+
+    Args:
+        data (bytes): Archivo de audio completo
+
+    Returns:
+        tuple: (muestras mono float32 en [-1, 1], frecuencia de muestreo)
+    """
+    import torchaudio
+
+    waveform, sample_rate = torchaudio.load(io.BytesIO(data))
+    samples = waveform.mean(dim=0).numpy().astype(np.float32)
+    return samples, int(sample_rate)
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int,
+                    frame_ms: int = VOICE_SILENCE_FRAME_MS) -> np.ndarray:
+    """
+    Energía RMS por ventana, en dB relativos a la ventana más fuerte.
+
+    La referencia no baja de -60 dBFS, así un audio mudo (o casi) queda
+    entero por debajo del umbral en lugar de normalizarse contra sí mismo.
+
+    Args:
+        samples (np.ndarray): Muestras mono
+        sample_rate (int): Frecuencia de muestreo
+        frame_ms (int): Tamaño de cada ventana en milisegundos
+
+    Returns:
+        np.ndarray: Un valor (<= 0 dB) por ventana
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    count = -(-len(samples) // frame)
+    padded = np.zeros(count * frame, dtype=np.float32)
+    padded[:len(samples)] = samples
+    rms = np.sqrt(np.mean(padded.reshape(count, frame) ** 2, axis=1))
+    reference = max(float(rms.max()), 1e-3)
+    return 20 * np.log10(np.maximum(rms, 1e-10) / reference)
+
+
+def split_on_silence(samples: np.ndarray, sample_rate: int,
+                     target_seconds: float = VOICE_CHUNK_TARGET_SECONDS,
+                     max_seconds: float = VOICE_CHUNK_MAX_SECONDS,
+                     overlap_seconds: float = VOICE_CHUNK_OVERLAP_SECONDS,
+                     frame_ms: int = VOICE_SILENCE_FRAME_MS,
+                     threshold_db: float = VOICE_SILENCE_THRESHOLD_DB) -> List[Tuple[int, int]]:
+    """
+    Corta el audio en fragmentos de ~target_seconds, en pausas del habla.
+
+    Cada corte se busca entre 2/3 del largo objetivo y el largo máximo:
+    se elige la ventana silenciosa más cercana al objetivo. Si en ese tramo
+    no hay silencio se corta en la ventana más baja y el fragmento siguiente
+    arranca overlap_seconds antes, para no perder la palabra cortada (el
+    texto repetido se descarta al unir con merge_transcripts).
+
+    Args:
+        samples (np.ndarray): Muestras mono
+        sample_rate (int): Frecuencia de muestreo
+        target_seconds (float): Largo objetivo de cada fragmento
+        max_seconds (float): Largo máximo de cada fragmento
+        overlap_seconds (float): Solapamiento cuando el corte no cae en silencio
+        frame_ms (int): Tamaño de ventana para medir energía
+        threshold_db (float): Energía (dB relativos al pico) considerada silencio
+
+    Returns:
+        list: Tuplas (inicio, fin) en muestras, en orden
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(samples, sample_rate, frame_ms)
+    total = len(samples)
+    max_length = int(max_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+
+    segments = []
+    start = 0
+    while total - start > max_length:
+        first = (start + int(target_seconds * sample_rate * 2 / 3)) // frame
+        last = (start + max_length) // frame
+        target = (start + int(target_seconds * sample_rate)) // frame
+        window = energy[first:last]
+        silent = np.flatnonzero(window < threshold_db)
+
+        if silent.size:
+            best = first + int(silent[np.argmin(np.abs(first + silent - target))])
+            cut = best * frame + frame // 2
+            next_start = cut
+        else:
+            best = first + int(np.argmin(window))
+            cut = best * frame + frame // 2
+            next_start = max(start + 1, cut - overlap)
+
+        segments.append((start, cut))
+        start = next_start
+
+    segments.append((start, total))
+    return segments
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Remuestrea el audio (Whisper trabaja internamente a 16 kHz).
+
+    Args:
+        samples (np.ndarray): Muestras mono
+        sample_rate (int): Frecuencia de muestreo original
+        target_rate (int): Frecuencia de muestreo deseada
+
+    Returns:
+        np.ndarray: Muestras mono float32 a target_rate
+    """
+    if sample_rate == target_rate:
+        return samples
+
+    import torch
+    import torchaudio.functional
+
+    resampled = torchaudio.functional.resample(
+        torch.from_numpy(samples), sample_rate, target_rate
+    )
+    return resampled.numpy().astype(np.float32)
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int,
+                 max_pause_seconds: float = VOICE_MAX_PAUSE_SECONDS,
+                 padding_ms: int = VOICE_TRIM_PADDING_MS,
+                 frame_ms: int = VOICE_SILENCE_FRAME_MS,
+                 threshold_db: float = VOICE_SILENCE_THRESHOLD_DB) -> np.ndarray:
+    """
+    Recorta silencios con detección de voz por energía.
+
+    Se quitan por completo el silencio inicial y final, y las pausas
+    internas más largas que max_pause_seconds se acortan a esa duración
+    (mitad al principio y mitad al final de la pausa). Alrededor de cada
+    tramo con voz se conserva padding_ms para no comer sílabas débiles.
+
+    Args:
+        samples (np.ndarray): Muestras mono
+        sample_rate (int): Frecuencia de muestreo
+        max_pause_seconds (float): Duración máxima de una pausa interna
+        padding_ms (int): Margen a conservar alrededor de la voz
+        frame_ms (int): Tamaño de ventana para medir energía
+        threshold_db (float): Energía (dB relativos al pico) considerada silencio
+
+    Returns:
+        np.ndarray: Muestras recortadas (vacío si no hay voz)
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    voiced = frame_energy_db(samples, sample_rate, frame_ms) >= threshold_db
+    if not voiced.any():
+        return samples[:0]
+
+    padding = int(padding_ms / frame_ms)
+    keep = np.convolve(voiced, np.ones(2 * padding + 1), mode="same") > 0
+
+    # Tramos de silencio internos: de True->False a False->True
+    changes = np.diff(keep.astype(np.int8))
+    gap_starts = np.flatnonzero(changes == -1) + 1
+    gap_ends = np.flatnonzero(changes == 1) + 1
+    gap_ends = gap_ends[gap_ends > gap_starts[0]] if gap_starts.size else gap_ends
+    max_gap = int(max_pause_seconds * 1000 / frame_ms)
+    head = max_gap // 2
+    for gap_start, gap_end in zip(gap_starts, gap_ends):
+        if gap_end - gap_start <= max_gap:
+            keep[gap_start:gap_end] = True
+        else:
+            keep[gap_start:gap_start + head] = True
+            keep[gap_end - (max_gap - head):gap_end] = True
+
+    mask = np.repeat(keep, frame)[:len(samples)]
+    return samples[mask]
+
+
+def encode_opus(samples: np.ndarray, sample_rate: int,
+                bit_rate: int = VOICE_UPLOAD_BITRATE) -> bytes:
+    """
+    Codifica muestras mono como OGG/Opus (en memoria), el mismo códec de
+    las notas de voz de Telegram: un archivo sin pérdida (FLAC, WAV) pesa
+    varias veces más por segundo y anularía el ahorro del recorte.
+
+    Args:
+        samples (np.ndarray): Muestras mono en [-1, 1]
+        sample_rate (int): Frecuencia de muestreo (Opus acepta 8, 12, 16,
+            24 o 48 kHz)
+        bit_rate (int): Bitrate objetivo en bits por segundo
+
+    Returns:
+        bytes: Archivo OGG completo
+    """
+    import torch
+    from torchaudio.io import CodecConfig, StreamWriter
+
+    buffer = io.BytesIO()
+    writer = StreamWriter(buffer, format="ogg")
+    writer.add_audio_stream(sample_rate, 1, format="flt", encoder="libopus",
+                            codec_config=CodecConfig(bit_rate=bit_rate))
+    with writer.open():
+        writer.write_audio_chunk(0, torch.from_numpy(np.clip(samples, -1.0, 1.0)).unsqueeze(1))
+    return buffer.getvalue()
+
+
+def merge_transcripts(parts: List[str], max_overlap_words: int = 12) -> str:
+    """
+    Une las transcripciones de fragmentos consecutivos.
+
+    Cuando dos fragmentos se solapan, el final de uno y el principio del
+    siguiente repiten las mismas palabras: se busca la coincidencia más
+    larga (2+ palabras, ignorando mayúsculas, acentos y puntuación) y se
+    descarta del segundo.
+
+    Args:
+        parts (list): Textos de cada fragmento, en orden
+        max_overlap_words (int): Palabras máximas a comparar en cada unión
+
+    Returns:
+        str: Transcripción completa
+    """
+    words = []
+    for part in parts:
+        incoming = part.split()
+        previous = [_PUNCTUATION.sub("", normalize(word)) for word in words[-max_overlap_words:]]
+        current = [_PUNCTUATION.sub("", normalize(word)) for word in incoming[:max_overlap_words]]
+
+        repeated = 0
+        for size in range(min(len(previous), len(current)), 1, -1):
+            if previous[-size:] == current[:size]:
+                repeated = size
+                break
+        words.extend(incoming[repeated:])
+    return " ".join(words)
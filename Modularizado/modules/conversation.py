@@ -0,0 +1,294 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from config import (
+    CONVERSATION_HISTORY_TOKEN_BUDGET,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_TURN_MAX_TOKENS,
+    CONVERSATION_SUMMARY_MAX_TOKENS,
+    CONVERSATION_MAX_CHATS,
+    CONVERSATION_IDLE_TTL_SECONDS,
+    CONVERSATION_DB_FILE
+)
+from modules.lru import LRUCache
+from modules.tokens import estimate_tokens, truncate_to_tokens
+
+# (resumen anterior, mensajes que salieron del buffer) -> resumen nuevo
+Summarizer = Callable[[str, List[dict]], str]
+
+
+class Conversation:
+    """
+    Memoria de un chat: los últimos mensajes (buffer circular acotado por
+    tokens) y un resumen de todo lo anterior.
+
+    Attributes:
+        turns: Mensajes recientes {"role", "content", "tokens"}
+        summary: Resumen de los mensajes que salieron del buffer
+        pending: Mensajes que salieron del buffer y todavía no se resumieron
+        summarizing: Si hay un resumen en curso para este chat
+    """
+
+    def __init__(self, summary: str = "", turns: Optional[List[dict]] = None):
+        self.turns = deque(turns or ())
+        self.summary = summary
+        self.pending = []
+        self.summarizing = False
+
+    def add(self, role: str, content: str):
+        """Agrega un mensaje recortado a CONVERSATION_TURN_MAX_TOKENS."""
+        content = truncate_to_tokens(content, CONVERSATION_TURN_MAX_TOKENS)
+        self.turns.append({"role": role, "content": content, "tokens": estimate_tokens(content)})
+
+    def roll(self, token_budget: int, max_turns: int) -> bool:
+        """
+        Saca los mensajes más viejos hasta volver al presupuesto.
+
+        Args:
+            token_budget (int): Tokens máximos de los mensajes recientes
+            max_turns (int): Mensajes máximos en el buffer
+
+        Returns:
+            bool: True si salió algún mensaje (hay que actualizar el resumen)
+        """
+        rolled = False
+        tokens = sum(turn["tokens"] for turn in self.turns)
+        while self.turns and (tokens > token_budget or len(self.turns) > max_turns):
+            turn = self.turns.popleft()
+            tokens -= turn["tokens"]
+            self.pending.append(turn)
+            rolled = True
+        return rolled
+
+
+class ConversationStore:
+    """
+    Memoria de conversación por chat, de tamaño acotado.
+
+    Cada request lleva como mucho CONVERSATION_HISTORY_TOKEN_BUDGET tokens
+    de mensajes recientes más un resumen de CONVERSATION_SUMMARY_MAX_TOKENS,
+    sin importar cuánto dure la conversación. Los mensajes que salen del
+    buffer se incorporan al resumen en segundo plano (con el modelo chico
+    vía summarizer, o de forma extractiva si no hay o falla).
+
+    En memoria se guardan hasta CONVERSATION_MAX_CHATS chats con desalojo
+    LRU, y un chat inactivo por CONVERSATION_IDLE_TTL_SECONDS se olvida.
+    Opcionalmente los chats se persisten en SQLite y se recuperan al
+    volver a escribir después de un reinicio o un desalojo.
+
+    Attributes:
+        summarizer: Función que actualiza el resumen (None = extractivo)
+        db_path: Base SQLite de persistencia (None = solo memoria)
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None,
+                 max_chats: int = CONVERSATION_MAX_CHATS,
+                 idle_ttl: float = CONVERSATION_IDLE_TTL_SECONDS,
+                 db_path: Optional[str] = CONVERSATION_DB_FILE):
+        """
+        Inicializa el store y abre la base de persistencia.
+
+        Args:
+            summarizer: Función (resumen anterior, mensajes) -> resumen nuevo
+            max_chats (int): Chats máximos en memoria
+            idle_ttl (float): Segundos de inactividad tras los que se olvida un chat
+            db_path (str): Base SQLite de persistencia (None = solo memoria)
+        """
+        self.summarizer = summarizer
+        self.idle_ttl = idle_ttl
+        self.db_path = db_path
+        self._chats = LRUCache(max_chats, idle_ttl)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+        self._summaries = 0
+        self._summary_failures = 0
+        self._restored = 0
+        self._db = None
+        if db_path:
+            self._open_db()
+
+    def messages(self, chat_id: int) -> List[dict]:
+        """
+        Historial a enviar antes del mensaje actual.
+
+        Args:
+            chat_id (int): Id del chat de Telegram
+
+        Returns:
+            list: Mensajes para el endpoint de chat (un system con el
+            resumen, si hay, y los mensajes recientes); vacía si el chat
+            no tiene historial
+        """
+        with self._lock:
+            conversation = self._get(chat_id)
+            if conversation is None:
+                return []
+            history = [{"role": turn["role"], "content": turn["content"]} for turn in conversation.turns]
+            if conversation.summary:
+                history.insert(0, {
+                    "role": "system",
+                    "content": f"Resumen de la conversación anterior con este cliente:\n{conversation.summary}"
+                })
+        return history
+
+    def append(self, chat_id: int, user_message: Optional[str], response: str):
+        """
+        Guarda un intercambio y, si el buffer se pasa del presupuesto,
+        manda los mensajes más viejos a resumir en segundo plano.
+
+        Args:
+            chat_id (int): Id del chat de Telegram
+            user_message (str): Mensaje del usuario (None = solo se guarda
+                la respuesta, ej: la bienvenida)
+            response (str): Respuesta enviada
+        """
+        with self._lock:
+            conversation = self._get(chat_id) or Conversation()
+            if user_message is not None:
+                conversation.add("user", user_message)
+            conversation.add("assistant", response)
+            rolled = conversation.roll(CONVERSATION_HISTORY_TOKEN_BUDGET, CONVERSATION_MAX_TURNS)
+            start_summary = rolled and not conversation.summarizing
+            if start_summary:
+                conversation.summarizing = True
+            self._chats.put(chat_id, conversation)
+            self._persist(chat_id, conversation)
+
+        if start_summary:
+            self._executor.submit(self._summarize, chat_id, conversation)
+
+    def _get(self, chat_id: int) -> Optional[Conversation]:
+        """Busca el chat en memoria o en SQLite (con self._lock tomado)."""
+        conversation = self._chats.get(chat_id)
+        if conversation is None and self._db is not None:
+            conversation = self._load(chat_id)
+            if conversation is not None:
+                self._restored += 1
+                self._chats.put(chat_id, conversation)
+        return conversation
+
+    def _summarize(self, chat_id: int, conversation: Conversation):
+        """Incorpora al resumen los mensajes pendientes (en segundo plano)."""
+        while True:
+            with self._lock:
+                turns, conversation.pending = conversation.pending, []
+                summary = conversation.summary
+                if not turns:
+                    conversation.summarizing = False
+                    self._persist(chat_id, conversation)
+                    return
+
+            summary = self._roll_summary(summary, turns)
+            with self._lock:
+                conversation.summary = summary
+                self._summaries += 1
+
+    def _roll_summary(self, summary: str, turns: List[dict]) -> str:
+        """
+        Resumen nuevo a partir del anterior y los mensajes que salieron.
+
+        Returns:
+            str: Resumen de como mucho CONVERSATION_SUMMARY_MAX_TOKENS tokens
+        """
+        if self.summarizer is not None:
+            try:
+                rolled = self.summarizer(summary, turns)
+                if rolled:
+                    return truncate_to_tokens(rolled.strip(), CONVERSATION_SUMMARY_MAX_TOKENS)
+            except Exception as e:
+                print(f"⚠️  No se pudo resumir la conversación: {e}")
+            with self._lock:
+                self._summary_failures += 1
+        return self._extractive_summary(summary, turns)
+
+    @staticmethod
+    def _extractive_summary(summary: str, turns: List[dict]) -> str:
+        """
+        Resumen sin modelo: las consultas del cliente en una línea cada una,
+        descartando las más viejas cuando no entran.
+        """
+        lines = summary.splitlines() if summary else []
+        lines += [
+            f"- El cliente preguntó: {truncate_to_tokens(turn['content'], 30)}"
+            for turn in turns if turn["role"] == "user"
+        ]
+        while lines and estimate_tokens("\n".join(lines)) > CONVERSATION_SUMMARY_MAX_TOKENS:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _open_db(self):
+        """Abre (o crea) la base SQLite y borra los chats vencidos."""
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "chat_id INTEGER PRIMARY KEY, summary TEXT NOT NULL, "
+                "turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "DELETE FROM conversations WHERE updated_at < ?",
+                (time.time() - self.idle_ttl,)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Memoria de conversación sin persistencia: {e}")
+            self._db = None
+
+    def _load(self, chat_id: int) -> Optional[Conversation]:
+        """Recupera un chat de SQLite si no está vencido (con self._lock tomado)."""
+        try:
+            row = self._db.execute(
+                "SELECT summary, turns FROM conversations WHERE chat_id = ? AND updated_at >= ?",
+                (chat_id, time.time() - self.idle_ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo leer la conversación {chat_id}: {e}")
+            return None
+        if row is None:
+            return None
+        return Conversation(row[0], json.loads(row[1]))
+
+    def _persist(self, chat_id: int, conversation: Conversation):
+        """Escribe un chat en SQLite, si la persistencia está activa (con self._lock tomado)."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)",
+                (chat_id, conversation.summary,
+                 json.dumps(list(conversation.turns), ensure_ascii=False), time.time())
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo guardar la conversación {chat_id}: {e}")
+
+    def stats(self) -> dict:
+        """
+        Métricas de la memoria de conversación.
+
+        Returns:
+            dict: Chats en memoria, desalojos, resúmenes generados y fallidos,
+            chats recuperados de SQLite y tokens promedio de historial por chat
+        """
+        chats = self._chats.items()
+        history_tokens = [
+            sum(turn["tokens"] for turn in conversation.turns) + estimate_tokens(conversation.summary)
+            for _, conversation in chats
+        ]
+        cache = self._chats.stats()
+        with self._lock:
+            return {
+                "chats": len(chats),
+                "max_chats": cache["max_entries"],
+                "evictions": cache["evictions"],
+                "summaries": self._summaries,
+                "summary_failures": self._summary_failures,
+                "restored": self._restored,
+                "avg_history_tokens": (
+                    round(sum(history_tokens) / len(history_tokens), 1) if history_tokens else 0
+                )
+            }
@@ -0,0 +1,246 @@
+import asyncio
+import functools
+import queue
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from config import DISPATCHER_WORKERS, DISPATCHER_QUEUE_SIZE
+from modules.metrics import register_stats
+
+
+class ChatDispatcher:
+    """
+    Pool acotado de workers que ejecuta los handlers particionados por chat.
+
+    Cada chat se asigna siempre al mismo worker (chat_id % workers), así los
+    mensajes de un mismo chat se procesan estrictamente en orden mientras
+    que chats distintos avanzan en paralelo. Cada worker tiene una cola
+    acotada: si se llena, quien encola se bloquea (backpressure sobre el
+    polling/webhook) en lugar de acumular memoria sin límite.
+
+    Attributes:
+        workers: Cantidad de workers
+        queue_size: Capacidad de la cola de cada worker
+    """
+
+    def __init__(self, workers: int = DISPATCHER_WORKERS,
+                 queue_size: int = DISPATCHER_QUEUE_SIZE):
+        """
+        Inicializa el pool y arranca los workers.
+
+        Args:
+            workers (int): Cantidad de workers
+            queue_size (int): Capacidad de la cola de cada worker
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+        for index, worker_queue in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(worker_queue,),
+                name=f"chat-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        register_stats("dispatcher", self.stats)
+        print(f"✅ ChatDispatcher inicializado ({workers} workers, cola {queue_size})")
+
+    def submit(self, chat_id: int, func: Callable, *args, **kwargs):
+        """
+        Encola una tarea en el worker asignado al chat.
+
+        Args:
+            chat_id (int): ID del chat (define el worker y el orden)
+            func: Función a ejecutar
+            *args, **kwargs: Argumentos de la función
+        """
+        worker_queue = self._queues[hash(chat_id) % self.workers]
+        worker_queue.put((time.monotonic(), func, args, kwargs))
+
+    def ordered(self, func: Callable) -> Callable:
+        """
+        Decorador para handlers de telebot: despacha la ejecución al pool
+        usando message.chat.id como clave.
+
+        Args:
+            func: Handler que recibe un tlb.types.Message
+
+        Returns:
+            Callable: Handler que solo encola y retorna de inmediato
+        """
+        @functools.wraps(func)
+        def wrapper(message, *args, **kwargs):
+            self.submit(message.chat.id, func, message, *args, **kwargs)
+        return wrapper
+
+    def stats(self) -> dict:
+        """
+        Métricas del pool, incluyendo el tiempo de espera en cola.
+
+        Returns:
+            dict: Procesados, fallidos, profundidad de colas y espera (ms)
+        """
+        with self._stats_lock:
+            waits = sorted(self._recent_waits)
+            processed = self._processed
+            avg_wait = self._wait_total / processed if processed else 0.0
+            p95_wait = waits[int(len(waits) * 0.95) - 1] if waits else 0.0
+            return {
+                "workers": self.workers,
+                "processed": processed,
+                "failed": self._failed,
+                "queued": [q.qsize() for q in self._queues],
+                "queue_wait_avg_ms": round(avg_wait * 1000, 2),
+                "queue_wait_p95_ms": round(p95_wait * 1000, 2),
+                "queue_wait_max_ms": round(self._wait_max * 1000, 2)
+            }
+
+    def _worker_loop(self, worker_queue: queue.Queue):
+        """
+        Procesa en orden las tareas de una cola.
+
+        Args:
+            worker_queue: Cola asignada al worker
+        """
+        while True:
+            enqueued_at, func, args, kwargs = worker_queue.get()
+            wait = time.monotonic() - enqueued_at
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                print(f"❌ Error en handler ({func.__name__}): {e}")
+            finally:
+                worker_queue.task_done()
+
+            with self._stats_lock:
+                self._processed += 1
+                self._failed += int(failed)
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._recent_waits.append(wait)
+
+
+class AsyncChatDispatcher:
+    """
+    Orden por chat para el bot asíncrono.
+
+    AsyncTeleBot ejecuta cada update como una tarea independiente, así que
+    dos mensajes seguidos de un mismo chat podían procesarse y responderse
+    en desorden (y guardarse desordenados en la memoria de conversación).
+    Cada chat con tareas pendientes tiene un asyncio.Lock, que atiende a
+    quienes esperan en orden de llegada: los mensajes de un chat se
+    procesan uno a la vez y en orden, y los de chats distintos en paralelo.
+    El lock se descarta cuando el chat no tiene más tareas, así la memoria
+    queda acotada a los chats activos.
+    """
+
+    def __init__(self):
+        """Inicializa el dispatcher (debe usarse desde un único event loop)."""
+        # chat_id -> [lock, tareas del chat en curso o esperando]
+        self._chats: Dict[int, list] = {}
+        self._processed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+        register_stats("dispatcher", self.stats)
+        print("✅ AsyncChatDispatcher inicializado (orden por chat)")
+
+    async def run(self, chat_id: int, func: Callable[..., Awaitable], *args, **kwargs):
+        """
+        Ejecuta una corrutina después de las anteriores del mismo chat.
+
+        Args:
+            chat_id (int): ID del chat (define el orden)
+            func: Función async a ejecutar
+            *args, **kwargs: Argumentos de la función
+        """
+        entry = self._chats.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        enqueued_at = time.monotonic()
+        try:
+            async with entry[0]:
+                wait = time.monotonic() - enqueued_at
+                failed = False
+                try:
+                    await func(*args, **kwargs)
+                except Exception as e:
+                    failed = True
+                    print(f"❌ Error en handler ({func.__name__}): {e}")
+                self._processed += 1
+                self._failed += int(failed)
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._recent_waits.append(wait)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[chat_id]
+
+    def ordered(self, func: Callable) -> Callable:
+        """
+        Decorador para handlers de AsyncTeleBot: los ejecuta en orden por
+        message.chat.id.
+
+        Args:
+            func: Handler async que recibe un tlb.types.Message
+
+        Returns:
+            Callable: Handler que espera su turno antes de ejecutarse
+        """
+        @functools.wraps(func)
+        async def wrapper(message, *args, **kwargs):
+            await self.run(message.chat.id, func, message, *args, **kwargs)
+        return wrapper
+
+    def stats(self) -> dict:
+        """
+        Métricas del orden por chat.
+
+        Returns:
+            dict: Procesados, fallidos, chats activos y espera por turno (ms)
+        """
+        waits = sorted(self._recent_waits)
+        processed = self._processed
+        avg_wait = self._wait_total / processed if processed else 0.0
+        p95_wait = waits[int(len(waits) * 0.95) - 1] if waits else 0.0
+        return {
+            "processed": processed,
+            "failed": self._failed,
+            "active_chats": len(self._chats),
+            "queued": sum(pending - 1 for _, pending in self._chats.values()),
+            "queue_wait_avg_ms": round(avg_wait * 1000, 2),
+            "queue_wait_p95_ms": round(p95_wait * 1000, 2),
+            "queue_wait_max_ms": round(self._wait_max * 1000, 2)
+        }
+
+
+def ordered_by_chat(dispatcher: Optional[ChatDispatcher]) -> Callable:
+    """
+    Decorador opcional: si hay dispatcher, el handler se ejecuta en orden
+    por chat (en el pool, o con AsyncChatDispatcher en modo async); si no,
+    se deja tal cual.
+
+    Args:
+        dispatcher: ChatDispatcher o AsyncChatDispatcher a usar, o None
+
+    Returns:
+        Callable: Decorador para el handler
+    """
+    if dispatcher is None:
+        return lambda func: func
+    return dispatcher.ordered
@@ -0,0 +1,198 @@
+import threading
+from typing import Optional
+import httpx
+from groq import AsyncGroq, DefaultAsyncHttpxClient, DefaultHttpxClient, Groq
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GROQ_MAX_CONNECTIONS,
+    GROQ_MAX_KEEPALIVE_CONNECTIONS,
+    GROQ_KEEPALIVE_EXPIRY_SECONDS,
+    GROQ_HTTP2,
+    GROQ_MAX_RETRIES,
+    GROQ_CONNECT_TIMEOUT,
+    GROQ_READ_TIMEOUTS
+)
+from modules.metrics import register_stats
+
+try:
+    import h2  # noqa: F401  (httpx solo habla HTTP/2 si está instalado)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+class ConnectionStats:
+    """
+    Cuenta requests y conexiones nuevas con la extensión "trace" de httpcore.
+
+    Cada request que no abre conexión TCP reutilizó una del pool; la tasa de
+    reutilización muestra si el keep-alive está funcionando.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.http2_requests = 0
+        self._lock = threading.Lock()
+
+    def on_event(self, name: str, info: dict):
+        """Callback de trace de httpcore (modo sync)."""
+        with self._lock:
+            if name.endswith("send_request_headers.started"):
+                self.requests += 1
+                if name.startswith("http2."):
+                    self.http2_requests += 1
+            elif name.endswith("connect_tcp.complete"):
+                self.new_connections += 1
+            elif name.endswith("start_tls.complete"):
+                self.tls_handshakes += 1
+
+    async def on_event_async(self, name: str, info: dict):
+        """Callback de trace de httpcore (modo async, debe ser corrutina)."""
+        self.on_event(name, info)
+
+    def stats(self) -> dict:
+        """
+        Métricas de conexiones.
+
+        Returns:
+            dict: Requests, conexiones nuevas, handshakes TLS, requests por
+            HTTP/2 y tasa de reutilización de conexiones
+        """
+        with self._lock:
+            requests = self.requests
+            reused = max(requests - self.new_connections, 0)
+            return {
+                "requests": requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "http2_requests": self.http2_requests,
+                "reuse_rate": round(reused / requests, 4) if requests else 0.0
+            }
+
+
+_connection_stats = ConnectionStats()
+_lock = threading.Lock()
+_client: Optional[Groq] = None
+_async_client: Optional[AsyncGroq] = None
+
+
+def _timeout(call_type: str) -> httpx.Timeout:
+    """Timeout de conexión común y de lectura según el tipo de llamada."""
+    read = GROQ_READ_TIMEOUTS.get(call_type, GROQ_READ_TIMEOUTS["chat"])
+    return httpx.Timeout(read, connect=GROQ_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GROQ_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _trace_hook(request: httpx.Request):
+    request.extensions["trace"] = _connection_stats.on_event
+
+
+async def _trace_hook_async(request: httpx.Request):
+    request.extensions["trace"] = _connection_stats.on_event_async
+
+
+def get_client(call_type: str = "chat") -> Groq:
+    """
+    Cliente de Groq compartido, con el timeout del tipo de llamada.
+
+    Todos los clientes devueltos comparten un único pool de conexiones
+    (keep-alive, HTTP/2 si h2 está instalado); with_options solo cambia
+    el timeout.
+
+    Args:
+        call_type (str): "chat", "vision" o "transcription"
+
+    Returns:
+        Groq: Cliente listo para usar
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            http_client = DefaultHttpxClient(
+                http2=GROQ_HTTP2 and _HTTP2_AVAILABLE,
+                limits=_limits(),
+                event_hooks={"request": [_trace_hook]}
+            )
+            _client = Groq(
+                api_key=GROQ_API_KEY,
+                base_url=GROQ_BASE_URL,
+                http_client=http_client,
+                max_retries=GROQ_MAX_RETRIES
+            )
+            register_stats("groq_connections", connection_stats)
+    return _client.with_options(timeout=_timeout(call_type))
+
+
+def get_async_client(call_type: str = "chat") -> AsyncGroq:
+    """
+    Versión asíncrona de get_client (un pool propio, compartido por los
+    clientes async de todos los módulos).
+
+    Args:
+        call_type (str): "chat", "vision" o "transcription"
+
+    Returns:
+        AsyncGroq: Cliente listo para usar
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            http_client = DefaultAsyncHttpxClient(
+                http2=GROQ_HTTP2 and _HTTP2_AVAILABLE,
+                limits=_limits(),
+                event_hooks={"request": [_trace_hook_async]}
+            )
+            _async_client = AsyncGroq(
+                api_key=GROQ_API_KEY,
+                base_url=GROQ_BASE_URL,
+                http_client=http_client,
+                max_retries=GROQ_MAX_RETRIES
+            )
+            register_stats("groq_connections", connection_stats)
+    return _async_client.with_options(timeout=_timeout(call_type))
+
+
+def warm_up():
+    """
+    Abre la conexión con Groq (DNS + TCP + TLS) antes del primer mensaje.
+
+    Hace un GET liviano a /models; la conexión queda en el pool y la
+    primera consulta real ya la reutiliza. Los errores solo se informan.
+    """
+    try:
+        get_client().models.list()
+        print(f"✅ Conexión con Groq precalentada ({connection_stats()['new_connections']} conexión/es)")
+    except Exception as e:
+        print(f"⚠️  No se pudo precalentar la conexión con Groq: {e}")
+
+
+async def warm_up_async():
+    """Versión asíncrona de warm_up (sobre el pool del cliente async)."""
+    try:
+        await get_async_client().models.list()
+        print("✅ Conexión con Groq precalentada (async)")
+    except Exception as e:
+        print(f"⚠️  No se pudo precalentar la conexión con Groq: {e}")
+
+
+def connection_stats() -> dict:
+    """
+    Métricas del pool de conexiones con Groq.
+
+    Returns:
+        dict: Requests, conexiones nuevas, handshakes TLS, uso de HTTP/2 y
+        tasa de reutilización
+    """
+    stats = _connection_stats.stats()
+    stats["http2_enabled"] = GROQ_HTTP2 and _HTTP2_AVAILABLE
+    return stats
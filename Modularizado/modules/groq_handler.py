@@ -1,13 +1,362 @@
-import json
-from groq import Groq
-from typing import Optional
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, TypeVar
 from config import (
-    GROQ_API_KEY, 
     GROQ_CHAT_MODEL, 
     CHAT_TEMPERATURE, 
     CHAT_MAX_TOKENS,
-    SAMSUNG_SUPPORT_URL
+    RETRIEVAL_ENABLED,
+    RETRIEVAL_TOKEN_BUDGET,
+    RESPONSE_CACHE_ENABLED,
+    SEMANTIC_CACHE_ENABLED,
+    MODEL_ROUTER_ENABLED,
+    CHAT_MODEL_TIERS,
+    ROUTER_SHORT_MESSAGE_TOKENS,
+    ROUTER_LATENCY_BUDGET_SECONDS,
+    ROUTER_LATENCY_WINDOW,
+    ROUTER_MIN_SAMPLES,
+    CONVERSATION_MEMORY_ENABLED,
+    CONVERSATION_SUMMARY_MODEL,
+    CONVERSATION_SUMMARY_MAX_TOKENS,
+    USER_MESSAGE_MAX_TOKENS,
+    TRANSCRIPTION_MAX_TOKENS,
+    SYSTEM_PROMPT_MAX_TOKENS,
+    DISPATCHER_WORKERS
 )
+from modules.conversation import ConversationStore
+from modules.groq_client import get_async_client, get_client
+from modules.rate_limiter import get_limiter
+from modules.retrieval import DatasetRetriever
+from modules.prompt import SystemPrompt
+from modules.tokens import estimate_tokens
+from modules.metrics import register_stats
+from modules.response_cache import ResponseCache, normalize_message
+from modules.semantic_cache import SemanticCache
+from modules.token_usage import chunk_usage, fit_input, record_usage, token_usage_stats
+
+T = TypeVar("T")
+
+# Mensajes formados solo por estas palabras son charla (saludos, gracias...)
+_SMALL_TALK_WORDS = {
+    "hola", "buenas", "buenos", "buen", "dia", "dias", "tardes", "noches",
+    "que", "tal", "como", "estas", "andas", "va", "todo", "bien", "muy",
+    "gracias", "muchas", "mil", "genial", "perfecto", "excelente", "listo",
+    "ok", "okey", "dale", "si", "no", "chau", "adios", "hasta", "luego",
+    "pronto", "saludos", "nos", "vemos"
+}
+
+# Raíces que indican una consulta que necesita razonar (comparar,
+# recomendar, resolver un problema): siempre van al modelo más grande
+_COMPLEX_STEMS = (
+    "compar", "diferenc", "recomend", "conviene", "mejor", "peor", "elegir",
+    "problema", "falla", "funciona", "anda", "roto", "reclamo", "queja"
+)
+
+# Espera mínima antes de lanzar la consulta de respaldo
+_MIN_HEDGE_DELAY = 0.5
+
+# Presupuesto de tokens de la entrada del usuario según su origen
+_INPUT_BUDGETS = {"text": USER_MESSAGE_MAX_TOKENS, "voice": TRANSCRIPTION_MAX_TOKENS}
+
+
+class StreamInterrupted(Exception):
+    """
+    El stream de la respuesta se cortó después de haber entregado fragmentos.
+
+    Attributes:
+        partial: Texto recibido hasta el corte
+    """
+
+    def __init__(self, partial: str):
+        super().__init__("la respuesta en streaming se interrumpió")
+        self.partial = partial
+
+
+class ModelRouter:
+    """
+    Elige el modelo de chat de cada request y le pone fecha límite.
+    
+    1. Por intención y largo: saludos/agradecimientos y preguntas cortas
+       van al tier más chico; comparaciones, recomendaciones y problemas
+       (y las preguntas largas) al más grande.
+    2. Por latencia: si el p95 reciente del modelo elegido supera el
+       presupuesto, se baja de tier.
+    3. Respaldo: si el elegido no respondió cuando todavía le queda al
+       modelo más chico tiempo para responder dentro del presupuesto (según
+       su p50), se lanza la misma consulta a ese modelo y gana la primera
+       respuesta (hedge). Si el elegido falla, se pasa al chico enseguida.
+    
+    Las latencias se llevan por modelo y por tipo de llamada ("complete" =
+    respuesta entera, "stream" = hasta que empieza a llegar el texto).
+    
+    Attributes:
+        tiers: Modelos del más chico al más grande
+        budget: Latencia máxima deseada en segundos
+    """
+    
+    def __init__(self, tiers: List[str] = CHAT_MODEL_TIERS,
+                 budget: float = ROUTER_LATENCY_BUDGET_SECONDS):
+        """
+        Inicializa el router.
+        
+        Args:
+            tiers (list): Modelos del más chico al más grande
+            budget (float): Latencia máxima deseada en segundos
+        """
+        self.tiers = list(tiers)
+        self.budget = budget
+        self._latencies = {}
+        self._routed = {model: 0 for model in self.tiers}
+        self._errors = {model: 0 for model in self.tiers}
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._fallbacks = 0
+        self._lock = threading.Lock()
+        # Una llamada principal y una de respaldo por worker del dispatcher
+        self._executor = ThreadPoolExecutor(
+            max_workers=DISPATCHER_WORKERS * 2, thread_name_prefix="model-router"
+        )
+    
+    @staticmethod
+    def classify(user_message: str) -> str:
+        """
+        Clasifica la intención de un mensaje con reglas simples.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            
+        Returns:
+            str: "small_talk", "complex" o "question"
+        """
+        words = normalize_message(user_message).split()
+        if words and all(word in _SMALL_TALK_WORDS for word in words):
+            return "small_talk"
+        if any(word.startswith(_COMPLEX_STEMS) for word in words):
+            return "complex"
+        return "question"
+    
+    def route(self, user_message: str, kind: str = "complete") -> List[str]:
+        """
+        Elige el modelo para un mensaje.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            kind (str): "complete" o "stream"
+            
+        Returns:
+            list: [modelo elegido] o [modelo elegido, modelo de respaldo]
+        """
+        intent = self.classify(user_message)
+        tier = len(self.tiers) - 1
+        if intent == "small_talk":
+            tier = 0
+        elif intent == "question" and estimate_tokens(user_message) <= ROUTER_SHORT_MESSAGE_TOKENS:
+            tier = 0
+        
+        while tier > 0 and self._percentile(self.tiers[tier], kind, 0.95) > self.budget:
+            tier -= 1
+        
+        with self._lock:
+            self._routed[self.tiers[tier]] += 1
+        return self.tiers[tier::-1][:2]
+    
+    def call(self, request: Callable[[str], T], user_message: str, kind: str = "complete") -> T:
+        """
+        Hace una llamada con el modelo elegido y respaldo al más chico.
+        
+        Args:
+            request: Función que recibe el nombre del modelo y hace la llamada
+            user_message (str): Mensaje del usuario (para elegir el modelo)
+            kind (str): "complete" o "stream"
+            
+        Returns:
+            El resultado de la primera llamada que responda bien
+        """
+        models = self.route(user_message, kind)
+        primary = self._executor.submit(self._timed, request, models[0], kind)
+        if len(models) == 1:
+            return primary.result()
+        
+        done, _ = wait([primary], timeout=self._hedge_delay(models[1], kind))
+        pending = set()
+        if primary in done:
+            if primary.exception() is None:
+                return primary.result()
+            self._on_fallback(models, primary.exception())
+        else:
+            self._on_hedge(models)
+            pending.add(primary)
+        backup = self._executor.submit(self._timed, request, models[1], kind)
+        pending.add(backup)
+        
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                self._on_winner(future is backup and primary in pending)
+                for other in pending | (done - {future}):
+                    other.add_done_callback(_close_result)
+                return future.result()
+        raise error
+    
+    async def call_async(self, request: Callable[[str], Awaitable[T]], user_message: str,
+                         kind: str = "complete") -> T:
+        """
+        Versión asíncrona de call (el respaldo es una task en el event loop).
+        
+        Args:
+            request: Función que recibe el nombre del modelo y devuelve la corrutina
+            user_message (str): Mensaje del usuario (para elegir el modelo)
+            kind (str): "complete" o "stream"
+            
+        Returns:
+            El resultado de la primera llamada que responda bien
+        """
+        models = self.route(user_message, kind)
+        primary = asyncio.ensure_future(self._timed_async(request, models[0], kind))
+        if len(models) == 1:
+            return await primary
+        
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(models[1], kind))
+        pending = set()
+        if primary in done:
+            if primary.exception() is None:
+                return primary.result()
+            self._on_fallback(models, primary.exception())
+        else:
+            self._on_hedge(models)
+            pending.add(primary)
+        backup = asyncio.ensure_future(self._timed_async(request, models[1], kind))
+        pending.add(backup)
+        
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._on_winner(task is backup and primary in pending)
+                    for other in done - {task}:
+                        if other.exception() is None:
+                            await _close_result_async(other.result())
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _timed(self, request: Callable[[str], T], model: str, kind: str) -> T:
+        """Ejecuta una llamada registrando su latencia (o el error)."""
+        started = time.perf_counter()
+        try:
+            result = request(model)
+        except Exception:
+            self._record_error(model)
+            raise
+        self._record(model, kind, time.perf_counter() - started)
+        return result
+    
+    async def _timed_async(self, request: Callable[[str], Awaitable[T]], model: str,
+                           kind: str) -> T:
+        started = time.perf_counter()
+        try:
+            result = await request(model)
+        except Exception:
+            self._record_error(model)
+            raise
+        self._record(model, kind, time.perf_counter() - started)
+        return result
+    
+    def _hedge_delay(self, backup_model: str, kind: str) -> float:
+        """
+        Cuánto esperar al modelo elegido antes de lanzar el respaldo.
+        
+        Returns:
+            float: Presupuesto menos el p50 del modelo de respaldo (la mitad
+            del presupuesto si todavía no hay muestras suficientes)
+        """
+        backup_p50 = self._percentile(backup_model, kind, 0.5)
+        delay = self.budget - backup_p50 if backup_p50 else self.budget / 2
+        return max(_MIN_HEDGE_DELAY, delay)
+    
+    def _percentile(self, model: str, kind: str, quantile: float) -> float:
+        """Percentil de latencia reciente (0.0 si hay pocas muestras)."""
+        with self._lock:
+            samples = sorted(self._latencies.get((model, kind), ()))
+        if len(samples) < ROUTER_MIN_SAMPLES:
+            return 0.0
+        return samples[max(0, int(len(samples) * quantile) - 1)]
+    
+    def _record(self, model: str, kind: str, elapsed: float):
+        with self._lock:
+            self._latencies.setdefault((model, kind), deque(maxlen=ROUTER_LATENCY_WINDOW)).append(elapsed)
+    
+    def _record_error(self, model: str):
+        with self._lock:
+            self._errors[model] = self._errors.get(model, 0) + 1
+    
+    def _on_hedge(self, models: List[str]):
+        with self._lock:
+            self._hedges += 1
+        print(f"⏱️ {models[0]} no respondió a tiempo: se consulta también a {models[1]}")
+    
+    def _on_fallback(self, models: List[str], error: BaseException):
+        with self._lock:
+            self._fallbacks += 1
+        print(f"⚠️  {models[0]} falló ({type(error).__name__}): se usa {models[1]}")
+    
+    def _on_winner(self, hedge_won: bool):
+        if hedge_won:
+            with self._lock:
+                self._hedge_wins += 1
+    
+    def stats(self) -> dict:
+        """
+        Métricas del ruteo.
+        
+        Returns:
+            dict: Por modelo, requests ruteadas, errores y p50/p95 en ms por
+            tipo de llamada; y consultas de respaldo lanzadas y ganadas
+        """
+        models = {}
+        for model in self.tiers:
+            models[model] = {"routed": self._routed[model], "errors": self._errors.get(model, 0)}
+            for kind in ("complete", "stream"):
+                for name, quantile in (("p50", 0.5), ("p95", 0.95)):
+                    value = self._percentile(model, kind, quantile)
+                    if value:
+                        models[model][f"{kind}_{name}_ms"] = round(value * 1000, 1)
+        with self._lock:
+            return {
+                "budget_ms": round(self.budget * 1000),
+                "models": models,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "fallbacks": self._fallbacks
+            }
+
+
+def _close_result(future):
+    """Cierra el stream de una llamada de respaldo que perdió la carrera."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), "close", None)
+    if close is not None:
+        close()
+
+
+async def _close_result_async(result):
+    close = getattr(result, "close", None)
+    if close is not None:
+        await close()
 
 
 class GroqHandler:
@@ -16,7 +365,14 @@ class GroqHandler:
     
     Attributes:
         client: Cliente de Groq API
+        async_client: Cliente asíncrono de Groq API (modo async)
+        router: Elige el modelo de chat de cada request (con respaldo)
         dataset: Dataset con información de la empresa
+        retriever: Índice para seleccionar el contexto relevante del dataset
+        system_prompt: Prompt precompilado (prefijo estable para el cache)
+        response_cache: Cache de respuestas (None si está deshabilitado)
+        semantic_cache: Cache de preguntas parafraseadas (None si está deshabilitado o cargando)
+        conversations: Memoria de conversación por chat (None si está deshabilitada)
     """
     
     def __init__(self, dataset: dict):
@@ -26,31 +382,415 @@ class GroqHandler:
         Args:
             dataset (dict): Dataset con información empresarial
         """
-        self.client = Groq(api_key=GROQ_API_KEY)
-        self.dataset = dataset
+        self.client = get_client("chat")
+        self.async_client = get_async_client("chat")
+        self.router = ModelRouter(CHAT_MODEL_TIERS if MODEL_ROUTER_ENABLED else [GROQ_CHAT_MODEL])
+        self._prompt_count = 0
+        self._prompt_tokens_total = 0
+        self._cache_requests = 0
+        self._cache_bypassed = 0
+        self._stats_lock = threading.Lock()
+        self.reload_dataset(dataset)
+        self.response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+        self.semantic_cache = None
+        self.conversations = ConversationStore(self._summarize) if CONVERSATION_MEMORY_ENABLED else None
+        if SEMANTIC_CACHE_ENABLED:
+            # El modelo de embeddings se carga en segundo plano: hasta que
+            # esté listo las consultas simplemente no usan el cache semántico
+            threading.Thread(
+                target=self._load_semantic_cache, name="semantic-cache-warmup", daemon=True
+            ).start()
+        register_stats("prompt", self.prompt_stats)
+        register_stats("model_router", self.router.stats)
+        register_stats("tokens", token_usage_stats)
+        if self.response_cache is not None:
+            register_stats("response_cache", self.response_cache.stats)
+        if self.response_cache is not None or SEMANTIC_CACHE_ENABLED:
+            register_stats("cache_bypass", self.cache_bypass_stats)
+        if self.conversations is not None:
+            register_stats("conversations", self.conversations.stats)
         print("✅ GroqHandler inicializado")
     
-    def get_response(self, user_message: str) -> Optional[str]:
+    def get_response(self, user_message: str, chat_id: Optional[int] = None,
+                     source: str = "text") -> Optional[str]:
         """
         Obtiene respuesta del chatbot basada en el dataset.
         
+        Las preguntas repetidas se sirven desde el cache de respuestas y las
+        idénticas que llegan a la vez comparten una única llamada a la API.
+        Si el chat ya tiene historial, la respuesta depende de él y se genera
+        sin pasar por los caches (el saludo de bienvenida solo no cuenta como
+        historial; ver _history). Los mensajes y transcripciones más largos
+        que su presupuesto de tokens se recortan antes de armar el prompt.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat de Telegram (None = sin memoria)
+            source (str): Origen del mensaje ("text", "voice", "welcome"),
+                para el presupuesto de entrada y la contabilidad de tokens
+            
+        Returns:
+            str: Respuesta generada por el modelo, o None si falla
+        """
+        user_message = self._fit_input(user_message, source)
+        history = self._history(chat_id)
+        if history:
+            response = self._complete(user_message, history, chat_id, source)
+        elif self.response_cache is None:
+            response = self._answer(user_message, chat_id, source)
+        else:
+            key = ResponseCache.make_key(user_message, self.system_prompt.version)
+            response = self.response_cache.get_or_compute(
+                key, lambda: self._answer(user_message, chat_id, source)
+            )
+        
+        self._remember(chat_id, user_message, response, source)
+        return response
+    
+    async def get_response_async(self, user_message: str, chat_id: Optional[int] = None,
+                                 source: str = "text") -> Optional[str]:
+        """
+        Versión asíncrona de get_response usando AsyncGroq.
+        
         Args:
             user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat de Telegram (None = sin memoria)
+            source (str): Origen del mensaje ("text", "voice", "welcome")
             
         Returns:
             str: Respuesta generada por el modelo, o None si falla
         """
+        user_message = self._fit_input(user_message, source)
+        history = self._history(chat_id)
+        if history:
+            response = await self._complete_async(user_message, history, chat_id, source)
+        elif self.response_cache is None:
+            response = await self._answer_async(user_message, chat_id, source)
+        else:
+            key = ResponseCache.make_key(user_message, self.system_prompt.version)
+            response = await self.response_cache.get_or_compute_async(
+                key, lambda: self._answer_async(user_message, chat_id, source)
+            )
+        
+        self._remember(chat_id, user_message, response, source)
+        return response
+    
+    def stream_response(self, user_message: str, chat_id: Optional[int] = None,
+                        source: str = "text") -> Iterator[str]:
+        """
+        Obtiene la respuesta en fragmentos a medida que el modelo la genera.
+        
+        Una respuesta cacheada (exacta o semántica) sale entera en un solo
+        fragmento. Las generadas se guardan en los caches al terminar; a
+        diferencia de get_response no se coalescen requests idénticas en vuelo.
+        Igual que en get_response, con historial no se usan los caches.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat de Telegram (None = sin memoria)
+            source (str): Origen del mensaje ("text", "voice", "welcome")
+            
+        Yields:
+            str: Fragmentos de texto (nada si la llamada falla antes del primero)
+            
+        Raises:
+            StreamInterrupted: Si el stream se corta después del primer
+            fragmento (la respuesta parcial no se cachea ni se recuerda)
+        """
+        user_message = self._fit_input(user_message, source)
+        history = self._history(chat_id)
+        key = None if history else self._cache_key(user_message)
+        cached = None if history else self._cached_answer(key, user_message)
+        if cached is not None:
+            self._remember(chat_id, user_message, cached, source)
+            yield cached
+            return
+        
+        parts = []
         try:
-            system_prompt = self._build_system_prompt()
-            
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                model=GROQ_CHAT_MODEL,
-                temperature=CHAT_TEMPERATURE,
-                max_tokens=CHAT_MAX_TOKENS
+            messages = self._build_messages(user_message, history)
+            stream = self.router.call(
+                lambda model: self._create(model, messages, stream=True), user_message, kind="stream"
+            )
+            model, usage = None, None
+            for chunk in stream:
+                model, usage = chunk.model, chunk_usage(chunk) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            if model is not None:
+                record_usage(model, source, chat_id, self._prompt_tokens(messages), usage)
+        except Exception as error:
+            print(f"❌ Error al obtener respuesta de Groq: {str(error)}")
+            if parts:
+                raise StreamInterrupted("".join(parts)) from error
+            return
+        
+        response = "".join(parts).strip()
+        if not history:
+            self._store_answer(key, user_message, response)
+        self._remember(chat_id, user_message, response, source)
+    
+    async def stream_response_async(self, user_message: str, chat_id: Optional[int] = None,
+                                    source: str = "text") -> AsyncIterator[str]:
+        """
+        Versión asíncrona de stream_response usando AsyncGroq.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat de Telegram (None = sin memoria)
+            source (str): Origen del mensaje ("text", "voice", "welcome")
+            
+        Yields:
+            str: Fragmentos de texto (nada si la llamada falla antes del primero)
+            
+        Raises:
+            StreamInterrupted: Si el stream se corta después del primer
+            fragmento (la respuesta parcial no se cachea ni se recuerda)
+        """
+        user_message = self._fit_input(user_message, source)
+        history = self._history(chat_id)
+        key = None if history else self._cache_key(user_message)
+        cached = None
+        if not history:
+            cached = await asyncio.to_thread(self._cached_answer, key, user_message)
+        if cached is not None:
+            self._remember(chat_id, user_message, cached, source)
+            yield cached
+            return
+        
+        parts = []
+        try:
+            messages = self._build_messages(user_message, history)
+            stream = await self.router.call_async(
+                lambda model: self._create_async(model, messages, stream=True), user_message, kind="stream"
+            )
+            model, usage = None, None
+            async for chunk in stream:
+                model, usage = chunk.model, chunk_usage(chunk) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            if model is not None:
+                record_usage(model, source, chat_id, self._prompt_tokens(messages), usage)
+        except Exception as error:
+            print(f"❌ Error al obtener respuesta de Groq: {str(error)}")
+            if parts:
+                raise StreamInterrupted("".join(parts)) from error
+            return
+        
+        response = "".join(parts).strip()
+        if not history:
+            await asyncio.to_thread(self._store_answer, key, user_message, response)
+        self._remember(chat_id, user_message, response, source)
+    
+    @staticmethod
+    def _fit_input(user_message: str, source: str) -> str:
+        """Recorta el mensaje al presupuesto de tokens de su origen."""
+        budget = _INPUT_BUDGETS.get(source)
+        if budget is None:
+            return user_message
+        return fit_input(user_message, budget, source)
+    
+    def _history(self, chat_id: Optional[int]) -> List[dict]:
+        """
+        Historial del chat a enviar con el mensaje (vacío si no hay memoria).
+        
+        Un historial con solo respuestas del bot (el saludo de /start) se
+        toma como vacío: no cambia lo que hay que contestar y, si contara,
+        después de la bienvenida ningún mensaje pasaría por los caches.
+        Cada request que igual saltea los caches por historial se cuenta
+        (ver cache_bypass_stats).
+        """
+        history = []
+        if self.conversations is not None and chat_id is not None:
+            history = self.conversations.messages(chat_id)
+            if all(message["role"] == "assistant" for message in history):
+                history = []
+        with self._stats_lock:
+            self._cache_requests += 1
+            if history:
+                self._cache_bypassed += 1
+        return history
+    
+    def _remember(self, chat_id: Optional[int], user_message: str, response: Optional[str],
+                  source: str = "text"):
+        """
+        Guarda el intercambio en la memoria del chat (si hubo respuesta).
+        
+        De la bienvenida solo se guarda el saludo: la instrucción que la
+        genera es interna y el cliente nunca la escribió.
+        """
+        if self.conversations is None or chat_id is None or not response:
+            return
+        self.conversations.append(chat_id, None if source == "welcome" else user_message, response)
+    
+    def _summarize(self, summary: str, turns: List[dict]) -> str:
+        """
+        Actualiza el resumen de una conversación con el modelo chico.
+        
+        Args:
+            summary (str): Resumen anterior (puede estar vacío)
+            turns (list): Mensajes que salieron del buffer
+            
+        Returns:
+            str: Resumen nuevo
+        """
+        transcript = "\n".join(
+            f"{'Cliente' if turn['role'] == 'user' else 'Asistente'}: {turn['content']}"
+            for turn in turns
+        )
+        messages = [
+            {"role": "system", "content": (
+                "Resumí la conversación entre un cliente y el asistente de atención "
+                "en pocas líneas: datos del cliente, qué consultó y qué se le respondió. "
+                "Incorporá el resumen anterior si lo hay. Respondé solo con el resumen."
+            )},
+            {"role": "user", "content": f"Resumen anterior:\n{summary or '(ninguno)'}\n\nMensajes nuevos:\n{transcript}"}
+        ]
+        completion = self._create(
+            CONVERSATION_SUMMARY_MODEL, messages,
+            max_tokens=CONVERSATION_SUMMARY_MAX_TOKENS, source="summary"
+        )
+        return completion.choices[0].message.content
+    
+    def _cache_key(self, user_message: str) -> Optional[str]:
+        """Clave del cache de respuestas (None si está deshabilitado)."""
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(user_message, self.system_prompt.version)
+    
+    def _cached_answer(self, key: Optional[str], user_message: str) -> Optional[str]:
+        """
+        Busca una respuesta ya generada en el cache exacto y en el semántico.
+        
+        Args:
+            key (str): Clave del cache de respuestas (ver _cache_key)
+            user_message (str): Mensaje del usuario
+            
+        Returns:
+            str: Respuesta cacheada, o None
+        """
+        if key is not None:
+            cached = self.response_cache.cache.get(key)
+            if cached is not None:
+                return cached
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(user_message, self.system_prompt.version)
+            if cached is not None and key is not None:
+                self.response_cache.cache.put(key, cached)
+            return cached
+        return None
+    
+    def _store_answer(self, key: Optional[str], user_message: str, response: str):
+        """Guarda una respuesta generada en streaming en ambos caches."""
+        if not response:
+            return
+        if key is not None:
+            self.response_cache.cache.put(key, response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(user_message, response, self.system_prompt.version)
+    
+    def _answer(self, user_message: str, chat_id: Optional[int] = None,
+                source: str = "text") -> Optional[str]:
+        """
+        Responde desde el cache semántico si hay una pregunta equivalente;
+        si no, llama al modelo y guarda la respuesta.
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat (contabilidad de tokens)
+            source (str): Origen del mensaje (contabilidad de tokens)
+            
+        Returns:
+            str: Respuesta, o None si falla
+        """
+        if self.semantic_cache is None:
+            return self._complete(user_message, chat_id=chat_id, source=source)
+        
+        version = self.system_prompt.version
+        cached = self.semantic_cache.lookup(user_message, version)
+        if cached is not None:
+            return cached
+        
+        response = self._complete(user_message, chat_id=chat_id, source=source)
+        self.semantic_cache.add(user_message, response, version)
+        return response
+    
+    async def _answer_async(self, user_message: str, chat_id: Optional[int] = None,
+                            source: str = "text") -> Optional[str]:
+        """
+        Versión asíncrona de _answer (los embeddings corren en un hilo).
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            chat_id (int): Id del chat (contabilidad de tokens)
+            source (str): Origen del mensaje (contabilidad de tokens)
+            
+        Returns:
+            str: Respuesta, o None si falla
+        """
+        if self.semantic_cache is None:
+            return await self._complete_async(user_message, chat_id=chat_id, source=source)
+        
+        version = self.system_prompt.version
+        cached = await asyncio.to_thread(self.semantic_cache.lookup, user_message, version)
+        if cached is not None:
+            return cached
+        
+        response = await self._complete_async(user_message, chat_id=chat_id, source=source)
+        await asyncio.to_thread(self.semantic_cache.add, user_message, response, version)
+        return response
+    
+    def _complete(self, user_message: str, history: Optional[List[dict]] = None,
+                  chat_id: Optional[int] = None, source: str = "text") -> Optional[str]:
+        """
+        Llama al modelo de chat (sin cache).
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            history (list): Historial del chat (ver ConversationStore.messages)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            source (str): Origen del mensaje (contabilidad de tokens)
+            
+        Returns:
+            str: Respuesta generada por el modelo, o None si falla
+        """
+        try:
+            messages = self._build_messages(user_message, history)
+            chat_completion = self.router.call(
+                lambda model: self._create(model, messages, source=source, chat_id=chat_id),
+                user_message
+            )
+            
+            return chat_completion.choices[0].message.content.strip()
+        
+        except Exception as error:
+            print(f"❌ Error al obtener respuesta de Groq: {str(error)}")
+            return None
+    
+    async def _complete_async(self, user_message: str, history: Optional[List[dict]] = None,
+                              chat_id: Optional[int] = None,
+                              source: str = "text") -> Optional[str]:
+        """
+        Llama al modelo de chat con AsyncGroq (sin cache).
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            history (list): Historial del chat (ver ConversationStore.messages)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            source (str): Origen del mensaje (contabilidad de tokens)
+            
+        Returns:
+            str: Respuesta generada por el modelo, o None si falla
+        """
+        try:
+            messages = self._build_messages(user_message, history)
+            chat_completion = await self.router.call_async(
+                lambda model: self._create_async(model, messages, source=source, chat_id=chat_id),
+                user_message
             )
             
             return chat_completion.choices[0].message.content.strip()
@@ -59,55 +799,183 @@ class GroqHandler:
             print(f"❌ Error al obtener respuesta de Groq: {str(error)}")
             return None
     
-    def _build_system_prompt(self) -> str:
+    def _build_messages(self, user_message: str, history: Optional[List[dict]] = None) -> list:
+        """
+        Arma la lista de mensajes para el endpoint de chat.
+        
+        El historial va después del system prompt para no romper su prefijo
+        estable (cache de prompts de la API).
+        
+        Args:
+            user_message (str): Mensaje del usuario
+            history (list): Historial del chat (resumen + mensajes recientes)
+            
+        Returns:
+            list: Mensajes system + historial + user
+        """
+        return [
+            {"role": "system", "content": self._build_system_prompt(user_message)},
+            *(history or ()),
+            {"role": "user", "content": user_message}
+        ]
+    
+    def _create(self, model: str, messages: list, stream: bool = False,
+                max_tokens: int = CHAT_MAX_TOKENS, source: str = "text",
+                chat_id: Optional[int] = None):
+        """
+        Llama al endpoint de chat con un modelo, dentro de su cuota, y
+        registra el consumo de tokens (en streaming lo registra quien
+        consume el stream, porque el usage llega en el último fragmento).
+        
+        Args:
+            model (str): Modelo elegido por el router
+            messages (list): Mensajes de la request
+            stream (bool): Pedir la respuesta en streaming
+            max_tokens (int): Máximo de tokens de salida
+            source (str): Origen de la request (contabilidad de tokens)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            ChatCompletion, o Stream de fragmentos si stream=True
+        """
+        prompt_tokens = self._prompt_tokens(messages)
+        result = get_limiter(model).call(
+            lambda: self.client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=CHAT_TEMPERATURE,
+                max_tokens=max_tokens,
+                stream=stream
+            ),
+            # El sobrante se devuelve a la cuota al conocer el uso real (en
+            # streaming, cuando el último fragmento trae el usage)
+            prompt_tokens + max_tokens
+        )
+        if not stream:
+            record_usage(model, source, chat_id, prompt_tokens, result.usage)
+        return result
+    
+    async def _create_async(self, model: str, messages: list, stream: bool = False,
+                            max_tokens: int = CHAT_MAX_TOKENS, source: str = "text",
+                            chat_id: Optional[int] = None):
+        """Versión asíncrona de _create usando AsyncGroq."""
+        prompt_tokens = self._prompt_tokens(messages)
+        result = await get_limiter(model).call_async(
+            lambda: self.async_client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=CHAT_TEMPERATURE,
+                max_tokens=max_tokens,
+                stream=stream
+            ),
+            # El sobrante se devuelve a la cuota al conocer el uso real (en
+            # streaming, cuando el último fragmento trae el usage)
+            prompt_tokens + max_tokens
+        )
+        if not stream:
+            record_usage(model, source, chat_id, prompt_tokens, result.usage)
+        return result
+    
+    @staticmethod
+    def _prompt_tokens(messages: list) -> int:
+        """
+        Tokens del prompt estimados localmente, antes de enviarlo.
+        
+        Args:
+            messages (list): Mensajes de la request
+            
+        Returns:
+            int: Tokens estimados
+        """
+        return sum(estimate_tokens(message["content"]) for message in messages)
+    
+    def _load_semantic_cache(self):
+        """
+        Carga el cache semántico; si el modelo de embeddings no está
+        disponible, el bot sigue funcionando sin él.
+        """
+        try:
+            semantic_cache = SemanticCache()
+        except Exception as e:
+            print(f"⚠️  Cache semántico deshabilitado: {e}")
+            return
+        register_stats("semantic_cache", semantic_cache.stats)
+        self.semantic_cache = semantic_cache
+    
+    def reload_dataset(self, dataset: dict):
+        """
+        Recompila el prompt y el índice cuando cambia el dataset.
+        
+        Args:
+            dataset (dict): Nuevo dataset con información empresarial
+        """
+        self.dataset = dataset
+        self.retriever = DatasetRetriever(dataset) if RETRIEVAL_ENABLED else None
+        self.system_prompt = SystemPrompt(dataset, include_dataset=not RETRIEVAL_ENABLED)
+        
+        report = self.system_prompt.token_report()
+        print(
+            f"📏 Prompt: {report['legacy_prompt_tokens']} tokens antes → "
+            f"{report['static_prefix_tokens']} tokens de prefijo estático "
+            f"(dataset v{report['dataset_version']})"
+        )
+        expected = report["static_prefix_tokens"] + (RETRIEVAL_TOKEN_BUDGET if RETRIEVAL_ENABLED else 0)
+        if expected > SYSTEM_PROMPT_MAX_TOKENS:
+            print(
+                f"⚠️  El system prompt puede llegar a {expected} tokens por request "
+                f"(máximo recomendado: {SYSTEM_PROMPT_MAX_TOKENS})"
+            )
+    
+    def cache_bypass_stats(self) -> dict:
+        """
+        Requests que no pasaron por los caches de respuestas por tener historial.
+        
+        Returns:
+            dict: Requests totales, las que saltearon los caches y su proporción
+        """
+        with self._stats_lock:
+            requests, bypassed = self._cache_requests, self._cache_bypassed
+        return {
+            "requests": requests,
+            "bypassed_history": bypassed,
+            "bypass_rate": round(bypassed / requests, 4) if requests else 0.0
+        }
+    
+    def prompt_stats(self) -> dict:
+        """
+        Métricas del tamaño de los prompts enviados.
+        
+        Returns:
+            dict: Reporte antes/después y promedio real por request
+        """
+        stats = self.system_prompt.token_report()
+        with self._stats_lock:
+            count, total = self._prompt_count, self._prompt_tokens_total
+        stats["requests"] = count
+        stats["avg_prompt_tokens"] = round(total / count, 1) if count else 0
+        return stats
+    
+    def _build_system_prompt(self, user_message: str) -> str:
         """
         Construye el system prompt con el dataset y reglas de negocio.
         
+        El prefijo ya está compilado; solo se agrega al final el contexto
+        recuperado para este mensaje.
+        
+        Args:
+            user_message (str): Mensaje del usuario, usado para seleccionar
+                solo las entradas relevantes del dataset
+        
         Returns:
             str: System prompt completo
         """
-        return f"""Eres el asistente virtual de una tienda de Samsung. Tu tarea es \
-responder basándote en la información proporcionada en el dataset, \
-siendo *resolutivo y empático.*
-
-*Instrucción de Empatía:* Debes analizar el tono o el sentimiento \
-implícito en el mensaje del cliente (por ejemplo: frustración, \
-confusión, urgencia, alegría o interés). *Toda respuesta debe \
-comenzar con una frase breve y humana que reconozca este sentimiento* \
-antes de proceder con la información resolutiva.
-
-En caso de no encontrar la respuesta en el dataset, índica de manera \
-amistosa y amable que no cuentas con esa información, sugiriendo \
-contactar directamente con la empresa.
-
-Datos de la empresa:
-{json.dumps(self.dataset, ensure_ascii=False, indent=2)}
-
-Reglas importantes:
-1. Solo responde información proporcionada en el dataset.
-2. No inventes, añadas o busques información adicional a menos de que \
-sea para proporcionar un enlace directo a la tienda en caso de que \
-el cliente este buscando ESE producto en especifico.
-3. Si la información solicitada no esta en el dataset, sugiere contactar \
-a {SAMSUNG_SUPPORT_URL}
-4. No respondas preguntas no relacionadas con la empresa.
-5. No incluyas en tus respuestas nunca un dato sensible como el número \
-de algún miembro del personal, en caso de ser solicitados debes \
-responder: "No puedo brindar dicha información."
-6. *Sé empático, amable, profesional y orientado a la resolución.* \
-Tu respuesta siempre debe empezar con una frase que reconozca el \
-estado emocional del cliente.
-    * *Ejemplos de frases empáticas:* "Entiendo perfectamente su \
-frustración con este tema," "Me alegra mucho que esté \
-considerando este producto," "Lamento el inconveniente que \
-esto le ha causado," o "Gracias por la claridad en su consulta."
-7. Solo saluda en la primera interacción.
-8. Puedes utilizar emojis en tus respuestas, hasta un máximo de 3.
-9. No incluyas saludos si la conversación ya fue iniciada.
-10. Siempre responde evitando la redundancia y repetición de información.
-11. Nunca envies links inactivos, en caso de que se soliciten productos \
-o categorias de productos, debes proporcionar la lista completa de \
-páginas que figura en el dataset.
-12. Utiliza correctamente el punto y seguido.
-13. Utiliza correctamente el punto y aparte.
-14. No brindes enlaces especificos a un producto, solo envía enlaces a la categoria del producto por ejemplo https://www.samsung.com/ar/smartphones/."""
\ No newline at end of file
+        context = None
+        if self.retriever is not None:
+            context = self.retriever.select(user_message)
+        
+        system_prompt = self.system_prompt.build(context)
+        tokens = estimate_tokens(system_prompt)
+        with self._stats_lock:
+            self._prompt_count += 1
+            self._prompt_tokens_total += tokens
+        return system_prompt
\ No newline at end of file
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+import numpy as np
+from config import (
+    GROQ_VISION_MODEL,
+    IMAGE_CACHE_MAX_ENTRIES,
+    IMAGE_CACHE_HASH_THRESHOLD,
+    IMAGE_CACHE_DB_FILE
+)
+from modules.image_processing import hamming_distances
+from modules.lru import LRUCache
+
+
+class ImageResultCache:
+    """
+    Cache de descripciones de imágenes ya analizadas.
+
+    Se consulta en dos niveles:
+    1. Por file_unique_id de Telegram, antes de descargar: una foto
+       reenviada tiene el mismo id y no hace falta ni bajarla.
+    2. Por hash perceptual (dHash horizontal y vertical) después de
+       descargar: la misma imagen recomprimida, recortada levemente o
+       capturada de nuevo queda a pocos bits de distancia en los dos
+       hashes y reutiliza la descripción. Las imágenes de poco contraste
+       no llegan a este nivel (ver ImageHandler._cache_lookup).
+
+    Ambos niveles tienen capacidad acotada con desalojo LRU. Opcionalmente
+    las entradas se persisten en SQLite y se recargan al arrancar. El
+    modelo de visión forma parte de la clave para no servir descripciones
+    de un modelo anterior.
+
+    Attributes:
+        threshold: Bits distintos máximos (en cada hash) para considerar
+            dos imágenes iguales
+        db_path: Base SQLite de persistencia (None = solo memoria)
+    """
+
+    def __init__(self, max_entries: int = IMAGE_CACHE_MAX_ENTRIES,
+                 threshold: int = IMAGE_CACHE_HASH_THRESHOLD,
+                 db_path: Optional[str] = IMAGE_CACHE_DB_FILE):
+        """
+        Inicializa el cache y carga las entradas persistidas.
+
+        Args:
+            max_entries (int): Cantidad máxima de imágenes guardadas
+            threshold (int): Distancia de Hamming máxima para un acierto
+            db_path (str): Base SQLite de persistencia (None = solo memoria)
+        """
+        self.threshold = threshold
+        self.db_path = db_path
+        self._by_file_id = LRUCache(max_entries)
+        self._by_hash = LRUCache(max_entries)
+        self.similar_hits = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db()
+
+    def get_by_file_id(self, file_unique_id: str) -> Optional[str]:
+        """
+        Busca la descripción de una foto ya vista por su id de Telegram.
+
+        Args:
+            file_unique_id (str): PhotoSize.file_unique_id
+
+        Returns:
+            str: Descripción cacheada, o None
+        """
+        return self._by_file_id.get((GROQ_VISION_MODEL, file_unique_id))
+
+    def get_similar(self, image_hash: Tuple[int, int]) -> Optional[str]:
+        """
+        Busca la descripción de la imagen guardada más parecida.
+
+        Args:
+            image_hash (tuple): dHash horizontal y vertical de la imagen
+
+        Returns:
+            str: Descripción si hay una imagen a threshold bits o menos en
+            los dos hashes, o None
+        """
+        horizontal, vertical = image_hash
+        exact = self._by_hash.get((GROQ_VISION_MODEL, horizontal))
+        if exact is not None and exact[1] in (vertical, None):
+            return exact[0]
+
+        entries = [
+            (key[1], value) for key, value in self._by_hash.items()
+            if key[0] == GROQ_VISION_MODEL and value[1] is not None
+        ]
+        if not entries:
+            return None
+
+        hashes = np.fromiter((key for key, _ in entries), dtype=np.uint64, count=len(entries))
+        distances = hamming_distances(horizontal, hashes)
+        for best in np.argsort(distances, kind="stable"):
+            if distances[best] > self.threshold:
+                return None
+            key, (description, stored_vertical) = entries[best]
+            # Segunda señal: el hash vertical también tiene que coincidir
+            if bin(stored_vertical ^ vertical).count("1") <= self.threshold:
+                self.similar_hits += 1
+                # Se renueva el uso de la entrada encontrada
+                self._by_hash.get((GROQ_VISION_MODEL, key))
+                return description
+        return None
+
+    def put(self, file_unique_id: Optional[str], image_hash: Optional[Tuple[int, int]],
+            description: Optional[str]):
+        """
+        Guarda la descripción de una imagen.
+
+        Args:
+            file_unique_id (str): Id de Telegram (None si no se conoce)
+            image_hash (tuple): dHash horizontal y vertical (None si no se
+                pudo calcular o la imagen tiene poco contraste)
+            description (str): Descripción generada (None no se guarda)
+        """
+        if not description:
+            return
+        if file_unique_id:
+            self._by_file_id.put((GROQ_VISION_MODEL, file_unique_id), description)
+        if image_hash is not None:
+            horizontal, vertical = image_hash
+            self._by_hash.put((GROQ_VISION_MODEL, horizontal), (description, vertical))
+        self._persist(file_unique_id, image_hash, description)
+
+    def _open_db(self):
+        """Abre (o crea) la base SQLite y carga las entradas más recientes."""
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS image_cache ("
+                "model TEXT NOT NULL, file_unique_id TEXT, image_hash TEXT, "
+                "description TEXT NOT NULL, created_at REAL NOT NULL, image_hash_v TEXT)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(image_cache)")]
+            if "image_hash_v" not in columns:
+                # Base de una versión anterior, sin hash vertical
+                self._db.execute("ALTER TABLE image_cache ADD COLUMN image_hash_v TEXT")
+            # Se descartan las filas que ya no entrarían en el cache
+            self._db.execute(
+                "DELETE FROM image_cache WHERE rowid NOT IN ("
+                "SELECT rowid FROM image_cache ORDER BY created_at DESC LIMIT ?)",
+                (self._by_hash.max_entries,)
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT file_unique_id, image_hash, image_hash_v, description FROM image_cache "
+                "WHERE model = ? ORDER BY created_at DESC LIMIT ?",
+                (GROQ_VISION_MODEL, self._by_hash.max_entries)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️  Cache de imágenes sin persistencia: {e}")
+            self._db = None
+            return
+
+        for file_unique_id, image_hash, image_hash_v, description in reversed(rows):
+            if file_unique_id:
+                self._by_file_id.put((GROQ_VISION_MODEL, file_unique_id), description)
+            if image_hash:
+                # Sin hash vertical (filas viejas) solo sirve para aciertos exactos
+                vertical = int(image_hash_v, 16) if image_hash_v else None
+                self._by_hash.put((GROQ_VISION_MODEL, int(image_hash, 16)), (description, vertical))
+        if rows:
+            print(f"✅ Cache de imágenes: {len(rows)} entradas cargadas de {self.db_path}")
+
+    def _persist(self, file_unique_id: Optional[str], image_hash: Optional[Tuple[int, int]],
+                 description: str):
+        """Escribe una entrada en SQLite (si la persistencia está activa)."""
+        if self._db is None:
+            return
+        horizontal, vertical = (
+            (f"{value:016x}" for value in image_hash) if image_hash is not None else (None, None)
+        )
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT INTO image_cache (model, file_unique_id, image_hash, image_hash_v, "
+                    "description, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (GROQ_VISION_MODEL, file_unique_id, horizontal, vertical,
+                     description, time.time())
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo guardar en el cache de imágenes: {e}")
+
+    def stats(self) -> dict:
+        """
+        Métricas del cache de imágenes.
+
+        Returns:
+            dict: Aciertos por id (antes de descargar) y por hash (exactos y
+            parecidos), y tamaño de cada nivel
+        """
+        by_file_id = self._by_file_id.stats()
+        by_hash = self._by_hash.stats()
+        return {
+            "file_id_hits": by_file_id["hits"],
+            "file_id_size": by_file_id["size"],
+            "hash_exact_hits": by_hash["hits"] - self.similar_hits,
+            "hash_similar_hits": self.similar_hits,
+            "misses": by_hash["misses"] - self.similar_hits,
+            "hash_size": by_hash["size"],
+            "threshold": self.threshold
+        }
@@ -1,34 +1,83 @@
+import asyncio
 import base64
-from groq import Groq
-from typing import Optional
+import threading
+import time
+from typing import List, Optional, Tuple
 from config import (
-    GROQ_API_KEY, 
     GROQ_VISION_MODEL, 
     VISION_TEMPERATURE, 
     VISION_MAX_TOKENS,
-    SAMSUNG_SHOP_URL
+    SAMSUNG_SHOP_URL,
+    IMAGE_PREPROCESS_ENABLED,
+    IMAGE_CACHE_ENABLED,
+    IMAGE_CACHE_MIN_CONTRAST,
+    IMAGE_MEDIA_GROUP_MAX_IMAGES,
+    RATE_LIMIT_IMAGE_TOKENS
 )
+from modules.groq_client import get_async_client, get_client
+from modules.rate_limiter import get_limiter
+from modules.image_cache import ImageResultCache
+from modules.image_processing import perceptual_hash, prepare_image
+from modules.metrics import register_stats
+from modules.tokens import estimate_tokens
+from modules.token_usage import record_usage
 
 
 class ImageAnalyzer:
     """
     Maneja el análisis de imágenes de productos.
     
+    Antes de enviarla al modelo, la imagen se achica y recomprime
+    (IMAGE_PREPROCESS_ENABLED) y se registran tiempos y tamaños por imagen.
+    Las descripciones se cachean por id de Telegram y por hash perceptual
+    (IMAGE_CACHE_ENABLED), así las fotos reenviadas no vuelven al modelo.
+    
     Attributes:
         client: Cliente de Groq API para visión
+        async_client: Cliente asíncrono de Groq API (modo async)
+        limiter: Cuota compartida del modelo de visión
+        cache: Cache de descripciones (None si está desactivado)
     """
     
     def __init__(self):
         """Inicializa el analizador de imágenes."""
-        self.client = Groq(api_key=GROQ_API_KEY)
+        self.client = get_client("vision")
+        self.async_client = get_async_client("vision")
+        self.limiter = get_limiter(GROQ_VISION_MODEL)
+        self._stats = {
+            "images": 0, "bytes_in": 0, "bytes_sent": 0, "vision_calls": 0,
+            "preprocess_ms_total": 0.0, "vision_ms_total": 0.0, "low_contrast": 0
+        }
+        self._stats_lock = threading.Lock()
+        self.cache = ImageResultCache() if IMAGE_CACHE_ENABLED else None
+        register_stats("images", self.stats)
+        if self.cache is not None:
+            register_stats("image_cache", self.cache.stats)
         print("✅ ImageAnalyzer inicializado")
     
-    def analyze(self, image_bytes: bytes) -> Optional[str]:
+    def cached_description(self, file_unique_id: str) -> Optional[str]:
+        """
+        Descripción ya generada para una foto, consultable antes de descargarla.
+        
+        Args:
+            file_unique_id (str): PhotoSize.file_unique_id de Telegram
+            
+        Returns:
+            str: Descripción cacheada, o None
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get_by_file_id(file_unique_id)
+    
+    def analyze(self, image_bytes: bytes, file_unique_id: Optional[str] = None,
+                chat_id: Optional[int] = None) -> Optional[str]:
         """
         Analiza una imagen y devuelve descripción del producto.
         
         Args:
             image_bytes (bytes): Bytes de la imagen
+            file_unique_id (str): Id de Telegram de la foto (para el cache)
+            chat_id (int): Id del chat (contabilidad de tokens)
             
         Returns:
             str: Descripción del producto con enlace al catálogo, o None si falla
@@ -42,42 +91,324 @@ class ImageAnalyzer:
             "Veo que estás interesado en un Galaxy S24..."
         """
         try:
-            # Convertir imagen a base64
-            image_base64 = self._bytes_to_base64(image_bytes)
+            # Imagen igual o casi igual a una ya analizada
+            cached, image_hash = self._cache_lookup(image_bytes, file_unique_id)
+            if cached:
+                return cached
+            
+            # Achicar y convertir imagen a base64
+            prepared = self._prepare(image_bytes)
             
-            if not image_base64:
+            if not prepared:
                 return None
             
             # Analizar con modelo de visión
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self._get_vision_prompt()
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
+            result = self._complete([prepared], chat_id)
+            self._cache_store(file_unique_id, image_hash, result)
+            return result
+        
+        except Exception as e:
+            print(f"❌ Error en análisis de imagen: {e}")
+            return None
+    
+    def analyze_many(self, images: List[bytes], chat_id: Optional[int] = None) -> Optional[str]:
+        """
+        Analiza varias imágenes (ej: un álbum) en una sola llamada al modelo.
+        
+        El resultado describe el conjunto, así que no se guarda en el cache
+        por imagen. Se envían como mucho IMAGE_MEDIA_GROUP_MAX_IMAGES.
+        
+        Args:
+            images (list): Bytes de cada imagen, en orden
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            str: Descripción conjunta con enlace al catálogo, o None si falla
+        """
+        try:
+            prepared = [
+                item for item in map(self._prepare, self._limit(images)) if item
+            ]
+            if not prepared:
+                return None
+            return self._complete(prepared, chat_id)
+        
+        except Exception as e:
+            print(f"❌ Error en análisis de imágenes: {e}")
+            return None
+    
+    async def analyze_async(self, image_bytes: bytes, file_unique_id: Optional[str] = None,
+                            chat_id: Optional[int] = None) -> Optional[str]:
+        """
+        Versión asíncrona de analyze usando AsyncGroq.
+        
+        Args:
+            image_bytes (bytes): Bytes de la imagen
+            file_unique_id (str): Id de Telegram de la foto (para el cache)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            str: Descripción del producto con enlace al catálogo, o None si falla
+        """
+        try:
+            cached, image_hash = await asyncio.to_thread(
+                self._cache_lookup, image_bytes, file_unique_id
+            )
+            if cached:
+                return cached
+            
+            prepared = await asyncio.to_thread(self._prepare, image_bytes)
+            
+            if not prepared:
+                return None
+            
+            result = await self._complete_async([prepared], chat_id)
+            self._cache_store(file_unique_id, image_hash, result)
+            return result
+        
+        except Exception as e:
+            print(f"❌ Error en análisis de imagen: {e}")
+            return None
+    
+    async def analyze_many_async(self, images: List[bytes],
+                                 chat_id: Optional[int] = None) -> Optional[str]:
+        """
+        Versión asíncrona de analyze_many.
+        
+        Args:
+            images (list): Bytes de cada imagen, en orden
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            str: Descripción conjunta con enlace al catálogo, o None si falla
+        """
+        try:
+            prepared = await asyncio.to_thread(
+                lambda: [item for item in map(self._prepare, self._limit(images)) if item]
+            )
+            if not prepared:
+                return None
+            return await self._complete_async(prepared, chat_id)
+        
+        except Exception as e:
+            print(f"❌ Error en análisis de imágenes: {e}")
+            return None
+    
+    def _complete(self, images: List[Tuple[str, str]], chat_id: Optional[int] = None) -> str:
+        """
+        Llama al modelo de visión con una o más imágenes ya preparadas.
+        
+        Args:
+            images (list): Tuplas (base64, tipo MIME)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            str: Descripción con enlace al catálogo
+        """
+        started = time.perf_counter()
+        prompt_tokens = self._prompt_tokens(images)
+        chat_completion = self.limiter.call(
+            lambda: self.client.chat.completions.create(
+                messages=self._build_messages(images),
                 model=GROQ_VISION_MODEL,
                 temperature=VISION_TEMPERATURE,
                 max_tokens=VISION_MAX_TOKENS
+            ),
+            prompt_tokens + VISION_MAX_TOKENS
+        )
+        self._record("vision_ms_total", started)
+        record_usage(GROQ_VISION_MODEL, "image", chat_id, prompt_tokens, chat_completion.usage)
+        with self._stats_lock:
+            self._stats["vision_calls"] += 1
+        
+        description = chat_completion.choices[0].message.content
+        return f"{description}\n\n{SAMSUNG_SHOP_URL}"
+    
+    async def _complete_async(self, images: List[Tuple[str, str]],
+                              chat_id: Optional[int] = None) -> str:
+        """
+        Versión asíncrona de _complete.
+        
+        Args:
+            images (list): Tuplas (base64, tipo MIME)
+            chat_id (int): Id del chat (contabilidad de tokens)
+            
+        Returns:
+            str: Descripción con enlace al catálogo
+        """
+        started = time.perf_counter()
+        prompt_tokens = self._prompt_tokens(images)
+        chat_completion = await self.limiter.call_async(
+            lambda: self.async_client.chat.completions.create(
+                messages=self._build_messages(images),
+                model=GROQ_VISION_MODEL,
+                temperature=VISION_TEMPERATURE,
+                max_tokens=VISION_MAX_TOKENS
+            ),
+            prompt_tokens + VISION_MAX_TOKENS
+        )
+        self._record("vision_ms_total", started)
+        record_usage(GROQ_VISION_MODEL, "image", chat_id, prompt_tokens, chat_completion.usage)
+        with self._stats_lock:
+            self._stats["vision_calls"] += 1
+        
+        description = chat_completion.choices[0].message.content
+        return f"{description}\n\n{SAMSUNG_SHOP_URL}"
+    
+    def _prompt_tokens(self, images: List[Tuple[str, str]]) -> int:
+        """Tokens estimados del prompt: instrucciones + imágenes."""
+        return estimate_tokens(self._get_vision_prompt()) + len(images) * RATE_LIMIT_IMAGE_TOKENS
+    
+    def _limit(self, images: List[bytes]) -> List[bytes]:
+        """Recorta la lista al máximo de imágenes por llamada."""
+        if len(images) > IMAGE_MEDIA_GROUP_MAX_IMAGES:
+            print(f"⚠️ Álbum de {len(images)} imágenes: se analizan las primeras "
+                  f"{IMAGE_MEDIA_GROUP_MAX_IMAGES}")
+        return images[:IMAGE_MEDIA_GROUP_MAX_IMAGES]
+    
+    def _build_messages(self, images: List[Tuple[str, str]]) -> list:
+        """
+        Arma el mensaje multimodal (prompt + imágenes) para el modelo de visión.
+        
+        Args:
+            images (list): Tuplas (imagen en base64, tipo MIME real)
+            
+        Returns:
+            list: Mensajes para el endpoint de chat
+        """
+        prompt = self._get_vision_prompt()
+        if len(images) > 1:
+            prompt += (
+                " El cliente envió varias imágenes juntas: analízalas en "
+                "conjunto y responde con un solo mensaje."
             )
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    }
+                ] + [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{image_base64}"
+                        }
+                    }
+                    for image_base64, mime_type in images
+                ]
+            }
+        ]
+    
+    def _prepare(self, image_bytes: bytes) -> Optional[Tuple[str, str]]:
+        """
+        Preprocesa la imagen y la codifica en base64.
+        
+        Si Pillow no puede abrirla, se envía tal cual como JPEG (comportamiento
+        anterior) y que decida el modelo.
+        
+        Args:
+            image_bytes (bytes): Bytes de la imagen descargada
             
-            description = chat_completion.choices[0].message.content
-            return f"{description}\n\n{SAMSUNG_SHOP_URL}"
+        Returns:
+            tuple: (base64, tipo MIME), o None si falla
+        """
+        started = time.perf_counter()
+        mime_type = "image/jpeg"
+        payload = image_bytes
+        if IMAGE_PREPROCESS_ENABLED:
+            try:
+                payload, mime_type, info = prepare_image(image_bytes)
+                (width, height), (new_width, new_height) = info["source_size"], info["final_size"]
+                print(f"🖼️ Imagen {width}x{height} -> {new_width}x{new_height}, "
+                      f"{len(image_bytes) / 1024:.0f} KB -> {len(payload) / 1024:.0f} KB "
+                      f"en {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"⚠️ No se pudo preprocesar la imagen, se envía original: {e}")
         
-        except Exception as e:
-            print(f"❌ Error en análisis de imagen: {e}")
+        image_base64 = self._bytes_to_base64(payload)
+        if not image_base64:
             return None
+        
+        with self._stats_lock:
+            self._stats["images"] += 1
+            self._stats["bytes_in"] += len(image_bytes)
+            self._stats["bytes_sent"] += len(image_base64)
+        self._record("preprocess_ms_total", started)
+        return image_base64, mime_type
+    
+    def _cache_lookup(self, image_bytes: bytes, file_unique_id: Optional[str]
+                      ) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+        """
+        Busca una descripción para una imagen parecida a otra ya analizada.
+        
+        Las imágenes de poco contraste (capturas con fondo blanco, imágenes
+        casi lisas) no se buscan ni se guardan por hash: su dHash no las
+        distingue y solo se reutilizan por file_unique_id.
+        
+        Args:
+            image_bytes (bytes): Bytes de la imagen
+            file_unique_id (str): Id de Telegram de la foto
+            
+        Returns:
+            tuple: (descripción cacheada o None, dHash horizontal y vertical
+            de la imagen o None)
+        """
+        if self.cache is None:
+            return None, None
+        try:
+            horizontal, vertical, contrast = perceptual_hash(image_bytes)
+        except Exception as e:
+            print(f"⚠️ No se pudo calcular el hash de la imagen: {e}")
+            return None, None
+        if contrast < IMAGE_CACHE_MIN_CONTRAST:
+            with self._stats_lock:
+                self._stats["low_contrast"] += 1
+            return None, None
+        
+        image_hash = (horizontal, vertical)
+        cached = self.cache.get_similar(image_hash)
+        if cached and file_unique_id:
+            # La próxima vez se resuelve antes de descargar
+            self.cache.put(file_unique_id, None, cached)
+        return cached, image_hash
+    
+    def _cache_store(self, file_unique_id: Optional[str], image_hash: Optional[Tuple[int, int]],
+                     result: str):
+        """Guarda una descripción nueva en el cache (si está activo)."""
+        if self.cache is not None:
+            self.cache.put(file_unique_id, image_hash, result)
+    
+    def _record(self, counter: str, started: float):
+        """Suma el tiempo transcurrido desde started (en ms) a un contador."""
+        with self._stats_lock:
+            self._stats[counter] += (time.perf_counter() - started) * 1000
+    
+    def stats(self) -> dict:
+        """
+        Métricas de imágenes procesadas.
+        
+        Returns:
+            dict: Imágenes, bytes descargados y enviados (base64), llamadas
+            al modelo, tiempos promedio de preprocesado (por imagen) y de la
+            llamada al modelo de visión, e imágenes que no se buscaron por
+            hash por tener poco contraste
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        images = stats["images"] or 1
+        calls = stats["vision_calls"] or 1
+        return {
+            "images": stats["images"],
+            "bytes_in": stats["bytes_in"],
+            "bytes_sent": stats["bytes_sent"],
+            "vision_calls": stats["vision_calls"],
+            "preprocess_ms_avg": round(stats["preprocess_ms_total"] / images, 1),
+            "vision_ms_avg": round(stats["vision_ms_total"] / calls, 1),
+            "low_contrast": stats["low_contrast"]
+        }
     
     def _bytes_to_base64(self, image_bytes: bytes) -> Optional[str]:
         """
@@ -0,0 +1,130 @@
+import io
+from typing import List, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+from config import IMAGE_MIN_DIMENSION, IMAGE_MAX_DIMENSION, IMAGE_JPEG_QUALITY
+
+# Tag EXIF de orientación (1 = sin girar)
+_EXIF_ORIENTATION = 0x0112
+
+
+def select_photo_size(photo_sizes: List, min_dimension: int = IMAGE_MIN_DIMENSION):
+    """
+    Elige el tamaño de foto más chico que alcanza la resolución mínima.
+
+    Telegram manda cada foto en varios tamaños (miniatura, mediano, original);
+    para el modelo de visión no hace falta el original, y uno más chico se
+    descarga y se sube más rápido.
+
+    Args:
+        photo_sizes (list): message.photo (lista de PhotoSize)
+        min_dimension (int): Lado mayor mínimo en píxeles
+
+    Returns:
+        PhotoSize: El tamaño elegido (el más grande si ninguno llega al mínimo)
+    """
+    by_area = sorted(photo_sizes, key=lambda size: size.width * size.height)
+    for size in by_area:
+        if max(size.width, size.height) >= min_dimension:
+            return size
+    return by_area[-1]
+
+
+def prepare_image(image_bytes: bytes, max_dimension: int = IMAGE_MAX_DIMENSION,
+                  quality: int = IMAGE_JPEG_QUALITY) -> Tuple[bytes, str, dict]:
+    """
+    Achica y recomprime una imagen para el modelo de visión.
+
+    Se aplica la orientación EXIF, se reduce el lado mayor a max_dimension
+    y se recodifica como JPEG (las transparencias van sobre fondo blanco).
+    Si la imagen no hubo que girarla ni achicarla y la versión recodificada
+    no es más liviana, se usa la original con su tipo MIME real.
+
+    Args:
+        image_bytes (bytes): Imagen original (JPEG, PNG, WEBP...)
+        max_dimension (int): Lado mayor máximo en píxeles
+        quality (int): Calidad JPEG (1-95)
+
+    Returns:
+        tuple: (bytes, tipo MIME, info con tamaños original y final)
+    """
+    with Image.open(io.BytesIO(image_bytes)) as original:
+        source_format = original.format
+        source_size = original.size
+        rotated = original.getexif().get(_EXIF_ORIENTATION, 1) != 1
+        image = ImageOps.exif_transpose(original)
+
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        encoded = buffer.getvalue()
+        final_size = image.size
+
+    info = {"source_size": source_size, "final_size": final_size}
+    keep_original = not resized and not rotated and len(encoded) >= len(image_bytes)
+    if keep_original and source_format in Image.MIME:
+        info["final_size"] = source_size
+        return image_bytes, Image.MIME[source_format], info
+    return encoded, "image/jpeg", info
+
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 8) -> Tuple[int, int, float]:
+    """
+    dHash (difference hash) horizontal y vertical de una imagen.
+
+    Se reduce la imagen a escala de grises de (hash_size + 1) x (hash_size + 1)
+    y cada bit indica si un píxel es más claro que su vecino de la derecha
+    (horizontal) o de abajo (vertical). Recompresiones, cambios de tamaño y
+    retoques leves cambian pocos bits, así que dos imágenes casi iguales
+    quedan a poca distancia de Hamming en los dos hashes.
+
+    Si la miniatura es casi lisa (capturas con fondo blanco, imágenes
+    uniformes) los bits dependen de diferencias mínimas y no identifican la
+    imagen: por eso se devuelve también su contraste.
+
+    Args:
+        image_bytes (bytes): Imagen original
+        hash_size (int): Lado del hash (8 -> 64 bits)
+
+    Returns:
+        tuple: (hash horizontal, hash vertical, desvío estándar de grises
+        de la miniatura en 0-255)
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (hash_size * 8, hash_size * 8))  # decodificación reducida (JPEG)
+        small = ImageOps.exif_transpose(image).convert("L").resize(
+            (hash_size + 1, hash_size + 1), Image.LANCZOS
+        )
+    pixels = np.asarray(small, dtype=np.int16)
+    horizontal = (pixels[:hash_size, 1:] > pixels[:hash_size, :-1]).flatten()
+    vertical = (pixels[1:, :hash_size] > pixels[:-1, :hash_size]).flatten()
+    return _pack(horizontal), _pack(vertical), float(pixels.std())
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distances(image_hash: int, hashes: np.ndarray) -> np.ndarray:
+    """
+    Distancia de Hamming de un hash de 64 bits contra muchos a la vez.
+
+    Args:
+        image_hash (int): Hash a comparar
+        hashes (np.ndarray): Hashes guardados (uint64)
+
+    Returns:
+        np.ndarray: Cantidad de bits distintos contra cada hash
+    """
+    different = np.bitwise_xor(hashes, np.uint64(image_hash))
+    return np.unpackbits(different.view(np.uint8)).reshape(len(hashes), 64).sum(axis=1)
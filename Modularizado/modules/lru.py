@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Cache en memoria acotado, con desalojo LRU y expiración opcional (TTL).
+
+    Es thread-safe y lleva contadores de aciertos/fallos para exponer
+    como métricas.
+
+    Attributes:
+        max_entries: Cantidad máxima de entradas
+        ttl: Segundos de vida de cada entrada (None = sin expiración)
+        hits: Aciertos acumulados
+        misses: Fallos acumulados
+        evictions: Entradas desalojadas por capacidad
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        """
+        Inicializa el cache vacío.
+
+        Args:
+            max_entries (int): Cantidad máxima de entradas
+            ttl (float): Segundos de vida de cada entrada (None = sin expiración)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Busca una entrada y la marca como usada recientemente.
+
+        Args:
+            key: Clave a buscar
+
+        Returns:
+            El valor guardado, o None si no existe o expiró
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Guarda una entrada, desalojando la menos usada si no hay lugar.
+
+        Args:
+            key: Clave
+            value: Valor a guardar (None no se cachea)
+        """
+        if value is None:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> list:
+        """
+        Entradas vigentes, de la menos a la más usada.
+
+        Returns:
+            list: Tuplas (clave, valor)
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, expires_at) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def clear(self):
+        """Vacía el cache (los contadores se conservan)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        Métricas del cache.
+
+        Returns:
+            dict: Tamaño, aciertos, fallos, tasa de acierto y desalojos
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, List
+from config import IMAGE_MEDIA_GROUP_WINDOW_SECONDS
+from modules.metrics import register_stats
+
+
+class MediaGroupBuffer:
+    """
+    Junta los mensajes de un mismo álbum de Telegram.
+
+    Telegram entrega un álbum como N mensajes separados con el mismo
+    media_group_id, casi juntos. El primero abre una ventana de
+    window_seconds; los que llegan mientras tanto se agregan al grupo, y al
+    cerrarse la ventana se llama a on_flush una sola vez con todos los
+    mensajes, ordenados por message_id.
+
+    Attributes:
+        window_seconds: Duración de la ventana de espera
+        on_flush: Callback que recibe la lista de mensajes del álbum
+    """
+
+    def __init__(self, on_flush: Callable[[List], None],
+                 window_seconds: float = IMAGE_MEDIA_GROUP_WINDOW_SECONDS):
+        """
+        Inicializa el buffer.
+
+        Args:
+            on_flush: Callback que recibe la lista de mensajes del álbum
+            window_seconds (float): Duración de la ventana de espera
+        """
+        self.on_flush = on_flush
+        self.window_seconds = window_seconds
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._flushed_groups = 0
+        self._buffered_messages = 0
+        register_stats("media_groups", self.stats)
+
+    def add(self, message) -> bool:
+        """
+        Agrega un mensaje a su álbum.
+
+        Args:
+            message: Mensaje de Telegram con media_group_id
+
+        Returns:
+            bool: True si es el primer mensaje del álbum (abre la ventana)
+        """
+        key = (message.chat.id, message.media_group_id)
+        with self._lock:
+            self._buffered_messages += 1
+            if key in self._groups:
+                self._groups[key].append(message)
+                return False
+            self._groups[key] = [message]
+
+        self._schedule(key)
+        return True
+
+    def _schedule(self, key):
+        """Programa el cierre de la ventana de un álbum."""
+        timer = threading.Timer(self.window_seconds, self._flush, args=(key,))
+        timer.daemon = True
+        timer.start()
+
+    def _pop(self, key) -> List:
+        """Saca el álbum del buffer y lo devuelve ordenado."""
+        with self._lock:
+            messages = self._groups.pop(key, [])
+            self._flushed_groups += 1
+        return sorted(messages, key=lambda message: message.message_id)
+
+    def _flush(self, key):
+        """Cierra la ventana de un álbum y lo entrega."""
+        messages = self._pop(key)
+        try:
+            self.on_flush(messages)
+        except Exception as e:
+            print(f"❌ Error al procesar el álbum: {e}")
+
+    def stats(self) -> dict:
+        """
+        Métricas de álbumes.
+
+        Returns:
+            dict: Álbumes procesados, fotos recibidas en álbumes y llamadas
+            individuales ahorradas
+        """
+        with self._lock:
+            return {
+                "groups": self._flushed_groups,
+                "messages": self._buffered_messages,
+                "calls_saved": self._buffered_messages - self._flushed_groups
+            }
+
+
+class AsyncMediaGroupBuffer(MediaGroupBuffer):
+    """
+    Versión para el bot asíncrono: la ventana es un asyncio.sleep en el
+    event loop y on_flush es una corrutina.
+    """
+
+    def __init__(self, on_flush: Callable[[List], Awaitable[None]],
+                 window_seconds: float = IMAGE_MEDIA_GROUP_WINDOW_SECONDS):
+        super().__init__(on_flush, window_seconds)
+        self._tasks = set()
+
+    def _schedule(self, key):
+        task = asyncio.get_running_loop().create_task(self._flush_later(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_later(self, key):
+        """Espera la ventana y entrega el álbum."""
+        await asyncio.sleep(self.window_seconds)
+        messages = self._pop(key)
+        try:
+            await self.on_flush(messages)
+        except Exception as e:
+            print(f"❌ Error al procesar el álbum: {e}")
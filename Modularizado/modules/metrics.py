@@ -0,0 +1,68 @@
+import json
+from threading import Event, Lock, Thread
+from typing import Callable, Dict
+
+
+_providers: Dict[str, Callable[[], dict]] = {}
+_lock = Lock()
+
+
+def register_stats(name: str, provider: Callable[[], dict]):
+    """
+    Registra una fuente de métricas.
+
+    Args:
+        name (str): Nombre de la sección (ej: "dispatcher")
+        provider: Función sin argumentos que devuelve un dict serializable
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_stats() -> dict:
+    """
+    Obtiene una foto de todas las métricas registradas.
+
+    Returns:
+        dict: {nombre: métricas} de cada fuente registrada
+    """
+    with _lock:
+        providers = dict(_providers)
+
+    snapshot = {}
+    for name, provider in providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            snapshot[name] = {"error": str(e)}
+    return snapshot
+
+
+def log_stats():
+    """Imprime todas las métricas registradas en una sola línea JSON."""
+    print(f"📊 Métricas: {json.dumps(collect_stats(), ensure_ascii=False)}")
+
+
+def start_stats_logger(interval: float) -> Event:
+    """
+    Imprime las métricas cada interval segundos en un hilo de fondo.
+
+    Así se pueden seguir en cualquier modo (polling o webhook, sync o
+    async), no solo con GET /stats del servidor del webhook.
+
+    Args:
+        interval (float): Segundos entre cada línea (<= 0 no inicia nada)
+
+    Returns:
+        Event: Al setearlo se detiene el hilo
+    """
+    stop = Event()
+    if interval <= 0:
+        return stop
+
+    def run():
+        while not stop.wait(interval):
+            log_stats()
+
+    Thread(target=run, name="stats-logger", daemon=True).start()
+    return stop
@@ -0,0 +1,135 @@
+import hashlib
+import json
+from typing import Optional
+from config import SAMSUNG_SUPPORT_URL
+from modules.tokens import estimate_tokens
+
+
+# Instrucciones estáticas: no deben contener nada que cambie por request,
+# así el prefijo del prompt es idéntico byte a byte y el cache de prompts
+# del proveedor puede reutilizarlo.
+_INSTRUCTIONS = f"""Eres el asistente virtual de una tienda de Samsung. Tu tarea es \
+responder basándote en la información proporcionada en el dataset, \
+siendo *resolutivo y empático.*
+
+*Instrucción de Empatía:* Debes analizar el tono o el sentimiento \
+implícito en el mensaje del cliente (por ejemplo: frustración, \
+confusión, urgencia, alegría o interés). *Toda respuesta debe \
+comenzar con una frase breve y humana que reconozca este sentimiento* \
+antes de proceder con la información resolutiva.
+
+En caso de no encontrar la respuesta en el dataset, índica de manera \
+amistosa y amable que no cuentas con esa información, sugiriendo \
+contactar directamente con la empresa.
+
+Reglas importantes:
+1. Solo responde información proporcionada en el dataset.
+2. No inventes, añadas o busques información adicional a menos de que \
+sea para proporcionar un enlace directo a la tienda en caso de que \
+el cliente este buscando ESE producto en especifico.
+3. Si la información solicitada no esta en el dataset, sugiere contactar \
+a {SAMSUNG_SUPPORT_URL}
+4. No respondas preguntas no relacionadas con la empresa.
+5. No incluyas en tus respuestas nunca un dato sensible como el número \
+de algún miembro del personal, en caso de ser solicitados debes \
+responder: "No puedo brindar dicha información."
+6. *Sé empático, amable, profesional y orientado a la resolución.* \
+Tu respuesta siempre debe empezar con una frase que reconozca el \
+estado emocional del cliente.
+    * *Ejemplos de frases empáticas:* "Entiendo perfectamente su \
+frustración con este tema," "Me alegra mucho que esté \
+considerando este producto," "Lamento el inconveniente que \
+esto le ha causado," o "Gracias por la claridad en su consulta."
+7. Solo saluda en la primera interacción.
+8. Puedes utilizar emojis en tus respuestas, hasta un máximo de 3.
+9. No incluyas saludos si la conversación ya fue iniciada.
+10. Siempre responde evitando la redundancia y repetición de información.
+11. Nunca envies links inactivos, en caso de que se soliciten productos \
+o categorias de productos, debes proporcionar la lista completa de \
+páginas que figura en el dataset.
+12. Utiliza correctamente el punto y seguido.
+13. Utiliza correctamente el punto y aparte.
+14. No brindes enlaces especificos a un producto, solo envía enlaces a la categoria del producto por ejemplo https://www.samsung.com/ar/smartphones/."""
+
+
+def compact_json(data) -> str:
+    """
+    Serializa sin indentación ni espacios extra (menos tokens, salida estable).
+
+    Args:
+        data: Objeto serializable
+
+    Returns:
+        str: JSON compacto
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class SystemPrompt:
+    """
+    System prompt precompilado a partir del dataset.
+
+    El prefijo (instrucciones + company_info, o el dataset completo cuando
+    no se usa recuperación) se compila una sola vez por versión del dataset
+    y se mantiene idéntico byte a byte. El contenido que varía por request
+    (las entradas recuperadas) se agrega siempre al final.
+
+    Attributes:
+        dataset: Dataset con información de la empresa
+        include_dataset: Si el prefijo lleva el dataset completo
+        prefix: Parte estática del prompt
+        version: Hash del dataset (cambia cuando cambia dataset.json)
+    """
+
+    def __init__(self, dataset: dict, include_dataset: bool = False):
+        """
+        Compila el prefijo del prompt.
+
+        Args:
+            dataset (dict): Dataset con información empresarial
+            include_dataset (bool): True para embeber el dataset completo en
+                el prefijo (sin recuperación por mensaje)
+        """
+        self.dataset = dataset
+        self.include_dataset = include_dataset
+        self.version = hashlib.sha256(compact_json(dataset).encode("utf-8")).hexdigest()[:12]
+
+        static_data = dataset if include_dataset else {
+            "company_info": dataset.get("company_info", {})
+        }
+        self.prefix = f"{_INSTRUCTIONS}\n\nDatos de la empresa:\n{compact_json(static_data)}"
+        self._prefix_tokens = estimate_tokens(self.prefix)
+
+    def build(self, context: Optional[dict] = None) -> str:
+        """
+        Arma el prompt final: prefijo estático + contexto dinámico al final.
+
+        Args:
+            context (dict): Entradas del dataset relevantes para el request
+                (sin company_info, que ya está en el prefijo)
+
+        Returns:
+            str: System prompt completo
+        """
+        if not context:
+            return self.prefix
+        return f"{self.prefix}\n\nInformación relevante para esta consulta:\n{compact_json(context)}"
+
+    def token_report(self) -> dict:
+        """
+        Compara el tamaño del prompt contra el formato anterior
+        (dataset completo con indent=2 reconstruido en cada mensaje).
+
+        Returns:
+            dict: Tokens estimados antes y después
+        """
+        legacy = (
+            f"{_INSTRUCTIONS}\n\nDatos de la empresa:\n"
+            f"{json.dumps(self.dataset, ensure_ascii=False, indent=2)}"
+        )
+        return {
+            "dataset_version": self.version,
+            "legacy_prompt_tokens": estimate_tokens(legacy),
+            "static_prefix_tokens": self._prefix_tokens,
+            "full_dataset_compact_tokens": estimate_tokens(compact_json(self.dataset))
+        }
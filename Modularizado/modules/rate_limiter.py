@@ -0,0 +1,516 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import groq
+from config import (
+    RATE_LIMITS,
+    RATE_LIMIT_DEFAULT,
+    RATE_LIMIT_MAX_WAIT_SECONDS,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE_SECONDS,
+    RATE_LIMIT_BACKOFF_MAX_SECONDS,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN_SECONDS
+)
+from modules.metrics import register_stats
+from modules.token_usage import chunk_usage
+
+T = TypeVar("T")
+
+# Errores transitorios: se reintentan y cuentan para el circuit breaker.
+# El resto (400, 401, ...) se propaga enseguida.
+_RETRYABLE_ERRORS = (groq.RateLimitError, groq.InternalServerError, groq.APIConnectionError)
+
+
+class RateLimitTimeout(Exception):
+    """La cuota no alcanza para atender la llamada dentro de la espera máxima."""
+
+
+class CircuitOpenError(Exception):
+    """El circuit breaker del modelo está abierto: se falla sin llamar a la API."""
+
+
+class TokenBucket:
+    """
+    Balde de tokens con reservas: cada llamada descuenta lo que usa aunque
+    el balde quede negativo, y espera lo que tarda en volver a cero.
+
+    Como las reservas se toman en orden de llegada, las esperas también
+    quedan en ese orden (FIFO) y una llamada grande no puede quedar
+    postergada indefinidamente por muchas chicas.
+
+    Attributes:
+        capacity: Unidades máximas acumulables (la cuota del período)
+        rate: Unidades que se recuperan por segundo
+    """
+
+    def __init__(self, capacity: float, period_seconds: float):
+        """
+        Inicializa el balde lleno.
+
+        Args:
+            capacity (float): Cuota por período (ej: requests por minuto)
+            period_seconds (float): Duración del período de la cuota
+        """
+        self.capacity = capacity
+        self.rate = capacity / period_seconds
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Descuenta una reserva.
+
+        Args:
+            amount (float): Unidades a consumir (se acota a la capacidad)
+            now (float): time.monotonic() actual
+
+        Returns:
+            float: Segundos a esperar antes de usar la reserva
+        """
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def release(self, amount: float, now: float):
+        """Devuelve unidades reservadas que no se usaron."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un modelo que viene fallando.
+
+    Después de failure_threshold fallas transitorias seguidas se abre por
+    cooldown segundos y las llamadas fallan enseguida (sin sumar carga ni
+    hacer esperar al usuario). Pasado ese tiempo deja pasar una sola de
+    prueba (semiabierto): si sale bien se cierra, si falla se vuelve a abrir,
+    y si no termina (ej: se cancela) vuelve a abierto para que pruebe otra.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = CIRCUIT_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self, probe: bool = True) -> bool:
+        """
+        Verifica que se pueda llamar a la API.
+
+        Args:
+            probe (bool): Si el circuito está listo para probar, pasarlo a
+                semiabierto con esta llamada como prueba (False = solo consultar)
+
+        Returns:
+            bool: True si esta llamada quedó como la de prueba
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto o ya hay una
+            llamada de prueba en curso
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open" and time.monotonic() >= self._open_until:
+                if probe:
+                    self.state = "half_open"
+                return probe
+            raise CircuitOpenError(f"circuito abierto ({self.state})")
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def abort_probe(self):
+        """La llamada de prueba no terminó: vuelve a abierto, ya listo para probar."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._open_until = time.monotonic() + self.cooldown
+
+
+class ModelRateLimiter:
+    """
+    Limita las llamadas a un modelo de Groq a su cuota y reintenta los
+    errores transitorios.
+
+    Cada llamada reserva 1 request y sus unidades estimadas (tokens de
+    prompt + máximo de salida, o segundos de audio en Whisper) y espera su
+    turno en lugar de chocar con un 429. Si igual llega un 429, se respeta
+    el retry-after frenando a todas las llamadas del modelo, y los errores
+    transitorios se reintentan con backoff exponencial con jitter.
+
+    Las respuestas en streaming se devuelven envueltas (SettlingStream) y
+    la reserva se liquida recién al terminar el stream: con el usage del
+    último fragmento se devuelve el sobrante, y el circuit breaker registra
+    el éxito o la falla según cómo terminó.
+
+    Attributes:
+        model: Nombre del modelo
+        breaker: Circuit breaker del modelo
+    """
+
+    def __init__(self, model: str, limits: dict):
+        """
+        Inicializa los baldes del modelo.
+
+        Args:
+            model (str): Nombre del modelo
+            limits (dict): Cuota: "rpm" y opcionalmente "tpm" (tokens por
+                minuto) o "ash" (segundos de audio por hora)
+        """
+        self.model = model
+        self.requests = TokenBucket(limits["rpm"], 60)
+        self.units = None
+        if limits.get("tpm"):
+            self.units = TokenBucket(limits["tpm"], 60)
+        elif limits.get("ash"):
+            self.units = TokenBucket(limits["ash"], 3600)
+        self.breaker = CircuitBreaker()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._rate_limited = 0
+        self._retries = 0
+        self._failures = 0
+
+    def call(self, request: Callable[[], T], units: float = 0) -> T:
+        """
+        Hace una llamada a la API dentro de la cuota.
+
+        Args:
+            request: Función sin argumentos que hace la llamada
+            units (float): Unidades estimadas (tokens o segundos de audio)
+
+        Returns:
+            El resultado de request()
+
+        Raises:
+            CircuitOpenError: Si el modelo viene fallando
+            RateLimitTimeout: Si la espera superaría RATE_LIMIT_MAX_WAIT_SECONDS
+        """
+        self.breaker.allow(probe=False)
+        wait = self._acquire(units)
+        sent = probing = False
+        try:
+            time.sleep(wait)
+            attempt = 0
+            while True:
+                time.sleep(self._blocked_for())
+                probing = self.breaker.allow()
+                sent = True
+                try:
+                    result = request()
+                except _RETRYABLE_ERRORS as error:
+                    # 429/5xx/conexión: el modelo no procesó la request
+                    sent = probing = False
+                    time.sleep(self._on_error(error, attempt))
+                    attempt += 1
+                    continue
+                except Exception:
+                    # La API respondió (400, 401...): es un error de la request, no del servicio
+                    probing = False
+                    self.breaker.record_success()
+                    raise
+                if isinstance(result, groq.Stream):
+                    return SettlingStream(result, self, units)
+                self._on_success(result, units)
+                return result
+        except BaseException:
+            self._abort(units, sent, probing)
+            raise
+
+    async def call_async(self, request: Callable[[], Awaitable[T]], units: float = 0) -> T:
+        """
+        Versión asíncrona de call (las esperas no bloquean el event loop).
+
+        Args:
+            request: Función sin argumentos que devuelve la corrutina de la llamada
+            units (float): Unidades estimadas (tokens o segundos de audio)
+
+        Returns:
+            El resultado de await request()
+        """
+        self.breaker.allow(probe=False)
+        wait = self._acquire(units)
+        sent = probing = False
+        try:
+            await asyncio.sleep(wait)
+            attempt = 0
+            while True:
+                await asyncio.sleep(self._blocked_for())
+                probing = self.breaker.allow()
+                sent = True
+                try:
+                    result = await request()
+                except _RETRYABLE_ERRORS as error:
+                    # 429/5xx/conexión: el modelo no procesó la request
+                    sent = probing = False
+                    await asyncio.sleep(self._on_error(error, attempt))
+                    attempt += 1
+                    continue
+                except Exception:
+                    # La API respondió (400, 401...): es un error de la request, no del servicio
+                    probing = False
+                    self.breaker.record_success()
+                    raise
+                if isinstance(result, groq.AsyncStream):
+                    return AsyncSettlingStream(result, self, units)
+                self._on_success(result, units)
+                return result
+        except BaseException:
+            # Incluye CancelledError (ej: el respaldo que pierde la carrera)
+            self._abort(units, sent, probing)
+            raise
+
+    def settle(self, reserved: float, used: Optional[int], failed: bool = False):
+        """
+        Liquida una llamada terminada: devuelve a la cuota los tokens
+        reservados que no se usaron y actualiza el circuit breaker.
+
+        Args:
+            reserved (float): Unidades reservadas al llamar
+            used (int): Tokens totales reportados por la API (None si no se conocen)
+            failed (bool): Si la respuesta se cortó por un error del servicio
+        """
+        if failed:
+            with self._lock:
+                self._failures += 1
+            self.breaker.record_failure()
+            return
+        self.breaker.record_success()
+        if self.units is not None and reserved and isinstance(used, int) and used < reserved:
+            with self._lock:
+                self.units.release(reserved - used, time.monotonic())
+
+    def _acquire(self, units: float) -> float:
+        """
+        Reserva la cuota de una llamada.
+
+        Returns:
+            float: Segundos a esperar antes de llamar
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self.requests.reserve(1, now)
+            if self.units is not None and units:
+                wait = max(wait, self.units.reserve(units, now))
+            wait = max(wait, self._blocked_until - now)
+            if wait > RATE_LIMIT_MAX_WAIT_SECONDS:
+                self._release(units, now)
+                raise RateLimitTimeout(f"{self.model}: se necesitan {wait:.0f}s de espera")
+            self._calls += 1
+            if wait > 0:
+                self._waited += 1
+                self._wait_total += wait
+        return wait
+
+    def _release(self, units: float, now: float):
+        """Devuelve la reserva de una llamada que no llegó a la API (con el lock tomado)."""
+        self.requests.release(1, now)
+        if self.units is not None and units:
+            self.units.release(units, now)
+
+    def _abort(self, units: float, sent: bool, probing: bool):
+        """
+        Deshace lo pendiente de una llamada que terminó con una excepción.
+
+        Args:
+            units (float): Unidades reservadas
+            sent (bool): Si la request llegó al modelo (la reserva ya se usó)
+            probing (bool): Si era la llamada de prueba del circuit breaker y
+                su resultado todavía no se registró
+        """
+        if probing:
+            self.breaker.abort_probe()
+        if not sent:
+            with self._lock:
+                self._release(units, time.monotonic())
+
+    def _blocked_for(self) -> float:
+        """Segundos que faltan del último retry-after recibido (0 si ninguno)."""
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+    def _on_error(self, error: Exception, attempt: int) -> float:
+        """
+        Registra un error transitorio y calcula la espera del reintento.
+
+        Returns:
+            float: Segundos a esperar (retry-after si la API lo indica, si no
+            backoff exponencial con jitter completo)
+
+        Raises:
+            El mismo error si ya no quedan reintentos
+        """
+        retry_after = _retry_after(error)
+        with self._lock:
+            if retry_after is not None:
+                self._rate_limited += 1
+                # El 429 frena a todas las llamadas del modelo, no solo a esta
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            if attempt >= RATE_LIMIT_MAX_RETRIES:
+                self._failures += 1
+            else:
+                self._retries += 1
+        self.breaker.record_failure()
+        if attempt >= RATE_LIMIT_MAX_RETRIES:
+            raise error
+
+        backoff = min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        delay = random.uniform(0, backoff)
+        if retry_after is not None:
+            delay = retry_after + delay * 0.1
+        print(f"⏳ {self.model}: {type(error).__name__}, reintento {attempt + 1} en {delay:.1f}s")
+        return delay
+
+    def _on_success(self, result, units: float):
+        """Cierra el circuito y devuelve los tokens reservados que no se usaron."""
+        self.settle(units, getattr(getattr(result, "usage", None), "total_tokens", None))
+
+    def stats(self) -> dict:
+        """
+        Métricas del modelo.
+
+        Returns:
+            dict: Llamadas, cuántas esperaron turno y cuánto, 429 recibidos,
+            reintentos, fallas y estado del circuit breaker
+        """
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "queued": self._waited,
+                "avg_wait_ms": round(self._wait_total / self._waited * 1000, 1) if self._waited else 0.0,
+                "rate_limited": self._rate_limited,
+                "retries": self._retries,
+                "failures": self._failures,
+                "circuit": self.breaker.state,
+                "circuit_opened": self.breaker.opened
+            }
+
+
+class SettlingStream:
+    """
+    Stream de Groq que liquida su reserva en el limitador al terminar.
+
+    Se itera igual que el stream original. Si termina bien se devuelve el
+    sobrante según el usage del último fragmento; si se cierra antes (ej:
+    perdió la carrera contra el respaldo) la reserva queda tomada, porque
+    no se sabe cuánto se generó; si se corta con un error cuenta como falla.
+    """
+
+    def __init__(self, stream, limiter: ModelRateLimiter, reserved: float):
+        self._stream = stream
+        self._limiter = limiter
+        self._reserved = reserved
+        self._usage = None
+        self._settled = False
+
+    def __iter__(self):
+        failed = False
+        try:
+            for chunk in self._stream:
+                self._usage = chunk_usage(chunk) or self._usage
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._settle(failed)
+
+    def close(self):
+        self._stream.close()
+        self._settle(False)
+
+    def _settle(self, failed: bool):
+        if self._settled:
+            return
+        self._settled = True
+        self._limiter.settle(self._reserved, getattr(self._usage, "total_tokens", None), failed)
+
+
+class AsyncSettlingStream(SettlingStream):
+    """Versión para AsyncStream: se itera con async for y close es corrutina."""
+
+    async def __aiter__(self):
+        failed = False
+        try:
+            async for chunk in self._stream:
+                self._usage = chunk_usage(chunk) or self._usage
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._settle(failed)
+
+    async def close(self):
+        await self._stream.close()
+        self._settle(False)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Segundos del header retry-after de un 429 (None si no hay)."""
+    if not isinstance(error, groq.RateLimitError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> ModelRateLimiter:
+    """
+    Limitador compartido de un modelo (uno por modelo en todo el bot).
+
+    Args:
+        model (str): Nombre del modelo
+
+    Returns:
+        ModelRateLimiter: Limitador con la cuota de RATE_LIMITS (o la
+        cuota por defecto si el modelo no figura)
+    """
+    with _lock:
+        if model not in _limiters:
+            _limiters[model] = ModelRateLimiter(model, RATE_LIMITS.get(model, RATE_LIMIT_DEFAULT))
+            register_stats("rate_limits", limiter_stats)
+        return _limiters[model]
+
+
+def limiter_stats() -> dict:
+    """
+    Métricas de todos los limitadores.
+
+    Returns:
+        dict: {modelo: métricas}
+    """
+    with _lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import re
+import threading
+from typing import Awaitable, Callable, Optional
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from modules.lru import LRUCache
+from modules.retrieval import normalize
+
+
+_PUNCTUATION = re.compile(r"[¿?¡!.,;:]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Normaliza un mensaje para usarlo como clave de cache: minúsculas, sin
+    acentos, sin signos de puntuación y con espacios colapsados.
+
+    Args:
+        text (str): Mensaje del usuario
+
+    Returns:
+        str: Mensaje normalizado (ej: "¿Cuáles son los celulares?" -> "cuales son los celulares")
+    """
+    text = _PUNCTUATION.sub(" ", normalize(text))
+    return _SPACES.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """
+    Cache de respuestas del LLM con LRU + TTL y coalescencia de requests.
+
+    Si varias requests idénticas llegan a la vez (single-flight), solo la
+    primera llama a la API; el resto espera y reutiliza su resultado.
+
+    Attributes:
+        cache: Almacenamiento LRU con expiración
+        coalesced: Requests resueltas esperando a otra idéntica en vuelo
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        """
+        Inicializa el cache.
+
+        Args:
+            max_entries (int): Cantidad máxima de respuestas guardadas
+            ttl (float): Segundos de vida de cada respuesta
+        """
+        self.cache = LRUCache(max_entries, ttl)
+        self.coalesced = 0
+        self._inflight = {}
+        self._inflight_async = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(message: str, dataset_version: str) -> str:
+        """
+        Clave de cache: mensaje normalizado + versión del dataset.
+
+        Args:
+            message (str): Mensaje del usuario
+            dataset_version (str): Versión del dataset usado en el prompt
+
+        Returns:
+            str: Clave estable
+        """
+        digest = hashlib.sha1(normalize_message(message).encode("utf-8")).hexdigest()
+        return f"{dataset_version}:{digest}"
+
+    def get_or_compute(self, key: str, compute: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Devuelve la respuesta cacheada o la calcula una sola vez.
+
+        Args:
+            key (str): Clave de cache (ver make_key)
+            compute: Función que obtiene la respuesta (None si falla)
+
+        Returns:
+            str: Respuesta, o None si el cálculo falló
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {"event": threading.Event(), "result": None}
+                self._inflight[key] = flight
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight["event"].wait()
+            return flight["result"]
+
+        try:
+            flight["result"] = compute()
+            self.cache.put(key, flight["result"])
+            return flight["result"]
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight["event"].set()
+
+    async def get_or_compute_async(self, key: str,
+                                   compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Versión asíncrona de get_or_compute (single-flight sobre el event loop).
+
+        Args:
+            key (str): Clave de cache (ver make_key)
+            compute: Corrutina que obtiene la respuesta (None si falla)
+
+        Returns:
+            str: Respuesta, o None si el cálculo falló
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        future = self._inflight_async.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        try:
+            result = await compute()
+            self.cache.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_result(None)
+            raise error
+        finally:
+            del self._inflight_async[key]
+
+    def stats(self) -> dict:
+        """
+        Métricas del cache de respuestas.
+
+        Returns:
+            dict: Métricas LRU + requests coalescidas
+        """
+        stats = self.cache.stats()
+        stats["coalesced"] = self.coalesced
+        return stats
@@ -0,0 +1,210 @@
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import List
+from config import RETRIEVAL_TOP_K, RETRIEVAL_TOKEN_BUDGET
+from modules.tokens import estimate_tokens
+
+
+_STOPWORDS = {
+    "a", "al", "algo", "como", "con", "cual", "cuales", "cuando", "de", "del",
+    "donde", "el", "ella", "en", "es", "esta", "este", "esto", "hay", "la",
+    "las", "le", "les", "lo", "los", "mas", "me", "mi", "mis", "muy", "no",
+    "o", "para", "pero", "por", "que", "quiero", "se", "si", "sin", "sobre",
+    "son", "su", "sus", "te", "tengo", "tiene", "tienen", "tu", "un", "una", "uno", "unos", "y", "ya", "yo"
+}
+
+# Sufijos derivativos a recortar (más largos primero) para un stemming
+# liviano en español; si ninguno aplica se quita el plural y después la
+# vocal de género, así singular y plural comparten raíz
+_SUFFIXES = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones",
+    "ciones", "acion", "ucion", "cion", "amente", "mente", "idades", "idad"
+)
+_PLURAL_SUFFIXES = ("es", "s")
+_GENDER_VOWELS = ("a", "o", "e")
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Pasa el texto a minúsculas y le quita acentos y diacríticos.
+
+    Args:
+        text (str): Texto original
+
+    Returns:
+        str: Texto normalizado (ej: "Devolución" -> "devolucion")
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _strip(word: str, suffixes) -> str:
+    """Quita el primer sufijo que aplique dejando una raíz de 3+ letras."""
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _stem(word: str) -> str:
+    """
+    Recorta sufijos flexivos/derivativos comunes dejando una raíz de 3+ letras.
+
+    Ej: "heladera" y "heladeras" -> "helader"; "televisor" y
+    "televisores" -> "televisor"; "devolución(es)" -> "devol".
+    """
+    stemmed = _strip(word, _SUFFIXES)
+    if stemmed != word:
+        return stemmed
+    return _strip(_strip(word, _PLURAL_SUFFIXES), _GENDER_VOWELS)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza texto en español: normaliza, descarta stopwords y aplica stemming.
+
+    Args:
+        text (str): Texto a tokenizar
+
+    Returns:
+        list: Términos indexables
+    """
+    return [
+        _stem(word)
+        for word in _WORD_PATTERN.findall(normalize(text))
+        if word not in _STOPWORDS
+    ]
+
+
+class DatasetRetriever:
+    """
+    Índice BM25 en memoria sobre productos, FAQs y políticas del dataset.
+
+    Se construye una sola vez al cargar el dataset y, por cada mensaje,
+    devuelve solo las entradas relevantes respetando un presupuesto de
+    tokens, en lugar de inyectar el dataset completo en el prompt.
+
+    Attributes:
+        dataset: Dataset con información de la empresa
+        top_k: Cantidad máxima de entradas a devolver
+        token_budget: Tokens máximos del contexto seleccionado
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, dataset: dict, top_k: int = RETRIEVAL_TOP_K,
+                 token_budget: int = RETRIEVAL_TOKEN_BUDGET):
+        """
+        Construye el índice a partir del dataset.
+
+        Args:
+            dataset (dict): Dataset con información empresarial
+            top_k (int): Cantidad máxima de entradas a devolver
+            token_budget (int): Tokens máximos del contexto seleccionado
+        """
+        self.dataset = dataset
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self._entries = []
+        self._term_freqs = []
+        self._doc_freqs = Counter()
+
+        for product in dataset.get("products", []):
+            # El nombre pesa doble: es lo que el cliente suele mencionar
+            text = " ".join([
+                product.get("name", ""), product.get("name", ""),
+                product.get("category", ""), product.get("description", "")
+            ])
+            self._add("products", product, text)
+
+        for question in dataset.get("faq", []):
+            text = question if isinstance(question, str) else json.dumps(question, ensure_ascii=False)
+            self._add("faq", question, text)
+
+        for name, policy in dataset.get("policies", {}).items():
+            self._add("policies", (name, policy), f"{name} {name} {policy}")
+
+        lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self._lengths = lengths
+        print(f"✅ Índice de recuperación construido ({len(self._entries)} entradas)")
+
+    def _add(self, section: str, payload, text: str):
+        """Indexa una entrada del dataset."""
+        freqs = Counter(tokenize(text))
+        self._entries.append((section, payload, estimate_tokens(
+            json.dumps(payload, ensure_ascii=False)
+        )))
+        self._term_freqs.append(freqs)
+        self._doc_freqs.update(freqs.keys())
+
+    def _idf(self, term: str) -> float:
+        """IDF de BM25 (siempre positivo)."""
+        total = len(self._entries)
+        freq = self._doc_freqs.get(term, 0)
+        return math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+
+    def search(self, query: str) -> List[tuple]:
+        """
+        Ordena las entradas del dataset por relevancia BM25.
+
+        Args:
+            query (str): Mensaje del usuario
+
+        Returns:
+            list: Tuplas (score, índice de entrada) con score > 0, de mayor a menor
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        scores = []
+        for index, freqs in enumerate(self._term_freqs):
+            length_norm = self.K1 * (1 - self.B + self.B * self._lengths[index] / self._avg_length)
+            score = 0.0
+            for term in terms:
+                freq = freqs.get(term)
+                if freq:
+                    score += self._idf(term) * freq * (self.K1 + 1) / (freq + length_norm)
+            if score > 0:
+                scores.append((score, index))
+
+        scores.sort(reverse=True)
+        return scores
+
+    def select(self, query: str) -> dict:
+        """
+        Arma el subconjunto del dataset relevante para un mensaje.
+
+        Agrega las top-k entradas mientras no se supere el presupuesto de
+        tokens. company_info no se incluye: ya va en el prefijo fijo del
+        prompt, así todo el presupuesto queda para las entradas recuperadas.
+
+        Args:
+            query (str): Mensaje del usuario
+
+        Returns:
+            dict: Dataset reducido con la misma estructura que el original
+            (sin company_info)
+        """
+        context = {}
+        used_tokens = 0
+
+        for _, index in self.search(query)[:self.top_k]:
+            section, payload, tokens = self._entries[index]
+            if used_tokens + tokens > self.token_budget:
+                continue
+            used_tokens += tokens
+            if section == "policies":
+                name, policy = payload
+                context.setdefault("policies", {})[name] = policy
+            else:
+                context.setdefault(section, []).append(payload)
+
+        return context
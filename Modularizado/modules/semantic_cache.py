@@ -0,0 +1,210 @@
+import threading
+import time
+from typing import Optional
+import numpy as np
+from config import (
+    SEMANTIC_CACHE_MODEL_NAME,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD
+)
+from modules.lru import LRUCache
+
+# Embeddings de preguntas que no tuvieron acierto, guardados hasta que se
+# agregue su respuesta (así add no vuelve a correr el modelo)
+_PENDING_VECTORS = 256
+
+
+class SentenceEmbedder:
+    """
+    Embeddings de oraciones en CPU con un modelo chico de sentence-transformers
+    (mean pooling sobre la salida de transformers, vectores normalizados).
+
+    Attributes:
+        model_name: Modelo de HuggingFace a usar
+        tokenizer: Tokenizer del modelo
+        model: Modelo de transformers en modo evaluación
+    """
+
+    def __init__(self, model_name: str = SEMANTIC_CACHE_MODEL_NAME):
+        """
+        Carga el tokenizer y el modelo.
+
+        Args:
+            model_name (str): Modelo de HuggingFace a usar
+        """
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    def encode(self, texts: list) -> np.ndarray:
+        """
+        Calcula los embeddings normalizados (norma L2 = 1).
+
+        Args:
+            texts (list): Textos a codificar
+
+        Returns:
+            np.ndarray: Matriz (len(texts), dim) en float32
+        """
+        import torch
+
+        batch = self.tokenizer(texts, padding=True, truncation=True,
+                               max_length=128, return_tensors="pt")
+        with torch.inference_mode():
+            output = self.model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).to(output.dtype)
+        pooled = (output * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        vectors = pooled.numpy().astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+class SemanticCache:
+    """
+    Cache semántico de preguntas y respuestas.
+
+    Guarda el embedding de cada pregunta respondida en una matriz NumPy y,
+    ante una pregunta nueva, calcula la similitud coseno contra todas en una
+    sola operación vectorizada. Si la más parecida supera el umbral, se
+    reutiliza su respuesta (ej: "cómo devuelvo un producto" vs
+    "quiero hacer una devolución").
+
+    La capacidad es fija (se desaloja la entrada usada hace más tiempo) y
+    el cache se vacía cuando cambia la versión del dataset. El embedding de
+    una pregunta sin acierto se conserva para reutilizarlo al guardar su
+    respuesta: cada pregunta nueva se codifica una sola vez.
+
+    Attributes:
+        embedder: Modelo de embeddings
+        max_entries: Cantidad máxima de preguntas guardadas
+        threshold: Similitud coseno mínima para considerar un acierto
+    """
+
+    def __init__(self, embedder: Optional[SentenceEmbedder] = None,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        """
+        Inicializa el cache (carga el modelo de embeddings si no se pasa uno).
+
+        Args:
+            embedder: Modelo de embeddings a usar
+            max_entries (int): Cantidad máxima de preguntas guardadas
+            threshold (float): Similitud coseno mínima para un acierto
+        """
+        self.embedder = embedder or SentenceEmbedder()
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+        self._pending = LRUCache(_PENDING_VECTORS)
+        self._vectors = None
+        self._answers = []
+        self._questions = []
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._version = None
+        self._lock = threading.Lock()
+        print(f"✅ Cache semántico inicializado ({self.embedder.model_name})")
+
+    def lookup(self, question: str, dataset_version: str) -> Optional[str]:
+        """
+        Busca una respuesta para una pregunta parecida.
+
+        Args:
+            question (str): Pregunta del usuario
+            dataset_version (str): Versión actual del dataset
+
+        Returns:
+            str: Respuesta cacheada, o None si no hay una suficientemente parecida
+        """
+        vector = self._encode(question)
+        with self._lock:
+            self._check_version(dataset_version)
+            count = len(self._answers)
+            if count:
+                similarities = self._vectors[:count] @ vector
+                best = int(np.argmax(similarities))
+            if count == 0 or similarities[best] < self.threshold:
+                self.misses += 1
+                self._pending.put(question, vector)
+                return None
+
+            self._last_used[best] = time.monotonic()
+            self.hits += 1
+            return self._answers[best]
+
+    def add(self, question: str, answer: Optional[str], dataset_version: str):
+        """
+        Guarda una pregunta respondida.
+
+        Args:
+            question (str): Pregunta del usuario
+            answer (str): Respuesta del modelo (None no se guarda)
+            dataset_version (str): Versión del dataset usada para responder
+        """
+        if not answer:
+            return
+
+        vector = self._pending.get(question)
+        if vector is None:
+            vector = self._encode(question)
+        with self._lock:
+            self._check_version(dataset_version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            count = len(self._answers)
+            if count < self.max_entries:
+                slot = count
+                self._answers.append(answer)
+                self._questions.append(question)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._answers[slot] = answer
+                self._questions[slot] = question
+
+            self._vectors[slot] = vector
+            self._last_used[slot] = time.monotonic()
+
+    def _encode(self, question: str) -> np.ndarray:
+        """Embedding de una pregunta (cuenta las veces que corre el modelo)."""
+        vector = self.embedder.encode([question])[0]
+        with self._lock:
+            self.encoded += 1
+        return vector
+
+    def clear(self):
+        """Vacía el cache."""
+        with self._lock:
+            self._answers = []
+            self._questions = []
+            self._last_used[:] = 0
+
+    def _check_version(self, dataset_version: str):
+        """Invalida el cache si cambió el dataset (llamar con el lock tomado)."""
+        if dataset_version != self._version:
+            self._answers = []
+            self._questions = []
+            self._last_used[:] = 0
+            self._version = dataset_version
+
+    def stats(self) -> dict:
+        """
+        Métricas del cache semántico.
+
+        Returns:
+            dict: Tamaño, aciertos, fallos, tasa de acierto y preguntas
+            codificadas con el modelo de embeddings
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._answers),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "encoded": self.encoded
+        }
@@ -1,6 +1,225 @@
-from transformers import pipeline
-from typing import Optional
-from config import SENTIMENT_MODEL_NAME, SENTIMENT_EMOJIS
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from config import (
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_BACKEND,
+    SENTIMENT_ONNX_QUANTIZE,
+    SENTIMENT_EMOJIS,
+    SENTIMENT_EXECUTOR_WORKERS,
+    SENTIMENT_BATCHING_ENABLED,
+    SENTIMENT_BATCH_MAX_SIZE,
+    SENTIMENT_BATCH_MAX_WAIT_MS,
+    SENTIMENT_CACHE_ENABLED,
+    SENTIMENT_CACHE_MAX_ENTRIES,
+    SENTIMENT_CACHE_FILE,
+    SENTIMENT_CACHE_SAVE_EVERY
+)
+from modules.lru import LRUCache
+from modules.metrics import register_stats
+
+
+def _backend_variant() -> str:
+    """Backend de sentimiento en uso, con su cuantización si es ONNX."""
+    if SENTIMENT_BACKEND == "onnx":
+        return "onnx-int8" if SENTIMENT_ONNX_QUANTIZE else "onnx-fp32"
+    return SENTIMENT_BACKEND
+
+
+class SentimentCache(LRUCache):
+    """
+    Cache de resultados de sentimiento por hash del texto normalizado.
+    
+    Los mensajes cortos y repetidos ("gracias", "hola", "no funciona") no
+    vuelven a pasar por el modelo. Opcionalmente se persiste en un archivo
+    JSON para que las entradas sobrevivan a los reinicios.
+    
+    Attributes:
+        path: Archivo de persistencia (None = solo memoria)
+        save_every: Cada cuántas entradas nuevas se guarda a disco
+    """
+    
+    def __init__(self, max_entries: int = SENTIMENT_CACHE_MAX_ENTRIES,
+                 path: Optional[str] = SENTIMENT_CACHE_FILE,
+                 save_every: int = SENTIMENT_CACHE_SAVE_EVERY):
+        """
+        Inicializa el cache y carga las entradas persistidas.
+        
+        Args:
+            max_entries (int): Cantidad máxima de resultados guardados
+            path (str): Archivo de persistencia (None = solo memoria)
+            save_every (int): Cada cuántas entradas nuevas guardar a disco
+        """
+        super().__init__(max_entries)
+        self.path = path
+        self.save_every = save_every
+        self._unsaved = 0
+        if path:
+            self.load()
+            atexit.register(self.save)
+    
+    @staticmethod
+    def make_key(text: str) -> str:
+        """
+        Hash del texto normalizado (minúsculas, espacios colapsados), del
+        modelo y del backend (torch, onnx-fp32 u onnx-int8), para no mezclar
+        resultados de modelos o cuantizaciones distintos.
+        
+        Args:
+            text (str): Texto analizado
+            
+        Returns:
+            str: Clave hexadecimal
+        """
+        normalized = " ".join(text.lower().split())
+        payload = f"{SENTIMENT_MODEL_NAME}\n{_backend_variant()}\n{normalized}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+    
+    def put(self, key: str, value: dict):
+        """Guarda un resultado y persiste cada save_every entradas nuevas."""
+        super().put(key, value)
+        if self.path:
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self.save()
+    
+    def load(self):
+        """Carga las entradas persistidas (si el archivo existe)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️  No se pudo leer el cache de sentimiento: {e}")
+            return
+        for key, value in entries[-self.max_entries:]:
+            super().put(key, value)
+        print(f"✅ Cache de sentimiento: {len(self)} entradas cargadas de {self.path}")
+    
+    def save(self):
+        """Escribe el cache a disco de forma atómica (archivo temporal + rename)."""
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.items(), f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._unsaved = 0
+        except Exception as e:
+            print(f"⚠️  No se pudo guardar el cache de sentimiento: {e}")
+
+
+class SentimentBatcher:
+    """
+    Micro-batching dinámico para la inferencia de sentimiento.
+    
+    Junta los textos pendientes durante hasta max_wait_ms o hasta
+    max_batch_size elementos, corre una sola pasada (con padding) del
+    pipeline y resuelve el Future de cada llamador con su resultado.
+    
+    Attributes:
+        model: Pipeline de transformers
+        max_batch_size: Tamaño máximo del batch
+        max_wait_ms: Ventana máxima de espera para completar un batch
+        batch_sizes: Histograma de tamaños de batch ejecutados
+    """
+    
+    def __init__(self, model, max_batch_size: int = SENTIMENT_BATCH_MAX_SIZE,
+                 max_wait_ms: float = SENTIMENT_BATCH_MAX_WAIT_MS):
+        """
+        Inicializa el batcher y arranca su hilo de inferencia.
+        
+        Args:
+            model: Pipeline de transformers (callable sobre una lista de textos)
+            max_batch_size (int): Tamaño máximo del batch
+            max_wait_ms (float): Ventana máxima de espera en milisegundos
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Counter()
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="sentiment-batcher", daemon=True
+        )
+        self._thread.start()
+    
+    def submit(self, text: str) -> Future:
+        """
+        Encola un texto para el próximo batch.
+        
+        Args:
+            text (str): Texto a analizar
+            
+        Returns:
+            Future: Se resuelve con el dict {'label', 'score'} del texto
+        """
+        future = Future()
+        self._pending.put((text, future))
+        return future
+    
+    def _collect(self) -> list:
+        """
+        Espera el primer texto y junta más hasta llenar el batch o agotar
+        la ventana de espera.
+        
+        Returns:
+            list: Tuplas (texto, future) del batch
+        """
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        """Loop del hilo de inferencia."""
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            self.batch_sizes[len(batch)] += 1
+            try:
+                results = self.model(texts, batch_size=len(texts), truncation=True)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+    
+    def stats(self) -> dict:
+        """
+        Métricas del batcher.
+        
+        Returns:
+            dict: Histograma de tamaños de batch, total de batches y textos
+        """
+        histogram = dict(sorted(self.batch_sizes.items()))
+        batches = sum(histogram.values())
+        texts = sum(size * count for size, count in histogram.items())
+        return {
+            "batch_size_histogram": histogram,
+            "batches": batches,
+            "texts": texts,
+            "avg_batch_size": round(texts / batches, 2) if batches else 0.0,
+            "pending": self._pending.qsize()
+        }
 
 
 class SentimentAnalyzer:
@@ -9,32 +228,77 @@ class SentimentAnalyzer:
     
     Attributes:
         model: Pipeline de transformers para análisis de sentimiento
+        executor: Pool de hilos para la inferencia en modo async
+        batcher: Micro-batcher de inferencia (None si está deshabilitado)
+        cache: Cache de resultados por texto (None si está deshabilitado)
+        ready: Evento que se activa cuando terminó la carga del modelo
     """
     
-    def __init__(self):
-        """Inicializa el analizador y carga el modelo."""
+    def __init__(self, background: bool = False,
+                 on_ready: Optional[Callable[[], None]] = None):
+        """
+        Inicializa el analizador y carga el modelo.
+        
+        Args:
+            background (bool): True para cargar el modelo en un hilo aparte
+                y no demorar el arranque del bot
+            on_ready: Callback opcional a invocar cuando termina la carga
+        """
         self.model = None
-        self.load_model()
+        self.executor = None
+        self.batcher = None
+        self.cache = SentimentCache() if SENTIMENT_CACHE_ENABLED else None
+        self.ready = threading.Event()
+        self._on_ready = on_ready
+        
+        if background:
+            threading.Thread(
+                target=self.load_model, name="sentiment-warmup", daemon=True
+            ).start()
+        else:
+            self.load_model()
+    
+        if self.cache is not None:
+            register_stats("sentiment_cache", self.cache.stats)
+    
+    @property
+    def is_ready(self) -> bool:
+        """True si el modelo ya está cargado y listo para inferir."""
+        return self.ready.is_set() and self.model is not None
     
     def load_model(self):
         """
         Carga el modelo de análisis de sentimientos.
-        Utiliza RoBERTuito optimizado para español.
+        Utiliza RoBERTuito optimizado para español, sobre el backend
+        configurado en SENTIMENT_BACKEND (torch u onnx).
         """
         if self.model is not None:
             print("⚠️  Modelo de análisis de sentimiento ya cargado.")
             return
         
-        print(f"📥 Cargando modelo: {SENTIMENT_MODEL_NAME}...")
+        print(f"📥 Cargando modelo: {SENTIMENT_MODEL_NAME} (backend {SENTIMENT_BACKEND})...")
         try:
-            self.model = pipeline(
-                "sentiment-analysis",
-                model=SENTIMENT_MODEL_NAME
-            )
+            # Imports pesados (torch/transformers) diferidos hasta acá
+            if SENTIMENT_BACKEND == "onnx":
+                from modules.sentiment_onnx import OnnxSentimentModel
+                self.model = OnnxSentimentModel()
+            else:
+                from transformers import pipeline
+                self.model = pipeline(
+                    "sentiment-analysis",
+                    model=SENTIMENT_MODEL_NAME
+                )
             print("✅ Modelo de Sentimiento cargado con éxito.")
+            if SENTIMENT_BATCHING_ENABLED:
+                self.batcher = SentimentBatcher(self.model)
+                register_stats("sentiment_batching", self.batcher.stats)
         except Exception as e:
             print(f"❌ Error al cargar el modelo de sentimiento: {e}")
             self.model = None
+        finally:
+            self.ready.set()
+            if self._on_ready is not None:
+                self._on_ready()
     
     def analyze(self, text: str) -> str:
         """
@@ -54,31 +318,178 @@ class SentimentAnalyzer:
             Sentimiento Detectado: *5 STARS* 😊 
             (Confianza: 95.32%)
         """
+        return self._analyze(text)
+    
+    def _analyze(self, text: str, lookup: bool = True) -> str:
+        """
+        analyze con la opción de saltear el cache.
+        
+        Args:
+            text (str): Texto a analizar
+            lookup (bool): False si el llamador ya buscó el texto en el cache
+                (así cada análisis cuenta un solo acierto o fallo)
+            
+        Returns:
+            str: Resultado formateado con emoji y porcentaje de confianza
+        """
         if self.model is None:
+            if not self.ready.is_set():
+                return "⏳ Modelo de Sentimiento cargando, intenta en unos segundos."
             return "⚠️ Modelo de Sentimiento no disponible."
         
         try:
-            # Realizar análisis
-            results = self.model([text])
-            result = results[0]
-            
-            # Extraer datos
-            sentiment = result['label']
-            confidence = result['score']
-            emoji = SENTIMENT_EMOJIS.get(sentiment, "❓")
+            return self._format(self._predict(text, lookup))
+        
+        except Exception as e:
+            print(f"❌ Error durante el análisis de sentimiento: {e}")
+            return f"Error durante el análisis del texto: {e}"
+    
+    async def analyze_async(self, text: str) -> str:
+        """
+        Versión asíncrona de analyze.
+        
+        La inferencia es CPU-bound, por lo que se delega a un executor
+        para no bloquear el event loop mientras se atienden otros chats.
+        
+        Args:
+            text (str): Texto a analizar
             
-            # Formatear respuesta
-            formatted_response = (
-                f"📈 Análisis de Sentimiento del Cliente:\n"
-                f"Sentimiento Detectado: *{sentiment.upper()}* {emoji} \n"
-                f"(Confianza: {confidence:.2%})"
-            )
-            return formatted_response
+        Returns:
+            str: Resultado formateado con emoji y porcentaje de confianza
+        """
+        cached = self._cached(text)
+        if cached is not None:
+            return self._format(cached)
+        
+        if self.batcher is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._analyze, text, False)
         
+        # Con batching la inferencia ya corre en el hilo del batcher:
+        # se espera su Future sin ocupar un hilo del executor
+        try:
+            result = await asyncio.wrap_future(self._submit_batch(text, lookup=False))
+            return self._format(result)
         except Exception as e:
             print(f"❌ Error durante el análisis de sentimiento: {e}")
             return f"Error durante el análisis del texto: {e}"
     
+    def analyze_future(self, text: str) -> Future:
+        """
+        Lanza el análisis sin bloquear, para correrlo en paralelo con otras
+        tareas (ej: la llamada al LLM).
+        
+        Args:
+            text (str): Texto a analizar
+            
+        Returns:
+            Future: Se resuelve con el mismo string que devolvería analyze
+        """
+        if self.batcher is None:
+            return self._get_executor().submit(self.analyze, text)
+        
+        formatted = Future()
+        
+        def on_done(raw: Future):
+            try:
+                formatted.set_result(self._format(raw.result()))
+            except Exception as e:
+                print(f"❌ Error durante el análisis de sentimiento: {e}")
+                formatted.set_result(f"Error durante el análisis del texto: {e}")
+        
+        self._submit_batch(text).add_done_callback(on_done)
+        return formatted
+    
+    def _predict(self, text: str, lookup: bool = True) -> dict:
+        """
+        Corre la inferencia de un texto (vía cache y batcher si están activos).
+        
+        Args:
+            text (str): Texto a analizar
+            lookup (bool): Buscar antes en el cache (False si ya se buscó)
+            
+        Returns:
+            dict: Diccionario con 'label' y 'score'
+        """
+        if self.batcher is not None:
+            return self._submit_batch(text, lookup).result()
+        
+        cached = self._cached(text) if lookup else None
+        if cached is not None:
+            return cached
+        
+        result = self.model([text])[0]
+        self._remember(text, result)
+        return result
+    
+    def _submit_batch(self, text: str, lookup: bool = True) -> Future:
+        """
+        Envía un texto al batcher, salvo que el resultado ya esté en cache.
+        
+        Args:
+            text (str): Texto a analizar
+            lookup (bool): Buscar antes en el cache (False si ya se buscó)
+            
+        Returns:
+            Future: Se resuelve con el dict {'label', 'score'}
+        """
+        cached = self._cached(text) if lookup else None
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        
+        future = self.batcher.submit(text)
+        future.add_done_callback(
+            lambda done: done.exception() is None and self._remember(text, done.result())
+        )
+        return future
+    
+    def _cached(self, text: str) -> Optional[dict]:
+        """Resultado cacheado del texto, o None."""
+        if self.cache is None:
+            return None
+        return self.cache.get(SentimentCache.make_key(text))
+    
+    def _remember(self, text: str, result: dict):
+        """Guarda el resultado del texto en el cache."""
+        if self.cache is not None:
+            self.cache.put(SentimentCache.make_key(text), result)
+    
+    def _format(self, result: dict) -> str:
+        """
+        Formatea un resultado crudo para enviarlo al usuario.
+        
+        Args:
+            result (dict): Diccionario con 'label' y 'score'
+            
+        Returns:
+            str: Resultado formateado con emoji y porcentaje de confianza
+        """
+        sentiment = result['label']
+        confidence = result['score']
+        emoji = SENTIMENT_EMOJIS.get(sentiment, "❓")
+        
+        return (
+            f"📈 Análisis de Sentimiento del Cliente:\n"
+            f"Sentimiento Detectado: *{sentiment.upper()}* {emoji} \n"
+            f"(Confianza: {confidence:.2%})"
+        )
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Crea (una sola vez) el pool de hilos para la inferencia.
+        
+        Returns:
+            ThreadPoolExecutor: Executor compartido del analizador
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=SENTIMENT_EXECUTOR_WORKERS,
+                thread_name_prefix="sentiment"
+            )
+        return self.executor
+    
     def get_raw_sentiment(self, text: str) -> Optional[dict]:
         """
         Obtiene el resultado crudo del análisis sin formatear.
@@ -93,8 +504,7 @@ class SentimentAnalyzer:
             return None
         
         try:
-            results = self.model([text])
-            return results[0]
+            return self._predict(text)
         except Exception as e:
             print(f"❌ Error en análisis crudo: {e}")
             return None
\ No newline at end of file
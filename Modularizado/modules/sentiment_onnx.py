@@ -0,0 +1,131 @@
+import json
+import os
+from typing import List
+import numpy as np
+from config import SENTIMENT_MODEL_NAME, SENTIMENT_ONNX_DIR, SENTIMENT_ONNX_QUANTIZE
+
+
+class OnnxSentimentModel:
+    """
+    Backend de inferencia de sentimiento sobre ONNX Runtime (CPU).
+
+    La primera vez exporta el modelo de HuggingFace a ONNX (opcionalmente
+    cuantizado a int8 dinámico) y lo guarda en disco; los arranques
+    siguientes solo cargan el artefacto. Es invocable igual que el
+    pipeline de transformers y devuelve el mismo formato
+    [{'label': ..., 'score': ...}], así SentimentAnalyzer no cambia.
+
+    Attributes:
+        model_name: Modelo de HuggingFace de origen
+        model_dir: Carpeta con el artefacto exportado
+        quantize: Si se usa la variante cuantizada int8
+        tokenizer: Tokenizer del modelo
+        session: Sesión de ONNX Runtime
+        id2label: Mapeo índice -> etiqueta del modelo
+    """
+
+    def __init__(self, model_name: str = SENTIMENT_MODEL_NAME,
+                 cache_dir: str = SENTIMENT_ONNX_DIR,
+                 quantize: bool = SENTIMENT_ONNX_QUANTIZE):
+        """
+        Carga (exportando si hace falta) el modelo ONNX.
+
+        Args:
+            model_name (str): Modelo de HuggingFace de origen
+            cache_dir (str): Carpeta raíz donde cachear los artefactos
+            quantize (bool): True para usar int8 dinámico
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.quantize = quantize
+
+        model_path = self._model_path()
+        if not os.path.exists(model_path):
+            self._export()
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        with open(os.path.join(self.model_dir, "labels.json"), encoding="utf-8") as f:
+            self.id2label = {int(index): label for index, label in json.load(f).items()}
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self.session.get_inputs()}
+        print(f"✅ Backend ONNX listo ({os.path.basename(model_path)})")
+
+    def _model_path(self) -> str:
+        """Ruta del artefacto ONNX según la variante elegida."""
+        name = "model.int8.onnx" if self.quantize else "model.onnx"
+        return os.path.join(self.model_dir, name)
+
+    def _export(self):
+        """Exporta el modelo a ONNX (y lo cuantiza si corresponde)."""
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        print(f"📦 Exportando {self.model_name} a ONNX (una sola vez)...")
+        os.makedirs(self.model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+
+        sample = tokenizer(["texto de ejemplo"], return_tensors="pt")
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"}
+            },
+            opset_version=17
+        )
+
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, self._model_path(), weight_type=QuantType.QInt8)
+
+        tokenizer.save_pretrained(self.model_dir)
+        with open(os.path.join(self.model_dir, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(model.config.id2label, f, ensure_ascii=False)
+
+    def __call__(self, texts: List[str], batch_size: int = None,
+                 truncation: bool = True) -> List[dict]:
+        """
+        Clasifica una lista de textos en una sola pasada.
+
+        Args:
+            texts (list): Textos a analizar
+            batch_size (int): Ignorado (compatibilidad con el pipeline)
+            truncation (bool): Truncar al largo máximo del modelo
+
+        Returns:
+            list: Un dict {'label', 'score'} por texto
+        """
+        encoded = self.tokenizer(
+            list(texts), padding=True, truncation=truncation, return_tensors="np"
+        )
+        feeds = {
+            name: encoded[name].astype(np.int64)
+            for name in ("input_ids", "attention_mask")
+            if name in self._input_names
+        }
+        logits = self.session.run(["logits"], feeds)[0]
+
+        # Softmax estable, igual que el pipeline de text-classification
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return [
+            {"label": self.id2label[int(index)], "score": float(probs[row, index])}
+            for row, index in enumerate(best)
+        ]
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Optional
+from modules.metrics import register_stats
+
+
+class StartupTimer:
+    """
+    Registra la duración de cada fase del arranque del bot.
+
+    Cada fase se mide desde el instante de referencia (inicio del proceso)
+    hasta que se marca, y también su duración parcial respecto de la fase
+    anterior.
+
+    Attributes:
+        origin: Instante de referencia (time.perf_counter)
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        """
+        Inicializa el temporizador.
+
+        Args:
+            origin (float): Instante de referencia; por defecto, ahora
+        """
+        self.origin = origin if origin is not None else time.perf_counter()
+        self._last = self.origin
+        self._phases = {}
+        self._lock = threading.Lock()
+        register_stats("startup", self.stats)
+
+    def mark(self, phase: str, since: Optional[float] = None) -> float:
+        """
+        Marca el fin de una fase.
+
+        Args:
+            phase (str): Nombre de la fase (ej: "dataset", "first_poll")
+            since (float): Inicio propio de la fase (para fases en segundo
+                plano que no siguen a la anterior)
+
+        Returns:
+            float: Duración de la fase en segundos
+        """
+        now = time.perf_counter()
+        with self._lock:
+            start = since if since is not None else self._last
+            self._phases[phase] = {
+                "duration_s": round(now - start, 3),
+                "at_s": round(now - self.origin, 3)
+            }
+            if since is None:
+                self._last = now
+            return now - start
+
+    def has(self, phase: str) -> bool:
+        """Indica si la fase ya fue marcada."""
+        return phase in self._phases
+
+    def stats(self) -> dict:
+        """
+        Tiempos de arranque por fase.
+
+        Returns:
+            dict: {fase: {"duration_s", "at_s"}}
+        """
+        with self._lock:
+            return dict(self._phases)
+
+    def report(self) -> str:
+        """
+        Resumen legible de las fases registradas.
+
+        Returns:
+            str: Una línea por fase con su duración y momento
+        """
+        return "\n".join(
+            f"   • {phase:<16} {data['duration_s']:>7.2f}s  (t={data['at_s']:.2f}s)"
+            for phase, data in self.stats().items()
+        )
@@ -0,0 +1,410 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+import telebot as tlb
+from telebot import apihelper, asyncio_helper, util
+from telebot.async_telebot import AsyncTeleBot
+from config import (
+    STREAMING_FIRST_MESSAGE_MIN_CHARS,
+    STREAMING_EDIT_INTERVAL_SECONDS,
+    STREAMING_GROUP_EDIT_INTERVAL_SECONDS,
+    STREAMING_PARSE_MODE
+)
+
+# Fin de oración: signo de cierre seguido de un espacio, o salto de línea
+_SENTENCE_END = re.compile(r"[.!?…](?=\s)|\n")
+
+# Intentos de la edición final (reintentando si Telegram pide esperar)
+_FINAL_ATTEMPTS = 3
+
+
+def markdown_safe_prefix(text: str) -> str:
+    """
+    Prefijo más largo de un texto parcial sin entidades de Markdown abiertas.
+
+    Mientras el modelo genera, el texto puede cortar en medio de un *negrita*,
+    un `código` o un [link](url); Telegram rechaza esas ediciones y en texto
+    plano se ve el marcador suelto. Si el texto está balanceado se devuelve
+    completo; si no, se corta en el último espacio fuera de toda entidad.
+
+    Args:
+        text (str): Texto generado hasta el momento
+
+    Returns:
+        str: Prefijo que se puede mostrar
+    """
+    safe = 0
+    closing = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if closing is None:
+            if char.isspace():
+                safe = i
+            elif text.startswith("```", i):
+                closing = "```"
+                i += 3
+                continue
+            elif char in "`*_":
+                closing = char
+            elif char == "[":
+                closing = "]"
+        elif text.startswith(closing, i):
+            i += len(closing)
+            # [texto](url): el link recién cierra con el paréntesis
+            closing = ")" if closing == "]" and text.startswith("(", i) else None
+            continue
+        i += 1
+
+    if closing is None:
+        return text
+    return text[:safe].rstrip()
+
+
+class StreamingStats:
+    """
+    Tiempos de las respuestas en streaming, medidos desde que se pide la
+    respuesta: primer token del modelo, primer mensaje enviado y edición
+    final. Cuenta también ediciones intermedias, límites de Telegram y las
+    respuestas que hubo que mandar sin formato o no se pudieron entregar.
+    """
+
+    def __init__(self):
+        self.replies = 0
+        self.edits = 0
+        self.rate_limited = 0
+        self.failed_edits = 0
+        self.fallback_messages = 0
+        self.failed_replies = 0
+        self._first_token = deque(maxlen=1000)
+        self._first_message = deque(maxlen=1000)
+        self._final = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def count(self, counter: str):
+        """
+        Suma uno a un contador.
+
+        Args:
+            counter (str): "edits", "rate_limited", "failed_edits",
+                "fallback_messages" o "failed_replies"
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record(self, first_token: Optional[float], first_message: Optional[float],
+               final: float):
+        """
+        Registra los tiempos (en segundos) de una respuesta terminada.
+
+        Args:
+            first_token (float): Hasta el primer token (None si no hubo)
+            first_message (float): Hasta el primer mensaje (None si se envió
+                todo de una vez en la edición final)
+            final (float): Hasta la edición final
+        """
+        with self._lock:
+            self.replies += 1
+            if first_token is not None:
+                self._first_token.append(first_token)
+            self._first_message.append(first_message if first_message is not None else final)
+            self._final.append(final)
+
+    def stats(self) -> dict:
+        """
+        Métricas de streaming.
+
+        Returns:
+            dict: Respuestas entregadas, ediciones, límites de Telegram,
+            respuestas mandadas sin formato o perdidas, y tiempo hasta el
+            primer token / primer mensaje / edición final (promedio y p95 en ms)
+        """
+        with self._lock:
+            stats = {
+                "replies": self.replies,
+                "edits": self.edits,
+                "avg_edits_per_reply": round(self.edits / self.replies, 2) if self.replies else 0,
+                "rate_limited": self.rate_limited,
+                "failed_edits": self.failed_edits,
+                "fallback_messages": self.fallback_messages,
+                "failed_replies": self.failed_replies
+            }
+            for name, values in (("ttft", self._first_token),
+                                 ("first_message", self._first_message),
+                                 ("final_edit", self._final)):
+                ordered = sorted(values)
+                stats[f"{name}_avg_ms"] = (
+                    round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0
+                )
+                stats[f"{name}_p95_ms"] = (
+                    round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 1) if ordered else 0.0
+                )
+            return stats
+
+
+_stats = StreamingStats()
+
+
+def streaming_stats() -> dict:
+    """Métricas de las respuestas en streaming (ver StreamingStats)."""
+    return _stats.stats()
+
+
+class StreamingReply:
+    """
+    Respuesta de Telegram que se completa mientras el modelo genera.
+
+    El primer mensaje sale apenas hay una oración completa; después se edita
+    como mucho una vez por intervalo (más espaciado en grupos, y respetando
+    el retry_after cuando Telegram devuelve 429), siempre cortando en un
+    límite de palabra sin entidades de Markdown abiertas. finish() hace una
+    única edición final con el texto completo.
+
+    Cada fragmento se muestra recién al llegar el siguiente: con el modelo
+    eso es inmediato, y una respuesta que llega entera de una vez (cache)
+    se envía con un solo mensaje en lugar de mensaje + edición.
+
+    Attributes:
+        text: Texto generado hasta el momento
+        sent: Mensaje enviado (None si todavía no se envió nada)
+    """
+
+    def __init__(self, bot: tlb.TeleBot, message: tlb.types.Message,
+                 parse_mode: Optional[str] = STREAMING_PARSE_MODE):
+        """
+        Prepara la respuesta; los tiempos se miden desde acá.
+
+        Args:
+            bot: Bot de Telegram
+            message: Mensaje del usuario al que se responde
+            parse_mode (str): Modo de formato de Telegram (None = texto plano)
+        """
+        self.bot = bot
+        self.message = message
+        self.parse_mode = parse_mode
+        self.interval = (
+            STREAMING_EDIT_INTERVAL_SECONDS if message.chat.type == "private"
+            else STREAMING_GROUP_EDIT_INTERVAL_SECONDS
+        )
+        self.text = ""
+        self.sent = None
+        self._shown = ""
+        self._next_edit_at = 0.0
+        self._started = time.perf_counter()
+        self._first_token_at = None
+        self._first_message_at = None
+
+    def feed(self, delta: str):
+        """
+        Agrega un fragmento generado y envía o edita el mensaje si corresponde.
+
+        Args:
+            delta (str): Texto nuevo del modelo
+        """
+        update = self._pending_update()
+        self._append(delta)
+        if update is not None:
+            self._show(update)
+
+    def finish(self, final_text: str):
+        """
+        Edición final con la respuesta completa (o un único mensaje si todavía
+        no se había enviado nada). Si supera el largo máximo de Telegram, el
+        resto va en mensajes nuevos.
+
+        Args:
+            final_text (str): Texto final (respuesta + agregados como el sentimiento)
+
+        Raises:
+            ApiTelegramException: Si la respuesta no se pudo entregar (no se
+            registra como respuesta enviada)
+        """
+        head, *rest = util.smart_split(final_text, util.MAX_MESSAGE_LENGTH)
+        try:
+            self._deliver(head)
+        except apihelper.ApiTelegramException:
+            _stats.count("failed_replies")
+            raise
+        for part in rest:
+            self.bot.send_message(self.message.chat.id, part)
+        self._record()
+
+    def _append(self, delta: str):
+        """Suma un fragmento al texto y marca el primer token."""
+        if not delta:
+            return
+        if self._first_token_at is None:
+            self._first_token_at = time.perf_counter()
+        self.text += delta
+
+    def _pending_update(self) -> Optional[str]:
+        """
+        Texto a mostrar ahora, o None si no corresponde enviar ni editar.
+
+        Returns:
+            str: Primera oración (primer mensaje) o prefijo seguro más largo
+            que lo ya mostrado (ediciones), respetando el intervalo
+        """
+        if time.perf_counter() < self._next_edit_at:
+            return None
+        if self.sent is None:
+            for match in _SENTENCE_END.finditer(self.text):
+                if match.end() >= STREAMING_FIRST_MESSAGE_MIN_CHARS:
+                    return markdown_safe_prefix(self.text[:match.end()].rstrip()) or None
+            return None
+
+        boundary = max(self.text.rfind(" "), self.text.rfind("\n"))
+        visible = markdown_safe_prefix(self.text[:boundary].rstrip())
+        if len(visible) <= len(self._shown) or len(visible) > util.MAX_MESSAGE_LENGTH:
+            return None
+        return visible
+
+    def _show(self, text: str):
+        """Envía el primer mensaje o hace una edición intermedia."""
+        self._next_edit_at = time.perf_counter() + self.interval
+        try:
+            self._send_or_edit(text, self.parse_mode)
+        except apihelper.ApiTelegramException as error:
+            self._on_error(error)
+
+    def _send_or_edit(self, text: str, parse_mode: Optional[str]):
+        if self.sent is None:
+            self.sent = self.bot.reply_to(self.message, text, parse_mode=parse_mode)
+            self._first_message_at = time.perf_counter()
+        else:
+            self.bot.edit_message_text(text, self.sent.chat.id, self.sent.message_id,
+                                       parse_mode=parse_mode)
+            _stats.count("edits")
+        self._shown = text
+
+    def _deliver(self, text: str):
+        """
+        Edición final (o único mensaje), esperando el intervalo o el
+        retry_after antes de cada intento y reintentando ante un 429. Si se
+        agotan los intentos, el texto va en un mensaje nuevo sin formato.
+        """
+        parse_mode = self.parse_mode
+        for _ in range(_FINAL_ATTEMPTS):
+            if text == self._shown:
+                return
+            time.sleep(self._until_next_edit())
+            try:
+                self._send_or_edit(text, parse_mode)
+                return
+            except apihelper.ApiTelegramException as error:
+                parse_mode = self._retry_mode(error, parse_mode)
+        time.sleep(self._until_next_edit())
+        self._on_fallback(self.bot.send_message(self.message.chat.id, text), text)
+
+    def _until_next_edit(self) -> float:
+        """Segundos que faltan para poder enviar o editar (intervalo o retry_after)."""
+        return max(0.0, self._next_edit_at - time.perf_counter())
+
+    def _on_fallback(self, sent, text: str):
+        """Registra la respuesta que se mandó sin formato al agotar los intentos."""
+        _stats.count("fallback_messages")
+        if self.sent is None:
+            self.sent = sent
+            self._first_message_at = time.perf_counter()
+        self._shown = text
+
+    def _retry_mode(self, error, parse_mode: Optional[str]) -> Optional[str]:
+        """
+        Decide cómo reintentar la edición final.
+
+        Returns:
+            str: parse_mode del próximo intento (None = texto plano si el
+            Markdown completo no se pudo interpretar)
+        """
+        if self._on_error(error):
+            return parse_mode
+        if parse_mode and "can't parse entities" in error.description:
+            return None
+        raise error
+
+    def _on_error(self, error) -> bool:
+        """
+        Registra un error de Telegram al enviar o editar.
+
+        Returns:
+            bool: True si fue un límite de frecuencia (429) y se puede reintentar
+        """
+        if error.error_code == 429:
+            retry_after = error.result_json.get("parameters", {}).get("retry_after", self.interval)
+            self._next_edit_at = time.perf_counter() + retry_after
+            _stats.count("rate_limited")
+            return True
+        if "message is not modified" not in error.description:
+            _stats.count("failed_edits")
+            print(f"⚠️  No se pudo actualizar la respuesta: {error.description}")
+        return False
+
+    def _record(self):
+        """Registra los tiempos de la respuesta terminada."""
+        def since_start(moment):
+            return moment - self._started if moment is not None else None
+
+        _stats.record(since_start(self._first_token_at), since_start(self._first_message_at),
+                      time.perf_counter() - self._started)
+
+
+class AsyncStreamingReply(StreamingReply):
+    """
+    Versión para el bot asíncrono: feed y finish son corrutinas y las
+    esperas entre ediciones no bloquean el event loop.
+    """
+
+    def __init__(self, bot: AsyncTeleBot, message: tlb.types.Message,
+                 parse_mode: Optional[str] = STREAMING_PARSE_MODE):
+        super().__init__(bot, message, parse_mode)
+
+    async def feed(self, delta: str):
+        update = self._pending_update()
+        self._append(delta)
+        if update is not None:
+            self._next_edit_at = time.perf_counter() + self.interval
+            try:
+                await self._send_or_edit_async(update, self.parse_mode)
+            except asyncio_helper.ApiTelegramException as error:
+                self._on_error(error)
+
+    async def finish(self, final_text: str):
+        head, *rest = util.smart_split(final_text, util.MAX_MESSAGE_LENGTH)
+        try:
+            await self._deliver_async(head)
+        except asyncio_helper.ApiTelegramException:
+            _stats.count("failed_replies")
+            raise
+        for part in rest:
+            await self.bot.send_message(self.message.chat.id, part)
+        self._record()
+
+    async def _deliver_async(self, text: str):
+        parse_mode = self.parse_mode
+        for _ in range(_FINAL_ATTEMPTS):
+            if text == self._shown:
+                return
+            await asyncio.sleep(self._until_next_edit())
+            try:
+                await self._send_or_edit_async(text, parse_mode)
+                return
+            except asyncio_helper.ApiTelegramException as error:
+                parse_mode = self._retry_mode(error, parse_mode)
+        await asyncio.sleep(self._until_next_edit())
+        self._on_fallback(await self.bot.send_message(self.message.chat.id, text), text)
+
+    async def _send_or_edit_async(self, text: str, parse_mode: Optional[str]):
+        if self.sent is None:
+            self.sent = await self.bot.reply_to(self.message, text, parse_mode=parse_mode)
+            self._first_message_at = time.perf_counter()
+        else:
+            await self.bot.edit_message_text(text, self.sent.chat.id, self.sent.message_id,
+                                             parse_mode=parse_mode)
+            _stats.count("edits")
+        self._shown = text
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from config import (
+    RATE_LIMITS,
+    RATE_LIMIT_DEFAULT,
+    TOKEN_USAGE_MAX_CHATS,
+    TOKEN_USAGE_TOP_CHATS
+)
+from modules.lru import LRUCache
+from modules.tokens import estimate_tokens, truncate_to_tokens
+
+
+def chunk_usage(chunk):
+    """Usage de un fragmento de streaming (Groq lo manda en x_groq del último)."""
+    x_groq = getattr(chunk, "x_groq", None)
+    return getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
+
+
+def _totals() -> dict:
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def _add(totals: dict, prompt: int, completion: int):
+    totals["requests"] += 1
+    totals["prompt_tokens"] += prompt
+    totals["completion_tokens"] += completion
+    totals["total_tokens"] += prompt + completion
+
+
+class TokenAccountant:
+    """
+    Contabilidad de los tokens consumidos en Groq.
+
+    Cada completion registra el usage que devuelve la API junto con el
+    prompt estimado localmente antes de enviarla, y se acumula por modelo,
+    por handler ("text", "voice", "image", "welcome", "summary") y por chat.
+    Por modelo se mide además el consumo del último minuto contra su cuota
+    de tokens por minuto (RATE_LIMITS) para planificar capacidad.
+
+    Los chats se guardan en un LRU de TOKEN_USAGE_MAX_CHATS entradas, así
+    la memoria no crece con la cantidad de usuarios.
+    """
+
+    def __init__(self, max_chats: int = TOKEN_USAGE_MAX_CHATS):
+        """
+        Inicializa los acumulados vacíos.
+
+        Args:
+            max_chats (int): Chats con consumo acumulado en memoria
+        """
+        self._models: Dict[str, dict] = {}
+        self._handlers: Dict[str, dict] = {}
+        self._chats = LRUCache(max_chats)
+        self._recent: Dict[str, deque] = {}
+        self._truncated: Dict[str, dict] = {}
+        self._missing_usage = 0
+        self._lock = threading.Lock()
+
+    def record(self, model: str, handler: str, chat_id: Optional[int],
+               estimated_prompt_tokens: int, usage):
+        """
+        Registra el consumo de una completion.
+
+        Args:
+            model (str): Modelo que respondió
+            handler (str): Origen de la request ("text", "voice", "image"...)
+            chat_id (int): Id del chat de Telegram (None si no corresponde)
+            estimated_prompt_tokens (int): Prompt estimado antes de enviar
+            usage: CompletionUsage devuelto por la API (None si no vino)
+        """
+        if usage is None:
+            with self._lock:
+                self._missing_usage += 1
+            return
+
+        prompt = getattr(usage, "prompt_tokens", None) or 0
+        completion = getattr(usage, "completion_tokens", None) or 0
+        with self._lock:
+            totals = self._models.setdefault(model, {**_totals(), "estimated_prompt_tokens": 0})
+            _add(totals, prompt, completion)
+            totals["estimated_prompt_tokens"] += estimated_prompt_tokens
+            _add(self._handlers.setdefault(handler, _totals()), prompt, completion)
+
+            recent = self._recent.setdefault(model, deque())
+            now = time.monotonic()
+            recent.append((now, prompt + completion))
+            self._expire(recent, now)
+
+            if chat_id is not None:
+                chat = self._chats.get(chat_id)
+                if chat is None:
+                    chat = _totals()
+                    self._chats.put(chat_id, chat)
+                _add(chat, prompt, completion)
+
+    def fit(self, text: str, max_tokens: int, handler: str) -> str:
+        """
+        Recorta una entrada del usuario a su presupuesto de tokens.
+
+        Args:
+            text (str): Mensaje o transcripción
+            max_tokens (int): Tokens máximos (estimados)
+            handler (str): Origen de la entrada ("text", "voice")
+
+        Returns:
+            str: El texto original si entra, o su comienzo recortado
+        """
+        fitted = truncate_to_tokens(text, max_tokens)
+        if fitted is not text:
+            dropped = estimate_tokens(text) - estimate_tokens(fitted)
+            with self._lock:
+                truncated = self._truncated.setdefault(handler, {"messages": 0, "tokens_dropped": 0})
+                truncated["messages"] += 1
+                truncated["tokens_dropped"] += dropped
+            print(f"✂️  Entrada de {handler} recortada a {max_tokens} tokens ({dropped} descartados)")
+        return fitted
+
+    @staticmethod
+    def _expire(recent: deque, now: float):
+        """Descarta los consumos de hace más de un minuto."""
+        while recent and recent[0][0] < now - 60:
+            recent.popleft()
+
+    def stats(self) -> dict:
+        """
+        Métricas de consumo de tokens.
+
+        Returns:
+            dict: Por modelo, acumulados, promedios por request, precisión de
+            la estimación local y tokens del último minuto contra la cuota;
+            por handler, acumulados; por chat, promedio y los que más
+            consumen; entradas recortadas y respuestas sin usage
+        """
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model, totals in self._models.items():
+                stats = dict(totals)
+                estimated = stats.pop("estimated_prompt_tokens")
+                requests = totals["requests"]
+                stats["avg_prompt_tokens"] = round(totals["prompt_tokens"] / requests, 1)
+                stats["avg_completion_tokens"] = round(totals["completion_tokens"] / requests, 1)
+                # > 1: la estimación local se queda corta (reportado / estimado)
+                stats["estimate_ratio"] = round(totals["prompt_tokens"] / estimated, 3) if estimated else None
+
+                recent = self._recent[model]
+                self._expire(recent, now)
+                last_minute = sum(tokens for _, tokens in recent)
+                tpm = RATE_LIMITS.get(model, RATE_LIMIT_DEFAULT).get("tpm")
+                stats["tokens_last_minute"] = last_minute
+                stats["tpm_limit"] = tpm
+                stats["tpm_utilization"] = round(last_minute / tpm, 3) if tpm else None
+                models[model] = stats
+
+            handlers = {handler: dict(totals) for handler, totals in self._handlers.items()}
+            truncated = {handler: dict(counts) for handler, counts in self._truncated.items()}
+            missing_usage = self._missing_usage
+            chats = [(chat_id, dict(totals)) for chat_id, totals in self._chats.items()]
+
+        chats.sort(key=lambda item: item[1]["total_tokens"], reverse=True)
+        return {
+            "models": models,
+            "handlers": handlers,
+            "chats": {
+                "tracked": len(chats),
+                "avg_total_tokens": (
+                    round(sum(totals["total_tokens"] for _, totals in chats) / len(chats), 1)
+                    if chats else 0
+                ),
+                "top": [
+                    {"chat_id": chat_id, **totals}
+                    for chat_id, totals in chats[:TOKEN_USAGE_TOP_CHATS]
+                ]
+            },
+            "truncated": truncated,
+            "missing_usage": missing_usage
+        }
+
+
+_accountant = TokenAccountant()
+
+
+def record_usage(model: str, handler: str, chat_id: Optional[int],
+                 estimated_prompt_tokens: int, usage):
+    """Registra el consumo de una completion (ver TokenAccountant.record)."""
+    _accountant.record(model, handler, chat_id, estimated_prompt_tokens, usage)
+
+
+def fit_input(text: str, max_tokens: int, handler: str) -> str:
+    """Recorta una entrada del usuario a su presupuesto (ver TokenAccountant.fit)."""
+    return _accountant.fit(text, max_tokens, handler)
+
+
+def token_usage_stats() -> dict:
+    """Métricas de consumo de tokens (ver TokenAccountant.stats)."""
+    return _accountant.stats()
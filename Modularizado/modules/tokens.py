@@ -0,0 +1,56 @@
+import math
+import re
+
+
+# Palabras, signos sueltos y saltos de línea con su indentación, aproximando
+# cómo parte el texto un tokenizer BPE
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]|\n\s*", re.UNICODE)
+
+# Caracteres promedio por token en palabras largas (español, tokenizer Llama 3)
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima localmente la cantidad de tokens de un texto.
+
+    El texto se parte en palabras, signos de puntuación y saltos de línea
+    (con la indentación que les sigue), y cada pieza cuenta ceil(len / 4)
+    tokens: un signo o un salto sin indentación cuenta uno, y una
+    indentación larga suma más. Se acerca al conteo real del tokenizer de
+    Llama sin necesidad de descargarlo.
+
+    Args:
+        text (str): Texto a medir
+
+    Returns:
+        int: Cantidad estimada de tokens
+    """
+    if not text:
+        return 0
+    return sum(
+        math.ceil(len(piece) / _CHARS_PER_TOKEN)
+        for piece in _PIECE_PATTERN.findall(text)
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Recorta un texto para que no supere una cantidad estimada de tokens.
+
+    Se corta al final de la última palabra o signo que entra (con el mismo
+    conteo que estimate_tokens) y se marca el corte con "…".
+
+    Args:
+        text (str): Texto a recortar
+        max_tokens (int): Tokens máximos
+
+    Returns:
+        str: El texto original si entra, o su comienzo recortado
+    """
+    total = 0
+    for match in _PIECE_PATTERN.finditer(text or ""):
+        total += math.ceil(len(match.group()) / _CHARS_PER_TOKEN)
+        if total > max_tokens:
+            return text[:match.start()].rstrip() + "…"
+    return text
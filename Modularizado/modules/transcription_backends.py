@@ -0,0 +1,265 @@
+import asyncio
+import io
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Optional
+from config import (
+    GROQ_WHISPER_MODEL,
+    RATE_LIMIT_MIN_AUDIO_SECONDS,
+    VOICE_LOCAL_MODEL_DIR,
+    VOICE_LOCAL_COMPUTE_TYPE,
+    VOICE_LOCAL_CPU_THREADS,
+    VOICE_LOCAL_BEAM_SIZE
+)
+from modules.groq_client import get_async_client, get_client
+from modules.rate_limiter import get_limiter
+
+
+class TranscriptionBackend(ABC):
+    """
+    Interfaz común de los motores de transcripción.
+
+    Cada implementación transcribe un archivo de audio completo (nombre +
+    bytes) y lanza una excepción si falla, para que VoiceTranscriber pueda
+    probar con el siguiente backend. Lleva sus propias métricas de latencia.
+    Las subclases implementan _transcribe (y opcionalmente _transcribe_async);
+    un backend incompleto falla al instanciarse, no con la primera nota de voz.
+
+    Attributes:
+        name: Nombre del backend ("groq", "local")
+    """
+
+    name = "base"
+
+    def __init__(self):
+        """Inicializa los contadores de métricas."""
+        self._latencies = []
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, filename: str, data: bytes, seconds: Optional[float] = None) -> str:
+        """
+        Transcribe un archivo de audio.
+
+        Args:
+            filename (str): Nombre del archivo (la extensión indica el formato)
+            data (bytes): Contenido del archivo
+            seconds (float): Duración del audio, si se conoce
+
+        Returns:
+            str: Texto transcrito
+        """
+        started = time.perf_counter()
+        try:
+            text = self._transcribe(filename, data, seconds)
+        except Exception:
+            self._record(None)
+            raise
+        self._record(time.perf_counter() - started)
+        return text
+
+    async def transcribe_async(self, filename: str, data: bytes,
+                               seconds: Optional[float] = None) -> str:
+        """
+        Versión asíncrona de transcribe (por defecto, en un hilo aparte).
+
+        Args:
+            filename (str): Nombre del archivo
+            data (bytes): Contenido del archivo
+            seconds (float): Duración del audio, si se conoce
+
+        Returns:
+            str: Texto transcrito
+        """
+        started = time.perf_counter()
+        try:
+            text = await self._transcribe_async(filename, data, seconds)
+        except Exception:
+            self._record(None)
+            raise
+        self._record(time.perf_counter() - started)
+        return text
+
+    @abstractmethod
+    def _transcribe(self, filename: str, data: bytes, seconds: Optional[float]) -> str:
+        """Transcribe el archivo (lanza una excepción si falla)."""
+
+    async def _transcribe_async(self, filename: str, data: bytes,
+                                seconds: Optional[float]) -> str:
+        return await asyncio.to_thread(self._transcribe, filename, data, seconds)
+
+    def _record(self, elapsed: Optional[float]):
+        """Registra la latencia de una llamada (None = error)."""
+        with self._lock:
+            if elapsed is None:
+                self._errors += 1
+                return
+            self._latencies.append(elapsed)
+            del self._latencies[:-1000]
+
+    def stats(self) -> dict:
+        """
+        Métricas del backend.
+
+        Returns:
+            dict: Llamadas, errores y latencia promedio / p95 en ms
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            errors = self._errors
+        if not latencies:
+            return {"calls": 0, "errors": errors}
+        return {
+            "calls": len(latencies),
+            "errors": errors,
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1)
+        }
+
+
+class GroqTranscriptionBackend(TranscriptionBackend):
+    """
+    Whisper en la API de Groq.
+
+    Attributes:
+        client: Cliente de Groq API
+        async_client: Cliente asíncrono de Groq API (modo async)
+        limiter: Cuota compartida del modelo de Whisper
+    """
+
+    name = "groq"
+
+    def __init__(self):
+        """Toma los clientes compartidos de Groq (timeout de transcripción)."""
+        super().__init__()
+        self.client = get_client("transcription")
+        self.async_client = get_async_client("transcription")
+        self.limiter = get_limiter(GROQ_WHISPER_MODEL)
+
+    def _transcribe(self, filename: str, data: bytes, seconds: Optional[float]) -> str:
+        transcription = self.limiter.call(
+            lambda: self.client.audio.transcriptions.create(
+                **self._request_params(filename, data)
+            ),
+            self._billed_seconds(seconds)
+        )
+        return transcription.text
+
+    async def _transcribe_async(self, filename: str, data: bytes,
+                                seconds: Optional[float]) -> str:
+        transcription = await self.limiter.call_async(
+            lambda: self.async_client.audio.transcriptions.create(
+                **self._request_params(filename, data)
+            ),
+            self._billed_seconds(seconds)
+        )
+        return transcription.text
+
+    @staticmethod
+    def _billed_seconds(seconds: Optional[float]) -> float:
+        """Segundos de audio que descuenta la cuota (con el mínimo por request)."""
+        return max(seconds or 0, RATE_LIMIT_MIN_AUDIO_SECONDS)
+
+    def _request_params(self, filename: str, data: bytes) -> dict:
+        """
+        Parámetros de la request a Whisper.
+
+        El audio se sube directamente desde memoria como archivo con nombre
+        (tupla nombre + bytes), sin pasar por disco: cada request tiene su
+        propio buffer, así que varias transcripciones concurrentes no se pisan.
+
+        Args:
+            filename (str): Nombre del archivo; la extensión le indica el
+                formato a la API
+            data (bytes): Contenido del archivo
+
+        Returns:
+            dict: Argumentos para audio.transcriptions.create
+        """
+        return {
+            "file": (filename, data),
+            "model": GROQ_WHISPER_MODEL,
+            "prompt": "Especificar contexto o pronunciación",
+            "response_format": "json",
+            "language": "es",
+            "temperature": 1
+        }
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Whisper local en CPU con faster-whisper (CTranslate2, cuantizado int8).
+
+    El modelo se lee de una carpeta local (ej: convertido con
+    `ct2-transformers-converter --model openai/whisper-small --quantization int8`)
+    y se carga la primera vez que se necesita, o antes con load().
+
+    Attributes:
+        model_dir: Carpeta del modelo CTranslate2
+        compute_type: Tipo de cómputo de CTranslate2 ("int8", "int8_float32", ...)
+        model: Instancia de faster_whisper.WhisperModel (None hasta cargar)
+    """
+
+    name = "local"
+
+    def __init__(self, model_dir: str = VOICE_LOCAL_MODEL_DIR,
+                 compute_type: str = VOICE_LOCAL_COMPUTE_TYPE):
+        """
+        Prepara el backend local (sin cargar el modelo todavía).
+
+        Args:
+            model_dir (str): Carpeta del modelo CTranslate2
+            compute_type (str): Tipo de cómputo de CTranslate2
+        """
+        super().__init__()
+        self.model_dir = model_dir
+        self.compute_type = compute_type
+        self.model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Carga el modelo (una sola vez, thread-safe)."""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            from faster_whisper import WhisperModel
+
+            started = time.perf_counter()
+            self.model = WhisperModel(
+                self.model_dir,
+                device="cpu",
+                compute_type=self.compute_type,
+                cpu_threads=VOICE_LOCAL_CPU_THREADS
+            )
+            print(f"✅ Whisper local cargado desde {self.model_dir} "
+                  f"({self.compute_type}) en {time.perf_counter() - started:.1f}s")
+
+    def _transcribe(self, filename: str, data: bytes, seconds: Optional[float]) -> str:
+        self.load()
+        segments, _ = self.model.transcribe(
+            io.BytesIO(data),
+            language="es",
+            beam_size=VOICE_LOCAL_BEAM_SIZE
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+def create_backend(name: str) -> TranscriptionBackend:
+    """
+    Crea un backend de transcripción por nombre.
+
+    Args:
+        name (str): "groq" o "local"
+
+    Returns:
+        TranscriptionBackend: Backend correspondiente
+
+    Raises:
+        ValueError: Si el nombre no es "groq" ni "local"
+    """
+    if name == "groq":
+        return GroqTranscriptionBackend()
+    if name == "local":
+        return LocalWhisperBackend()
+    raise ValueError(f"Backend de transcripción inválido: {name} (usar 'groq' o 'local').")
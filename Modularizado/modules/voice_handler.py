@@ -1,32 +1,85 @@
-import os
-from groq import Groq
-from typing import Optional
-from config import GROQ_API_KEY, GROQ_WHISPER_MODEL, TEMP_VOICE_FILE
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from config import (
+    VOICE_LONG_AUDIO_ENABLED,
+    VOICE_LONG_AUDIO_MIN_SECONDS,
+    VOICE_CHUNK_CONCURRENCY,
+    VOICE_PREPROCESS_ENABLED,
+    VOICE_TARGET_SAMPLE_RATE,
+    VOICE_TRIM_MIN_SAVED_SECONDS,
+    VOICE_BACKEND_PRIMARY,
+    VOICE_BACKEND_FALLBACK,
+    VOICE_LOCAL_MAX_SECONDS
+)
+from modules import audio
+from modules.metrics import register_stats
+from modules.transcription_backends import TranscriptionBackend, create_backend
+
+# Archivo a subir: (nombre, bytes, duración en segundos o None si no se conoce)
+AudioFile = Tuple[str, bytes, Optional[float]]
 
 
 class VoiceTranscriber:
     """
     Maneja la transcripción de mensajes de voz a texto.
     
+    Antes de subir, el audio se decodifica, se pasa a mono 16 kHz y se le
+    recortan los silencios (VOICE_PREPROCESS_ENABLED); si no se puede
+    decodificar o no hay nada que recortar se suben los bytes originales.
+    Los audios largos (VOICE_LONG_AUDIO_MIN_SECONDS o más) se cortan en
+    pausas del habla y los fragmentos se transcriben en paralelo y se
+    vuelven a unir en orden. La concurrencia (VOICE_CHUNK_CONCURRENCY) es
+    global: el pool y el semáforo se comparten entre todos los mensajes,
+    así varios audios largos a la vez no multiplican las llamadas en vuelo.
+    
+    Cada archivo se transcribe con el backend primario (VOICE_BACKEND_PRIMARY)
+    y, si falla, con el de respaldo (VOICE_BACKEND_FALLBACK); los clips de
+    hasta VOICE_LOCAL_MAX_SECONDS van primero al backend local.
+    
     Attributes:
-        client: Cliente de Groq API para Whisper
+        backends: Backends de transcripción en uso, por nombre
+        executor: Pool compartido por todos los mensajes para transcribir
+            fragmentos en paralelo (tope global de VOICE_CHUNK_CONCURRENCY)
     """
     
     def __init__(self):
         """Inicializa el transcriptor de voz."""
-        self.client = Groq(api_key=GROQ_API_KEY)
-        print("✅ VoiceTranscriber inicializado")
+        names = {VOICE_BACKEND_PRIMARY, VOICE_BACKEND_FALLBACK}
+        if VOICE_LOCAL_MAX_SECONDS > 0:
+            names.add("local")
+        self.backends = {name: create_backend(name) for name in names if name}
+        if "local" in self.backends:
+            threading.Thread(
+                target=self._load_local_backend, name="whisper-local-warmup", daemon=True
+            ).start()
+        self.executor = ThreadPoolExecutor(
+            max_workers=VOICE_CHUNK_CONCURRENCY,
+            thread_name_prefix="voice-chunk"
+        )
+        self._semaphore = None
+        self._stats = {
+            "messages": 0, "chunked_messages": 0, "chunks": 0, "decode_failures": 0,
+            "encode_failures": 0, "trimmed_messages": 0, "bytes_saved": 0, "seconds_saved": 0.0
+        }
+        register_stats("voice", self.stats)
+        register_stats("transcription_backends", self.backend_stats)
+        print(f"✅ VoiceTranscriber inicializado (backends: {', '.join(sorted(self.backends))})")
     
-    def transcribe(self, voice_file_bytes: bytes) -> Optional[str]:
+    def transcribe(self, voice_file_bytes: bytes,
+                   duration: Optional[float] = None) -> Optional[str]:
         """
         Transcribe un archivo de audio a texto.
         
         Args:
             voice_file_bytes (bytes): Bytes del archivo de audio
-            
+            duration (float): Duración en segundos si se conoce (la informa
+                Telegram); sin preprocesado evita decodificar los audios cortos
+        
         Returns:
             str: Texto transcrito, o None si falla
-            
+        
         Example:
             >>> transcriber = VoiceTranscriber()
             >>> with open("audio.ogg", "rb") as f:
@@ -35,43 +88,225 @@ class VoiceTranscriber:
             >>> print(text)
             "Hola, quiero información sobre los Galaxy S24"
         """
-        temp_file = TEMP_VOICE_FILE
+        self._stats["messages"] += 1
+        files = self._prepare(voice_file_bytes, duration)
+        if len(files) == 1:
+            return self._transcribe_file(files[0])
+        
+        texts = list(self.executor.map(self._transcribe_file, files))
+        return self._merge(texts)
+    
+    async def transcribe_async(self, voice_file_bytes: bytes,
+                               duration: Optional[float] = None) -> Optional[str]:
+        """
+        Versión asíncrona de transcribe usando AsyncGroq.
+        
+        Args:
+            voice_file_bytes (bytes): Bytes del archivo de audio
+            duration (float): Duración en segundos si se conoce
+        
+        Returns:
+            str: Texto transcrito, o None si falla
+        """
+        self._stats["messages"] += 1
+        if not self._needs_decoding(duration):
+            return await self._transcribe_file_async(("voice.ogg", voice_file_bytes, duration))
+        
+        # Decodificar, recortar y cortar es CPU: fuera del event loop
+        files = await asyncio.to_thread(self._prepare, voice_file_bytes, duration)
+        if len(files) == 1:
+            return await self._transcribe_file_async(files[0])
+        
+        # Semáforo compartido: mismo tope global que el pool del modo sync
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(VOICE_CHUNK_CONCURRENCY)
+        
+        async def bounded(chunk):
+            async with self._semaphore:
+                return await self._transcribe_file_async(chunk)
+        
+        texts = await asyncio.gather(*(bounded(chunk) for chunk in files))
+        return self._merge(texts)
+    
+    def _needs_decoding(self, duration: Optional[float]) -> bool:
+        """
+        Indica si hay que decodificar el audio antes de subirlo.
+        
+        Args:
+            duration (float): Duración en segundos (None = desconocida)
+        
+        Returns:
+            bool: True si se preprocesa o puede requerir el modo por fragmentos
+        """
+        if VOICE_PREPROCESS_ENABLED:
+            return True
+        if not VOICE_LONG_AUDIO_ENABLED:
+            return False
+        return duration is None or duration >= VOICE_LONG_AUDIO_MIN_SECONDS
+    
+    def _prepare(self, voice_file_bytes: bytes,
+                 duration: Optional[float]) -> List[AudioFile]:
+        """
+        Arma los archivos a subir: el original, el audio recortado o sus fragmentos.
+        
+        Args:
+            voice_file_bytes (bytes): Bytes del archivo de audio
+            duration (float): Duración en segundos si se conoce
+        
+        Returns:
+            list: Tuplas (nombre, bytes, segundos); un solo elemento si no se fragmenta
+        """
+        original = [("voice.ogg", voice_file_bytes, duration)]
+        if not self._needs_decoding(duration):
+            return original
         
         try:
-            # Guardar archivo temporal
-            with open(temp_file, "wb") as f:
-                f.write(voice_file_bytes)
-            
-            # Transcribir con Whisper
-            with open(temp_file, "rb") as audio_file:
-                transcription = self.client.audio.transcriptions.create(
-                    file=audio_file,
-                    model=GROQ_WHISPER_MODEL,
-                    prompt="Especificar contexto o pronunciación",
-                    response_format="json",
-                    language="es",
-                    temperature=1
-                )
-            
-            # Limpiar archivo temporal
-            self._cleanup_temp_file(temp_file)
-            
-            return transcription.text
+            samples, sample_rate = audio.decode(voice_file_bytes)
+        except Exception as error:
+            self._stats["decode_failures"] += 1
+            print(f"⚠️ No se pudo decodificar el audio, se sube entero: {error}")
+            return original
         
+        original_seconds = len(samples) / sample_rate
+        if VOICE_PREPROCESS_ENABLED:
+            samples = audio.resample(samples, sample_rate, VOICE_TARGET_SAMPLE_RATE)
+            sample_rate = VOICE_TARGET_SAMPLE_RATE
+            trimmed = audio.trim_silence(samples, sample_rate)
+            if len(trimmed) > 0:
+                samples = trimmed
+        seconds_saved = original_seconds - len(samples) / sample_rate
+        
+        chunked = VOICE_LONG_AUDIO_ENABLED and len(samples) >= VOICE_LONG_AUDIO_MIN_SECONDS * sample_rate
+        if not chunked and seconds_saved < VOICE_TRIM_MIN_SAVED_SECONDS:
+            return original
+        
+        segments = audio.split_on_silence(samples, sample_rate) if chunked else [(0, len(samples))]
+        try:
+            files = [
+                (f"chunk_{index:03d}.ogg" if chunked else "voice.ogg",
+                 audio.encode_opus(samples[start:end], sample_rate),
+                 (end - start) / sample_rate)
+                for index, (start, end) in enumerate(segments)
+            ]
         except Exception as error:
-            print(f"❌ Error al transcribir audio: {str(error)}")
-            self._cleanup_temp_file(temp_file)
+            self._stats["encode_failures"] += 1
+            print(f"⚠️ No se pudo codificar el audio procesado, se sube el original: {error}")
+            return original
+        
+        if chunked:
+            self._stats["chunked_messages"] += 1
+            self._stats["chunks"] += len(files)
+            print(f"✂️ Audio de {len(samples) / sample_rate:.0f}s dividido en {len(files)} fragmentos")
+        elif len(files[0][1]) >= len(voice_file_bytes):
+            # El recorte no achicó la subida: no vale la pena cambiar el original
+            return original
+        
+        if seconds_saved > 0:
+            bytes_saved = len(voice_file_bytes) - sum(len(data) for _, data, _ in files)
+            self._stats["trimmed_messages"] += 1
+            self._stats["bytes_saved"] += bytes_saved
+            self._stats["seconds_saved"] = round(self._stats["seconds_saved"] + seconds_saved, 2)
+            print(f"🔇 Silencios recortados: {original_seconds:.1f}s -> "
+                  f"{original_seconds - seconds_saved:.1f}s ({seconds_saved:.1f}s menos), "
+                  f"{len(voice_file_bytes) / 1024:.0f} KB -> "
+                  f"{(len(voice_file_bytes) - bytes_saved) / 1024:.0f} KB")
+        return files
+    
+    def _merge(self, texts: List[Optional[str]]) -> Optional[str]:
+        """
+        Une las transcripciones de los fragmentos.
+        
+        Si falló alguno se descarta todo: un hueco en el medio puede
+        cambiar el sentido del mensaje.
+        
+        Args:
+            texts (list): Texto de cada fragmento, en orden (None si falló)
+        
+        Returns:
+            str: Transcripción completa, o None si falló algún fragmento
+        """
+        if any(text is None for text in texts):
+            print("❌ Falló la transcripción de al menos un fragmento")
             return None
+        return audio.merge_transcripts(texts)
+    
+    def _route(self, seconds: Optional[float]) -> List[TranscriptionBackend]:
+        """
+        Backends a probar, en orden, para un archivo.
+        
+        Args:
+            seconds (float): Duración del archivo (None = desconocida)
+        
+        Returns:
+            list: Backends en orden de preferencia
+        """
+        order = [VOICE_BACKEND_PRIMARY, VOICE_BACKEND_FALLBACK]
+        if VOICE_LOCAL_MAX_SECONDS > 0 and seconds is not None and seconds <= VOICE_LOCAL_MAX_SECONDS:
+            order.insert(0, "local")
+        names = [name for index, name in enumerate(order) if name and name not in order[:index]]
+        return [self.backends[name] for name in names]
+    
+    def _transcribe_file(self, file: AudioFile) -> Optional[str]:
+        """
+        Transcribe un archivo probando los backends en orden.
+        
+        Args:
+            file (tuple): (nombre, bytes, segundos) del archivo a transcribir
+        
+        Returns:
+            str: Texto transcrito, o None si fallaron todos los backends
+        """
+        filename, data, seconds = file
+        for backend in self._route(seconds):
+            try:
+                return backend.transcribe(filename, data, seconds)
+            except Exception as error:
+                print(f"❌ Error al transcribir audio ({backend.name}): {str(error)}")
+        return None
     
-    def _cleanup_temp_file(self, file_path: str):
+    async def _transcribe_file_async(self, file: AudioFile) -> Optional[str]:
         """
-        Elimina el archivo temporal de forma segura.
+        Versión asíncrona de _transcribe_file.
         
         Args:
-            file_path (str): Ruta del archivo a eliminar
+            file (tuple): (nombre, bytes, segundos) del archivo a transcribir
+        
+        Returns:
+            str: Texto transcrito, o None si fallaron todos los backends
+        """
+        filename, data, seconds = file
+        for backend in self._route(seconds):
+            try:
+                return await backend.transcribe_async(filename, data, seconds)
+            except Exception as error:
+                print(f"❌ Error al transcribir audio ({backend.name}): {str(error)}")
+        return None
+    
+    def _load_local_backend(self):
+        """
+        Precarga el modelo local; si no está disponible, ese backend fallará
+        y se usará el siguiente de la ruta.
         """
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            self.backends["local"].load()
         except Exception as e:
-            print(f"⚠️  No se pudo eliminar el archivo temporal: {e}")
\ No newline at end of file
+            print(f"⚠️  Whisper local no disponible: {e}")
+    
+    def backend_stats(self) -> dict:
+        """
+        Latencia y errores de cada backend de transcripción.
+        
+        Returns:
+            dict: {nombre: métricas del backend}
+        """
+        return {name: backend.stats() for name, backend in self.backends.items()}
+    
+    def stats(self) -> dict:
+        """
+        Métricas de transcripción.
+        
+        Returns:
+            dict: Mensajes, fragmentos, fallos de decodificación o codificación
+            y bytes/segundos ahorrados por el recorte de silencios
+        """
+        return dict(self._stats)
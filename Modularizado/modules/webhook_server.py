@@ -0,0 +1,177 @@
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+import telebot as tlb
+from modules.metrics import collect_stats
+from config import (
+    WEBHOOK_LISTEN_HOST,
+    WEBHOOK_LISTEN_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_MAX_BODY_BYTES
+)
+
+
+class WebhookServer:
+    """
+    Servidor HTTP liviano que recibe los updates de Telegram por webhook.
+
+    Valida el header X-Telegram-Bot-Api-Secret-Token, deserializa el update
+    y lo entrega al mismo registro de handlers que usa el polling
+    (bot.process_new_updates), por lo que los handlers no cambian.
+    Además expone GET /stats con las métricas registradas en modules.metrics
+    (protegido con el mismo secret token).
+
+    Attributes:
+        process_updates: Callback que recibe la lista de updates
+        secret_token: Token secreto esperado en cada request
+        host: Interfaz donde escucha el servidor
+        port: Puerto donde escucha el servidor
+        path: Ruta del endpoint del webhook
+
+    Example:
+        Probar localmente sin Telegram:
+
+        $ curl -X POST http://127.0.0.1:8443/telegram/webhook \\
+            -H "Content-Type: application/json" \\
+            -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET_TOKEN" \\
+            -d '{"update_id": 1, "message": {"message_id": 1, "date": 0,
+                 "chat": {"id": 1, "type": "private"}, "text": "hola"}}'
+    """
+
+    def __init__(self, process_updates: Callable[[list], None],
+                 secret_token: Optional[str] = WEBHOOK_SECRET_TOKEN,
+                 host: str = WEBHOOK_LISTEN_HOST, port: int = WEBHOOK_LISTEN_PORT,
+                 path: str = WEBHOOK_PATH):
+        """
+        Inicializa el servidor (no empieza a escuchar hasta start/serve_forever).
+
+        Args:
+            process_updates: Callback que recibe una lista de tlb.types.Update
+            secret_token (str): Token secreto esperado en cada request
+            host (str): Interfaz donde escuchar
+            port (int): Puerto donde escuchar
+            path (str): Ruta del endpoint
+        """
+        self.process_updates = process_updates
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.path = path
+        self._httpd = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._thread = None
+
+    @property
+    def address(self) -> tuple:
+        """Dirección (host, puerto) efectiva donde escucha el servidor."""
+        return self._httpd.server_address
+
+    def serve_forever(self):
+        """Atiende requests en el hilo actual hasta que se llame a stop()."""
+        print(f"🌐 Webhook escuchando en http://{self.host}:{self.address[1]}{self.path}")
+        self._httpd.serve_forever()
+
+    def start(self) -> threading.Thread:
+        """
+        Atiende requests en un hilo en segundo plano.
+
+        Returns:
+            threading.Thread: Hilo del servidor
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="webhook-server", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Detiene el servidor y libera el puerto."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _is_authorized(self, received_token: Optional[str]) -> bool:
+        """
+        Compara el token recibido con el esperado en tiempo constante.
+
+        Args:
+            received_token (str): Valor del header de la request
+
+        Returns:
+            bool: True si el token es válido
+        """
+        if not self.secret_token:
+            return True
+        return hmac.compare_digest(received_token or "", self.secret_token)
+
+    def _make_request_handler(self):
+        """
+        Construye la clase de handler HTTP ligada a este servidor.
+
+        Returns:
+            type: Subclase de BaseHTTPRequestHandler
+        """
+        server = self
+
+        class _WebhookRequestHandler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+
+                if not server._is_authorized(
+                    self.headers.get("X-Telegram-Bot-Api-Secret-Token")
+                ):
+                    self._reply(403)
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                if length <= 0 or length > WEBHOOK_MAX_BODY_BYTES:
+                    self._reply(413 if length > 0 else 400)
+                    return
+
+                try:
+                    payload = json.loads(self.rfile.read(length).decode("utf-8"))
+                    update = tlb.types.Update.de_json(payload)
+                except Exception as e:
+                    print(f"⚠️  Update inválido recibido por webhook: {e}")
+                    self._reply(400)
+                    return
+
+                # Responder rápido: Telegram reintenta si el webhook tarda
+                self._reply(200)
+                try:
+                    server.process_updates([update])
+                except Exception as e:
+                    print(f"❌ Error al procesar update del webhook: {e}")
+
+            def do_GET(self):
+                if self.path != "/stats":
+                    self._reply(404)
+                    return
+
+                if not server._is_authorized(
+                    self.headers.get("X-Telegram-Bot-Api-Secret-Token")
+                ):
+                    self._reply(403)
+                    return
+
+                body = json.dumps(collect_stats(), ensure_ascii=False).encode("utf-8")
+                self._reply(200, body, "application/json")
+
+            def _reply(self, status: int, body: bytes = b"", content_type: str = None):
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Silenciar el log por request de http.server
+                pass
+
+        return _WebhookRequestHandler
@@ -0,0 +1,111 @@
+"""
+Compara los backends de sentimiento torch y ONNX (fp32 / int8).
+
+Verifica paridad de etiquetas y scores contra el pipeline de torch y mide
+latencia (por texto y en batch) y memoria residual máxima de cada backend,
+cada uno en su propio proceso para que la medición de RAM sea limpia.
+
+Uso (desde Modularizado/):
+    python tools/benchmark_sentiment.py
+"""
+
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLES = [
+    "Estoy muy feliz con el producto, llegó rapidísimo",
+    "El celular no funciona y nadie me responde, es una vergüenza",
+    "¿Cuáles son los celulares disponibles?",
+    "gracias",
+    "hola",
+    "no funciona",
+    "Quiero devolver la heladera porque vino con un golpe",
+    "Me encantó la atención, súper recomendable",
+    "La tablet es lenta pero la pantalla es linda",
+    "¿Cuál es la política de devoluciones?",
+]
+
+# Tolerancia máxima en el score frente al pipeline de torch
+MAX_SCORE_DIFF = {"onnx-fp32": 1e-3, "onnx-int8": 5e-2}
+
+
+def _load(backend: str):
+    if backend == "torch":
+        from transformers import pipeline
+        from config import SENTIMENT_MODEL_NAME
+        return pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
+
+    from modules.sentiment_onnx import OnnxSentimentModel
+    return OnnxSentimentModel(quantize=(backend == "onnx-int8"))
+
+
+def _run(backend: str, output):
+    started = time.perf_counter()
+    model = _load(backend)
+    load_seconds = time.perf_counter() - started
+
+    model(SAMPLES[:2])  # warm-up
+    single = []
+    for text in SAMPLES * 5:
+        t0 = time.perf_counter()
+        model([text])
+        single.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    results = model(SAMPLES, batch_size=len(SAMPLES), truncation=True)
+    batch_seconds = time.perf_counter() - t0
+
+    output.put({
+        "backend": backend,
+        "load_s": load_seconds,
+        "single_ms_mean": statistics.mean(single) * 1000,
+        "single_ms_p95": sorted(single)[int(len(single) * 0.95) - 1] * 1000,
+        "batch_ms": batch_seconds * 1000,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "results": results
+    })
+
+
+def measure(backend: str) -> dict:
+    """Corre un backend en un proceso aparte y devuelve sus métricas."""
+    context = multiprocessing.get_context("spawn")
+    output = context.Queue()
+    process = context.Process(target=_run, args=(backend, output))
+    process.start()
+    report = output.get()
+    process.join()
+    return report
+
+
+def main():
+    reports = [measure(backend) for backend in ("torch", "onnx-fp32", "onnx-int8")]
+    reference = reports[0]["results"]
+
+    print(f"\n{'backend':<10} {'carga(s)':>9} {'1 texto(ms)':>12} {'p95(ms)':>8} "
+          f"{'batch(ms)':>10} {'RSS(MB)':>8} {'paridad':>8}")
+    failed = False
+    for report in reports:
+        labels_equal = all(
+            a["label"] == b["label"] for a, b in zip(reference, report["results"])
+        )
+        max_diff = max(
+            abs(a["score"] - b["score"]) for a, b in zip(reference, report["results"])
+        )
+        ok = labels_equal and max_diff <= MAX_SCORE_DIFF.get(report["backend"], 0)
+        failed = failed or not ok
+        print(f"{report['backend']:<10} {report['load_s']:>9.2f} "
+              f"{report['single_ms_mean']:>12.1f} {report['single_ms_p95']:>8.1f} "
+              f"{report['batch_ms']:>10.1f} {report['max_rss_mb']:>8.0f} "
+              f"{'OK' if ok else 'FALLA':>8}  (Δscore máx {max_diff:.4f})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compara la latencia de los backends de transcripción (Groq vs Whisper local).
+
+Transcribe cada archivo varias veces con cada backend e imprime latencia
+promedio / p95 y el texto obtenido, para decidir la ruta (primario,
+respaldo y VOICE_LOCAL_MAX_SECONDS).
+
+Uso (desde Modularizado/):
+    python tools/benchmark_transcription.py audio1.ogg audio2.ogg --runs 3
+
+    # Sin red, contra la API falsa:
+    GROQ_BASE_URL=http://127.0.0.1:8082 python tools/benchmark_transcription.py audio.ogg
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.transcription_backends import create_backend
+
+
+def measure(backend, files: dict, runs: int) -> dict:
+    """
+    Transcribe cada archivo `runs` veces (más una de calentamiento).
+
+    Returns:
+        dict: {archivo: {"latencies": [...], "text": str}} o {"error": str}
+    """
+    results = {}
+    for path, data in files.items():
+        filename = os.path.basename(path)
+        try:
+            backend.transcribe(filename, data)  # warm-up (carga del modelo local)
+            latencies = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                text = backend.transcribe(filename, data)
+                latencies.append(time.perf_counter() - started)
+            results[path] = {"latencies": latencies, "text": text}
+        except Exception as error:
+            results[path] = {"error": str(error)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="Archivos de audio a transcribir")
+    parser.add_argument("--backends", default="groq,local")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    files = {}
+    for path in args.files:
+        with open(path, "rb") as f:
+            files[path] = f.read()
+
+    print(f"\n{'backend':<8} {'archivo':<28} {'prom(ms)':>9} {'p95(ms)':>8}  texto")
+    for name in args.backends.split(","):
+        backend = create_backend(name.strip())
+        for path, result in measure(backend, files, args.runs).items():
+            label = os.path.basename(path)[:28]
+            if "error" in result:
+                print(f"{backend.name:<8} {label:<28} {'ERROR':>9} {'':>8}  {result['error']}")
+                continue
+            latencies = sorted(result["latencies"])
+            p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+            print(f"{backend.name:<8} {label:<28} {statistics.mean(latencies) * 1000:>9.0f} "
+                  f"{p95 * 1000:>8.0f}  {result['text'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
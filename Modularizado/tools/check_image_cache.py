@@ -0,0 +1,94 @@
+"""
+Chequeo de regresión del cache de imágenes por hash perceptual.
+
+Genera imágenes sintéticas y verifica que:
+1. Dos capturas con fondo blanco y distinto texto de producto no se
+   confundan (no se buscan por hash por tener poco contraste).
+2. Una foto de producto recomprimida y achicada reutilice la descripción.
+3. Una foto de otro producto no reutilice la descripción.
+
+No usa red ni persistencia. Sale con código 1 si algún caso falla.
+
+Uso (desde Modularizado/):
+    python tools/check_image_cache.py
+"""
+
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py exige credenciales; este chequeo no llama a ninguna API
+os.environ.setdefault("TELEGRAM_TOKEN", "check")
+os.environ.setdefault("GROQ_API_KEY", "check")
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+from config import IMAGE_CACHE_MIN_CONTRAST  # noqa: E402
+from modules.image_cache import ImageResultCache  # noqa: E402
+from modules.image_processing import perceptual_hash  # noqa: E402
+
+
+def _encode(image: Image.Image, format: str = "PNG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _screenshot(lines) -> Image.Image:
+    """Captura de 1024x1024 con fondo blanco y texto negro."""
+    image = Image.new("RGB", (1024, 1024), "white")
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((60, 100 + index * 70), line, fill="black", font=ImageFont.load_default())
+    return image
+
+
+def _product(shape: str) -> Image.Image:
+    """Foto de producto sintética: una figura oscura sobre fondo blanco."""
+    image = Image.new("RGB", (1024, 1024), "white")
+    draw = ImageDraw.Draw(image)
+    if shape == "phone":
+        draw.rectangle((300, 150, 720, 880), fill=(20, 20, 20))
+    else:
+        draw.ellipse((200, 250, 820, 800), fill=(120, 120, 120))
+    return image
+
+
+def _lookup(cache: ImageResultCache, image_bytes: bytes):
+    """Igual que ImageAnalyzer._cache_lookup: None si la imagen tiene poco contraste."""
+    horizontal, vertical, contrast = perceptual_hash(image_bytes)
+    if contrast < IMAGE_CACHE_MIN_CONTRAST:
+        return None, None
+    image_hash = (horizontal, vertical)
+    return cache.get_similar(image_hash), image_hash
+
+
+def main():
+    cache = ImageResultCache(db_path=None)
+
+    first = _encode(_screenshot(["Galaxy S24", "$ 999"]))
+    _, first_hash = _lookup(cache, first)
+    cache.put(None, first_hash, "Galaxy S24")
+    second = _encode(_screenshot(["Galaxy A15 lavarropas", "$ 299"]))
+    screenshots_ok = _lookup(cache, second)[0] is None
+
+    phone = _product("phone")
+    _, phone_hash = _lookup(cache, _encode(phone))
+    cache.put(None, phone_hash, "celular")
+    recompressed = _encode(phone.resize((800, 800)), "JPEG", quality=60)
+    similar_ok = _lookup(cache, recompressed)[0] == "celular"
+    other_ok = _lookup(cache, _encode(_product("washer")))[0] is None
+
+    results = {
+        "capturas distintas no se confunden": screenshots_ok,
+        "la misma foto recomprimida reutiliza la descripción": similar_ok,
+        "otro producto no reutiliza la descripción": other_ok,
+    }
+    for name, ok in results.items():
+        print(f"{'OK' if ok else 'FALLA':>5}  {name}")
+    sys.exit(0 if all(results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Chequeo de regresión del stemming y la recuperación BM25 sobre dataset.json.
+
+Verifica que singular y plural compartan raíz y que una consulta por una
+categoría en plural ("televisores", "heladeras") traiga primero productos
+de esa categoría. Sale con código 1 si algún caso falla.
+
+Uso (desde Modularizado/):
+    python tools/check_retrieval.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py exige credenciales; este chequeo no llama a ninguna API
+os.environ.setdefault("TELEGRAM_TOKEN", "check")
+os.environ.setdefault("GROQ_API_KEY", "check")
+
+from config import DATASET_PATH  # noqa: E402
+from modules.retrieval import DatasetRetriever, _stem  # noqa: E402
+
+SAME_STEM = [
+    ("heladera", "heladeras"),
+    ("producto", "productos"),
+    ("televisor", "televisores"),
+    ("celular", "celulares"),
+    ("cliente", "clientes"),
+    ("pantalla", "pantallas"),
+    ("devolucion", "devoluciones"),
+]
+
+# Consulta -> palabra que tiene que figurar en la categoría del primer resultado
+CATEGORY_QUERIES = {
+    "televisores samsung 65 pulgadas": "Televisor",
+    "tienen heladeras?": "Electrodoméstico",
+    "que celulares tienen?": "Celular",
+    "busco tablets": "Tablet",
+}
+
+
+def main():
+    failed = False
+    for singular, plural in SAME_STEM:
+        ok = _stem(singular) == _stem(plural)
+        failed = failed or not ok
+        print(f"{'OK' if ok else 'FALLA':>5}  {singular} -> {_stem(singular)}, "
+              f"{plural} -> {_stem(plural)}")
+
+    with open(DATASET_PATH, "r", encoding="utf-8") as f:
+        retriever = DatasetRetriever(json.load(f))
+    for query, category in CATEGORY_QUERIES.items():
+        products = retriever.select(query).get("products", [])
+        first = products[0]["category"] if products else None
+        ok = first is not None and category in first
+        failed = failed or not ok
+        print(f"{'OK' if ok else 'FALLA':>5}  {query!r} -> {first}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Chequeo de regresión de las respuestas en streaming que se cortan a mitad.
+
+Simula un stream de Groq que falla después de N fragmentos y verifica que:
+1. GroqHandler.stream_response lanza StreamInterrupted con el texto parcial
+   (y no termina como si la respuesta estuviera completa).
+2. El handler de texto reemplaza el mensaje parcial por la respuesta
+   completa de get_response, o agrega el aviso de corte si tampoco se pudo.
+
+No usa red: el bot de Telegram y la llamada al modelo son falsos.
+Sale con código 1 si algún caso falla.
+
+Uso (desde Modularizado/):
+    python tools/check_streaming.py
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py exige credenciales; este chequeo no llama a ninguna API
+os.environ.setdefault("TELEGRAM_TOKEN", "check")
+os.environ.setdefault("GROQ_API_KEY", "check")
+
+from config import DATASET_PATH  # noqa: E402
+from handlers.text_handler import INTERRUPTED_NOTICE, register_text_handler  # noqa: E402
+from modules import streaming  # noqa: E402
+from modules.groq_handler import GroqHandler, StreamInterrupted  # noqa: E402
+
+# Fragmentos que llegan antes del corte
+CHUNKS = ["Hola, ", "el Galaxy S24 ", "tiene pantalla ", "de 6.2 pulgadas. ", "Además "]
+
+
+def _chunk(text: str):
+    delta = SimpleNamespace(content=text)
+    return SimpleNamespace(model="fake", choices=[SimpleNamespace(delta=delta)], x_groq=None, usage=None)
+
+
+def _broken_stream():
+    for text in CHUNKS:
+        yield _chunk(text)
+    raise ConnectionError("conexión cortada a mitad del stream")
+
+
+class FakeBot:
+    """Registra el handler y guarda el texto final de cada mensaje enviado."""
+
+    def __init__(self):
+        self.handler = None
+        self.messages = {}
+
+    def message_handler(self, **kwargs):
+        def register(func):
+            self.handler = func
+            return func
+        return register
+
+    def send_chat_action(self, chat_id, action):
+        pass
+
+    def reply_to(self, message, text, parse_mode=None):
+        message_id = len(self.messages) + 1
+        self.messages[message_id] = text
+        return SimpleNamespace(message_id=message_id, chat=message.chat)
+
+    def edit_message_text(self, text, chat_id, message_id, parse_mode=None):
+        self.messages[message_id] = text
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.messages[len(self.messages) + 1] = text
+
+
+class FakeGroqHandler:
+    """Stream que se corta después de CHUNKS; get_response fijo."""
+
+    def __init__(self, full_response):
+        self.full_response = full_response
+
+    def stream_response(self, user_message, chat_id=None):
+        for text in CHUNKS:
+            yield text
+        raise StreamInterrupted("".join(CHUNKS))
+
+    def get_response(self, user_message, chat_id=None):
+        return self.full_response
+
+
+def check_groq_handler() -> bool:
+    """stream_response tiene que lanzar StreamInterrupted con el parcial."""
+    with open(DATASET_PATH, "r", encoding="utf-8") as f:
+        handler = GroqHandler(json.load(f))
+    handler.response_cache = None
+    handler.semantic_cache = None
+    handler.router.call = lambda request, user_message, kind="complete": _broken_stream()
+
+    received = []
+    try:
+        for delta in handler.stream_response("hola"):
+            received.append(delta)
+    except StreamInterrupted as interrupted:
+        return received == CHUNKS and interrupted.partial == "".join(CHUNKS)
+    return False
+
+
+def check_text_handler(full_response) -> bool:
+    """El mensaje final no puede quedar con el texto parcial sin aviso."""
+    bot = FakeBot()
+    sentiment = SimpleNamespace(is_ready=False)
+    register_text_handler(bot, FakeGroqHandler(full_response), sentiment, dataset={"products": []})
+    message = SimpleNamespace(text="hola", chat=SimpleNamespace(id=1, type="private"))
+    bot.handler(message)
+
+    expected = full_response or f"{''.join(CHUNKS).strip()}{INTERRUPTED_NOTICE}"
+    return list(bot.messages.values()) == [expected]
+
+
+def main():
+    streaming.STREAMING_EDIT_INTERVAL_SECONDS = 0
+    results = {
+        "stream_response lanza StreamInterrupted": check_groq_handler(),
+        "handler reemplaza el parcial por get_response": check_text_handler("Respuesta completa."),
+        "handler avisa el corte si get_response falla": check_text_handler(None),
+    }
+    for name, ok in results.items():
+        print(f"{'OK' if ok else 'FALLA':>5}  {name}")
+    sys.exit(0 if all(results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Stand-in local de la API de Groq para probar la transcripción sin red.
+
+Responde POST /openai/v1/audio/transcriptions con un texto que identifica
+el archivo recibido (nombre, tamaño y duración si es WAV) después de una
+demora configurable, así se puede ver el paralelismo y el orden de los
+fragmentos de un audio largo. También responde chat/completions con un
+texto fijo (palabra por palabra si se pide stream, con demora propia por
+modelo opcional y el usage en el último fragmento, como la API real) y
+GET /models (precalentamiento) para que el resto del
+flujo funcione.
+
+Uso (desde Modularizado/):
+    # Terminal 1: API falsa
+    python tools/fake_groq_server.py --delay 2
+
+    # Terminal 2: bot apuntando a la API falsa
+    GROQ_BASE_URL=http://127.0.0.1:8082 python main.py
+
+    # Modelo grande lento, para ver el respaldo al modelo chico
+    python tools/fake_groq_server.py --delay 0.2 --model-delay llama-3.3-70b-versatile=10
+"""
+
+import argparse
+import io
+import json
+import threading
+import time
+import wave
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Respuesta de chat en streaming (con Markdown, para ver los cortes seguros)
+_STREAM_TEXT = (
+    "Respuesta de prueba. El *Galaxy S24* tiene pantalla de 6.2 pulgadas y "
+    "batería de 4000 mAh. Podés verlo en [la tienda](https://shop.samsung.com/ar/) "
+    "o consultarme por otro modelo. ¿Te ayudo con algo más?"
+)
+
+_in_flight = 0
+_max_in_flight = 0
+_lock = threading.Lock()
+
+
+def _parse_multipart(content_type: str, body: bytes) -> dict:
+    """Devuelve {campo: (nombre_de_archivo, bytes)} de un form multipart."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"):
+            (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+def _usage(request: dict, completion: str) -> dict:
+    """Usage aproximado de una completion (~4 caracteres por token)."""
+    prompt = sum(
+        len(message["content"]) if isinstance(message["content"], str) else 1000
+        for message in request.get("messages", [])
+    ) // 4
+    completion_tokens = len(completion) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion_tokens,
+            "total_tokens": prompt + completion_tokens}
+
+
+def _describe_audio(filename: str, data: bytes) -> str:
+    """Texto falso de transcripción que identifica el archivo."""
+    if filename and filename.endswith(".wav"):
+        with wave.open(io.BytesIO(data)) as wav:
+            seconds = wav.getnframes() / wav.getframerate()
+        return f"[{filename} {seconds:.1f}s]"
+    return f"[{filename} {len(data)} bytes]"
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """Implementa los endpoints de Groq que usa el bot."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+    delay = 0.0
+    token_delay = 0.05
+    model_delays = {}
+
+    def do_GET(self):
+        if not self.path.endswith("/models"):
+            self.send_error(404)
+            return
+        payload = json.dumps({"object": "list", "data": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        global _in_flight, _max_in_flight
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+
+        with _lock:
+            _in_flight += 1
+            _max_in_flight = max(_max_in_flight, _in_flight)
+        try:
+            model = None
+            if self.path.endswith("/chat/completions"):
+                model = json.loads(body or b"{}").get("model")
+            time.sleep(self.model_delays.get(model, self.delay))
+            if self.path.endswith("/audio/transcriptions"):
+                fields = _parse_multipart(self.headers["Content-Type"], body)
+                filename, data = fields.get("file", ("", b""))
+                result = {"text": _describe_audio(filename, data)}
+                print(f"🎙️ {filename}: {len(data)} bytes (en vuelo: {_in_flight}, máx: {_max_in_flight})")
+            elif self.path.endswith("/chat/completions"):
+                request = json.loads(body or b"{}")
+                if request.get("stream"):
+                    self._stream_chat(request)
+                    return
+                result = {
+                    "id": "fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "Respuesta de prueba."}
+                    }],
+                    "usage": _usage(request, "Respuesta de prueba.")
+                }
+            else:
+                self.send_error(404)
+                return
+        finally:
+            with _lock:
+                _in_flight -= 1
+
+        payload = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_chat(self, request: dict):
+        """Responde un chat/completions con stream=True (SSE, palabra por palabra)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for word in _STREAM_TEXT.split(" "):
+                chunk = {
+                    "id": "fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                time.sleep(self.token_delay)
+            chunk["choices"] = [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            chunk["x_groq"] = {"id": "fake", "usage": _usage(request, _STREAM_TEXT)}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cerró el stream (ej: perdió la carrera contra el respaldo)
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, delay: float, token_delay: float = 0.05,
+          model_delays: dict = None) -> ThreadingHTTPServer:
+    """
+    Levanta la API falsa en un hilo de fondo.
+
+    Args:
+        model_delays (dict): Demora propia de algunos modelos de chat
+            ({modelo: segundos}), para probar el ruteo con un modelo lento
+
+    Returns:
+        ThreadingHTTPServer: Servidor en marcha (usar .shutdown() para frenarlo)
+    """
+    FakeGroqHandler.delay = delay
+    FakeGroqHandler.token_delay = token_delay
+    FakeGroqHandler.model_delays = model_delays or {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--delay", type=float, default=1.0,
+                        help="Segundos de demora simulada por request")
+    parser.add_argument("--token-delay", type=float, default=0.05,
+                        help="Segundos entre palabras de una respuesta en streaming")
+    parser.add_argument("--model-delay", action="append", default=[], metavar="MODELO=SEGUNDOS",
+                        help="Demora propia de un modelo de chat (se puede repetir)")
+    args = parser.parse_args()
+
+    model_delays = {}
+    for item in args.model_delay:
+        model, _, seconds = item.rpartition("=")
+        model_delays[model] = float(seconds)
+    server = serve(args.port, args.delay, args.token_delay, model_delays)
+    print(f"🤖 API de Groq falsa en http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
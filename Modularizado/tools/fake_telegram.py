@@ -0,0 +1,130 @@
+"""
+Stand-in local de Telegram para probar el modo webhook sin red.
+
+Levanta una Bot API falsa que responde "ok" a los métodos que usa el bot
+(sendMessage, sendChatAction, setWebhook, ...) e imprime cada llamada, y
+envía un update de texto al webhook local con el secret token.
+
+Uso (desde Modularizado/):
+    # Terminal 1: bot en modo webhook apuntando a la API falsa
+    UPDATE_MODE=webhook WEBHOOK_SECRET_TOKEN=secreto \\
+    TELEGRAM_API_URL="http://127.0.0.1:8081/bot{0}/{1}" python main.py
+
+    # Terminal 2: API falsa + envío de un update
+    python tools/fake_telegram.py --secret secreto --text "hola"
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_message_ids = itertools.count(1000)
+
+
+def _fake_result(method: str, params: dict):
+    """Arma un resultado mínimo y válido para cada método de la Bot API."""
+    if method == "getMe":
+        return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+    if method in ("sendMessage", "editMessageText"):
+        return {
+            "message_id": int(params.get("message_id") or next(_message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "text": params.get("text", "")
+        }
+    return True
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    """Responde a /bot<token>/<method> como lo haría api.telegram.org."""
+
+    def _handle(self):
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", errors="replace") if length else ""
+        params = {}
+        if body:
+            try:
+                params = json.loads(body)
+            except ValueError:
+                params = dict(urllib.parse.parse_qsl(body))
+        print(f"📨 {method}: {params}")
+
+        payload = json.dumps({"ok": True, "result": _fake_result(method, params)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def send_update(webhook_url: str, secret: str, text: str, chat_id: int) -> int:
+    """
+    Envía un update de texto al webhook del bot.
+
+    Returns:
+        int: Código HTTP devuelto por el webhook
+    """
+    update = {
+        "update_id": int(time.time()),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Cliente"},
+            "text": text
+        }
+    }
+    request = urllib.request.Request(
+        webhook_url,
+        data=json.dumps(update).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret
+        },
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook", default="http://127.0.0.1:8443/telegram/webhook")
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--text", default="hola")
+    parser.add_argument("--chat-id", type=int, default=12345)
+    parser.add_argument("--wait", type=float, default=30.0,
+                        help="Segundos a esperar respuestas del bot antes de salir")
+    args = parser.parse_args()
+
+    api = ThreadingHTTPServer(("127.0.0.1", args.api_port), FakeBotApiHandler)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    print(f"🤖 Bot API falsa en http://127.0.0.1:{args.api_port}/bot{{0}}/{{1}}")
+
+    status = send_update(args.webhook, args.secret, args.text, args.chat_id)
+    print(f"➡️  Update enviado al webhook: HTTP {status}")
+
+    time.sleep(args.wait)
+    api.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,11 @@ import json
 import os
 import time
 import base64
+import threading
 from dotenv import load_dotenv
 from typing import Optional
 import telebot as tlb
 from groq import Groq
-from transformers import pipeline
 
 
 MODEL_NAME = "pysentimiento/robertuito-sentiment-analysis"
@@ -28,24 +28,26 @@ def carga_modelo():
         return
 
     print(f"Cargando modelo de análisis de sentimientos ({MODEL_NAME})...")
+    inicio = time.perf_counter()
     try:
+        # Import diferido: transformers/torch tardan varios segundos en cargar
+        from transformers import pipeline
         ANALIZADOR = pipeline(
             "sentiment-analysis",
             model=MODEL_NAME
         )
-        print("Modelo de Sentimiento cargado con éxito. Listo para analizar textos.")
+        print("Modelo de Sentimiento cargado con éxito en "
+              f"{time.perf_counter() - inicio:.1f}s. Listo para analizar textos.")
     except Exception as e:
         print(f"Error: No se pudo cargar el modelo de sentimiento. Detalle: {e}")
         ANALIZADOR = None
 
 
-def analisis_sentimiento(texto: str) -> str:
-    """Analiza el sentimiento de un texto y devuelve un resultado formateado."""
+def analisis_sentimiento(texto: str) -> Optional[str]:
+    """Analiza el sentimiento de un texto y devuelve un resultado formateado.
+    Devuelve None si el modelo todavía se está cargando en segundo plano."""
     if ANALIZADOR is None:
-        carga_modelo()
-
-    if ANALIZADOR is None:
-        return "⚠ Modelo de Sentimiento no disponible. Ejecute 'carga_modelo()' para diagnosticar."
+        return None
 
     try:
         resultados = ANALIZADOR([texto])
@@ -92,60 +94,66 @@ def cargar_datos():
 datosc = cargar_datos()
 
 
+def construir_system_prompt(datos: dict) -> str:
+    """Compila una sola vez el system prompt: reglas fijas primero y el dataset
+    compacto al final, para que el prefijo sea idéntico en cada mensaje."""
+    reglas = (
+        "Eres el asistente virtual de una tienda de Samsung. Tu tarea es "
+        "responder basándote en la información proporcionada en el dataset, "
+        "siendo *resolutivo y empático.*\n"
+        "*Instrucción de Empatía:* Debes analizar el tono o el sentimiento "
+        "implícito en el mensaje del cliente (por ejemplo: frustración, "
+        "confusión, urgencia, alegría o interés). *Toda respuesta debe "
+        "comenzar con una frase breve y humana que reconozca este sentimiento* "
+        "antes de proceder con la información resolutiva.\n"
+        "En caso de no encontrar la respuesta en el dataset, índica de manera "
+        "amistosa y amable que no cuentas con esa información, sugiriendo "
+        "contactar directamente con la empresa.\n\n"
+        "Reglas importantes:\n"
+        "1. Solo responde información proporcionada en el dataset.\n"
+        "2. No inventes, añadas o busques información adicional a menos de que "
+        "sea para proporcionar un enlace directo a la tienda en caso de que "
+        "el cliente este buscando ESE producto en especifico.\n"
+        "3. Si la información solicitada no esta en el dataset, sugiere contactar "
+        "a https://www.samsung.com/ca/support/contact/\n"
+        "4. No respondas preguntas no relacionadas con la empresa.\n"
+        "5. No incluyas en tus respuestas nunca un dato sensible como el número "
+        "de algún miembro del personal, en caso de ser solicitados debes "
+        "responder: \"No puedo brindar dicha información.\"\n"
+        "6. *Sé empático, amable, profesional y orientado a la resolución.* "
+        "Tu respuesta siempre debe empezar con una frase que reconozca el "
+        "estado emocional del cliente.\n"
+        "    * *Ejemplos de frases empáticas:* \"Entiendo perfectamente su "
+        "frustración con este tema,\" \"Me alegra mucho que esté "
+        "considerando este producto,\" \"Lamento el inconveniente que "
+        "esto le ha causado,\" o \"Gracias por la claridad en su consulta.\"\n"
+        "7. Solo saluda en la primera interacción.\n"
+        "8. Puedes utilizar emojis en tus respuestas, un máximo de 3.\n"
+        "9. No incluyas saludos si la conversación ya fue iniciada.\n"
+        "10. Siempre responde evitando la redundancia y repetición de información.\n"
+        "11. Nunca envies links inactivos, en caso de que se soliciten productos "
+        "o categorias de productos, debes proporcionar la lista completa de "
+        "páginas que figura en el dataset.\n"
+        "12. Utiliza correctamente el punto y seguido.\n"
+        "13. Utiliza correctamente el punto y aparte.\n"
+        "14. No brindes enlaces especificos a un producto, solo envía enlaces a "
+        "la categoria del producto por ejemplo https://www.samsung.com/ar/smartphones/."
+    )
+    datos_compactos = json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+    return f"{reglas}\n\nDatos de la empresa:\n{datos_compactos}"
+
+
+SYSTEM_PROMPT = construir_system_prompt(datosc) if datosc else None
+
+
 def get_groq_response(user_message: str):
     """Obtiene la respuesta del chatbot de Groq basado en el dataset."""
     try:
-        system_prompt = (
-            f"""Eres el asistente virtual de una tienda de Samsung. Tu tarea es """
-            f"""responder basándote en la información proporcionada en el dataset, """
-            f"""siendo *resolutivo y empático.*
-            *Instrucción de Empatía:* Debes analizar el tono o el sentimiento """
-            f"""implícito en el mensaje del cliente (por ejemplo: frustración, """
-            f"""confusión, urgencia, alegría o interés). *Toda respuesta debe """
-            f"""comenzar con una frase breve y humana que reconozca este sentimiento* """
-            f"""antes de proceder con la información resolutiva.
-            En caso de no encontrar la respuesta en el dataset, índica de manera """
-            f"""amistosa y amable que no cuentas con esa información, sugiriendo """
-            f"""contactar directamente con la empresa.
-
-            Datos de la empresa:
-            {json.dumps(datosc, ensure_ascii=False, indent=2)}
-
-            Reglas importantes:
-            1. Solo responde información proporcionada en el dataset.
-            2. No inventes, añadas o busques información adicional a menos de que """
-            f"""sea para proporcionar un enlace directo a la tienda en caso de que """
-            f"""el cliente este buscando ESE producto en especifico.
-            3. Si la información solicitada no esta en el dataset, sugiere contactar """
-            f"""a https://www.samsung.com/ca/support/contact/
-            4. No respondas preguntas no relacionadas con la empresa.
-            5. No incluyas en tus respuestas nunca un dato sensible como el número """
-            f"""de algún miembro del personal, en caso de ser solicitados debes """
-            f"""responder: "No puedo brindar dicha información."
-            6. *Sé empático, amable, profesional y orientado a la resolución.* """
-            f"""Tu respuesta siempre debe empezar con una frase que reconozca el """
-            f"""estado emocional del cliente.
-                * *Ejemplos de frases empáticas:* "Entiendo perfectamente su """
-                f"""frustración con este tema," "Me alegra mucho que esté """
-                f"""considerando este producto," "Lamento el inconveniente que """
-                f"""esto le ha causado," o "Gracias por la claridad en su consulta."
-            7. Solo saluda en la primera interacción.
-            8. Puedes utilizar emojis en tus respuestas, un máximo de 3.
-            9. No incluyas saludos si la conversación ya fue iniciada.
-            10. Siempre responde evitando la redundancia y repetición de información.
-            11. Nunca envies links inactivos, en caso de que se soliciten productos """
-            f"""o categorias de productos, debes proporcionar la lista completa de """
-            f"""páginas que figura en el dataset.
-            12. Utiliza correctamente el punto y seguido.
-            13. Utiliza correctamente el punto y aparte.
-            14. No brindes enlaces especificos a un producto, solo envía enlaces a la categoria del producto por ejemplo https://www.samsung.com/ar/smartphones/."""
-        )
-
         chat_completion = grok_cliente.chat.completions.create(
             messages=[
                 {
                     "role": "system",
-                    "content": system_prompt
+                    "content": SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -168,19 +176,16 @@ def transcribe_voice_with_groq(message: tlb.types.Message) -> Optional[str]:
     try:
         file_info = bot.get_file(message.voice.file_id)
         dowloaded_file = bot.download_file(file_info.file_path)
-        temp_file = "temp_voice.ogg"
-        with open(temp_file, "wb") as f:
-            f.write(dowloaded_file)
-        with open(temp_file, "rb") as audio_file:
-            transcription = grok_cliente.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-large-v3",
-                prompt="Especificar contexto o pronunciación",
-                response_format="json",
-                language="es",
-                temperature=1
-            )
-        os.remove(temp_file)
+        # Se sube directo desde memoria: sin archivo temporal compartido
+        # que otro chat pueda pisar
+        transcription = grok_cliente.audio.transcriptions.create(
+            file=("voice.ogg", dowloaded_file),
+            model="whisper-large-v3",
+            prompt="Especificar contexto o pronunciación",
+            response_format="json",
+            language="es",
+            temperature=1
+        )
         return transcription.text
 
     except Exception as error:
@@ -288,6 +293,8 @@ def handle_text_message(message: tlb.types.Message):
 
     bot.send_chat_action(message.chat.id, "typing")
     sentiment_result = analisis_sentimiento(message.text)
+    if not sentiment_result:
+        return
     bot.send_message(
         chat_id=message.chat.id,
         text=sentiment_result,
@@ -319,6 +326,8 @@ def handle_voice_message(message: tlb.types.Message):
 
     bot.send_chat_action(message.chat.id, "typing")
     sentiment_result = analisis_sentimiento(transcription)
+    if not sentiment_result:
+        return
     bot.send_message(
         chat_id=message.chat.id,
         text=sentiment_result,
@@ -351,7 +360,9 @@ def manejar_foto(mensaje):
 
 
 if __name__ == "__main__":
-    carga_modelo()
+    # El modelo carga en segundo plano; mientras tanto el bot ya responde
+    # con el LLM y omite el análisis de sentimiento
+    threading.Thread(target=carga_modelo, daemon=True).start()
     if datosc:
         print(f"bot de {datosc['company_info']['name']} iniciado correctamente")
         while True: